@@ -0,0 +1,347 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+from html import escape
+import numpy
+import pandas as pd
+from hdfs import InsecureClient
+from tableExtractor import parse_tables
+from datasetCleaner import clean_dataset, DATASET_SCHEMAS, DATASET_COLUMNS, DATASET_KEYS
+from parquetSink import write_dataset
+from hdfsUploader import HdfsUploader
+from webhdfsStub import WebHdfsStub
+from metrics import collect
+import espn
+
+# Offline benchmarks of the parse, clean, write, ingest and load stages.
+# Fixture pages are generated from the committed CSVs in the layout of every
+# source and scaled up by repeating their rows, so no browser, cluster or
+# MySQL server is needed: ingestion runs against webhdfsStub.py and loading
+# runs dataLoading.py against SQLite.
+
+# Rows of the committed CSVs are repeated this many times
+DEFAULT_SCALES = (10, 100)
+ALL_SCALES = (10, 100, 1000)
+
+# Years the Olympiad copies are renumbered within: the scraped host cells
+# ('Tokyo 2020') are parsed for four-digit years
+FIRST_YEAR, LAST_YEAR = 1000, 9999
+
+# Every benchmark is run this many times and the fastest run is kept
+DEFAULT_REPEAT = 3
+
+# Stored results to compare against
+BASELINE_FILE = 'benchmark_baseline.json'
+
+# Slower than the baseline by more than this factor counts as a regression
+DEFAULT_TOLERANCE = 1.25
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def copy_suffix(copy, scale):
+    # Fixed-width base-36 number of a copy, short enough for keys such as the
+    # VARCHAR(5) Sports abbreviations
+    width = len(numpy.base_repr(max(scale - 1, 1), 36))
+    return numpy.base_repr(copy, 36).rjust(width, '0')
+
+
+def spare_years(df, scale):
+    # Unused four-digit years for the copies of a dataset keyed by Years alone,
+    # fewer copies than asked for when they run out
+    used = set(df['Years'])
+    spare = [str(year) for year in range(FIRST_YEAR, LAST_YEAR + 1) if str(year) not in used]
+    copies = min(scale, 1 + len(spare) // len(df))
+    return spare[:(copies - 1) * len(df)], copies
+
+
+def scaled_dataset(dataset, scale):
+    # Repeat the rows of a committed CSV, making the natural key (DATASET_KEYS)
+    # of every copy unique so cleaning, validation and the delta load keep all
+    # the copies. Text keys get the copy number appended and Years is kept,
+    # so foreign keys still match the Olympiads of the first copy; Olympiad,
+    # keyed by Years alone, gets spare four-digit years instead.
+    df = pd.read_csv(os.path.join(SCRIPT_DIR, 'csvFiles', f'{dataset}.csv'), dtype=str, keep_default_na=False)
+    dtypes = DATASET_COLUMNS[dataset]
+    text_keys = [key for key in DATASET_KEYS[dataset] if dtypes[key] == 'string']
+    copies = scale
+    if not text_keys:
+        years, copies = spare_years(df, scale)
+        if copies < scale:
+            print(f"{dataset}: only {copies} copies fit in four-digit years, not {scale}")
+
+    scaled = [df]
+    for copy in range(1, copies):
+        part = df.copy()
+        if text_keys:
+            for key in text_keys:
+                part[key] = part[key] + copy_suffix(copy, scale)
+        else:
+            part['Years'] = years[(copy - 1) * len(df):copy * len(df)]
+        scaled.append(part)
+    return pd.concat(scaled, ignore_index=True)
+
+
+def check_keys(dataset, cleaned, expected):
+    # Cleaning must give back the natural keys of the scaled rows, otherwise
+    # the benchmarks would time corrupted output
+    keys = DATASET_KEYS[dataset]
+    found = sorted(map(tuple, cleaned[keys].astype(str).values.tolist()))
+    if found != sorted(map(tuple, expected[keys].astype(str).values.tolist())):
+        raise RuntimeError(f"Cleaning the scaled {dataset} changed its keys {keys}")
+
+
+def html_table(class_names, headers, rows, cell_classes=None):
+    head = ''.join(f'<th>{escape(header)}</th>' for header in headers)
+    body = []
+    for row in rows:
+        cells = []
+        for index, value in enumerate(row):
+            css = f' class="{cell_classes[index]}"' if cell_classes and cell_classes[index] else ''
+            cells.append(f'<td{css}>{value}</td>')
+        body.append('<tr>' + ''.join(cells) + '</tr>')
+    return f'<table class="{class_names}"><thead><tr>{head}</tr></thead><tbody>{"".join(body)}</tbody></table>'
+
+
+def espn_country_page(df):
+    # ESPN medals table with raw headers and the flag as an image in the team cell
+    rows = [
+        [f'<img src="{escape(url)}"> {escape(team)}', g, s, b, t]
+        for team, g, s, b, t, url in df[['Team', 'Gold', 'Silver', 'Bronze', 'Total', 'Flag_URL']].itertuples(index=False)
+    ]
+    table = html_table(espn.MEDALS_TABLE_CLASSES, ['GROUP', 'G', 'S', 'B', 'TOTAL'], rows, ['team', None, None, None, None])
+    return f'<html><body>{table}</body></html>'
+
+
+def espn_athlete_page(df):
+    rows = [[escape(name), g, s, b, t] for name, g, s, b, t in
+            df[['Athlete_Name', 'Gold', 'Silver', 'Bronze', 'Total']].itertuples(index=False)]
+    table = html_table(espn.MEDALS_TABLE_CLASSES, ['ATHLETE', 'G', 'S', 'B', 'TOTAL'], rows)
+    return f'<html><body>{table}</body></html>'
+
+
+def pages_by_year(df, page):
+    # Year -> page of its rows, the sources publish one page per year
+    return {int(year): page(rows) for year, rows in df.groupby('Years', sort=True)}
+
+
+def olympedia_page(df):
+    rows = [[escape(value) for value in row] for row in df.itertuples(index=False)]
+    table = html_table('table table-striped', list(df.columns), rows)
+    return f'<html><body>{table}</body></html>'
+
+
+def olympiad_page(olympiad):
+    # Layout of olympiandatabase.com: the Olympiads are the second frame_space
+    # table of their page and medals by continent the third of every year's
+    rows = [['', f'{escape(city)} {year}', nations, athletes] for year, city, nations, athletes in olympiad.itertuples(index=False)]
+    tables = [
+        html_table('frame_space', ['Menu'], [['']]),
+        html_table('frame_space', ['Olympiad', 'Host City', 'Nations', 'Athletes'], rows),
+    ]
+    return f'<html><body>{"".join(tables)}</body></html>'
+
+
+def continental_medals_page(medals):
+    rows = [[f'{position}.', escape(continent), '', g, s, b, t]
+            for _, position, continent, g, s, b, t in medals.itertuples(index=False)]
+    tables = [
+        html_table('frame_space', ['Menu'], [['']]),
+        html_table('frame_space', ['Games'], [['']]),
+        html_table('frame_space', ['Rank', 'Continent', 'Flag', 'Gold', 'Silver', 'Bronze', 'Total'], rows),
+    ]
+    return f'<html><body>{"".join(tables)}</body></html>'
+
+
+def parse_espn(country_pages, athlete_pages):
+    country, athletes = [], []
+    for year, html in country_pages.items():
+        country += espn.parse_country_table(parse_tables(html, espn.MEDALS_TABLE_CLASSES)[0], year)
+    for year, html in athlete_pages.items():
+        athletes += espn.parse_athlete_table(parse_tables(html, espn.MEDALS_TABLE_CLASSES)[0], year, 1)
+    return pd.DataFrame(country), pd.DataFrame(athletes)
+
+
+def parse_olympedia(html):
+    table = parse_tables(html, 'table-striped')[0]
+    return pd.DataFrame([dict(zip(table.headers, row.cells)) for row in table.rows])
+
+
+def parse_olympiandatabase(olympiad_html, medal_pages):
+    table = parse_tables(olympiad_html, 'frame_space')[1]
+    olympiad = pd.DataFrame([row.cells for row in table.rows], columns=['Olympiad', 'Host City', 'Nations', 'Athletes'])
+    medal_rows = []
+    for year, html in medal_pages.items():
+        medal_rows += [[year] + row.cells for row in parse_tables(html, 'frame_space')[2].rows]
+    medals = pd.DataFrame(medal_rows, columns=['Year', 'Rank', 'Continent', 'Flag', 'Gold', 'Silver', 'Bronze', 'Total'])
+    return olympiad, medals
+
+
+def timed(function, repeat):
+    # Fastest of `repeat` runs, and the result of the last one
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_load(env, work_dir):
+    # dataLoading.py as the pipeline runs it; the DB insert time comes from its metrics
+    metrics_dir = os.path.join(work_dir, 'metrics')
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    database = os.path.join(work_dir, 'benchmark.sqlite')
+    if os.path.exists(database):
+        os.remove(database)
+    env = dict(env, DATABASE_URL=f'sqlite:///{database}', METRICS_DIR=metrics_dir, LOADED_PARTITIONS_FOLDER=os.path.join(work_dir, 'loaded'))
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(SCRIPT_DIR, 'dataLoading.py')], cwd=work_dir, env=env)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f'dataLoading.py failed with exit code {result.returncode}')
+    insert = sum(entry['sum'] for entry in collect(metrics_dir).snapshot() if entry['name'] == 'db_insert_seconds')
+    return elapsed, insert
+
+
+def benchmark_scale(scale, repeat, work_dir):
+    results = {}
+    datasets = {dataset: scaled_dataset(dataset, scale) for dataset in DATASET_SCHEMAS}
+    rows = sum(len(df) for df in datasets.values())
+    print(f"Scale x{scale}: {rows} rows")
+
+    # Fixture pages in the layout of every source
+    pages = {
+        'espn': (pages_by_year(datasets['CountryMedals'], espn_country_page),
+                 pages_by_year(datasets['AthletesMedals'], espn_athlete_page)),
+        'olympedia': (olympedia_page(datasets['Sports']),),
+        'olympiandatabase': (olympiad_page(datasets['Olympiad']),
+                             pages_by_year(datasets['ContinentalMedals'], continental_medals_page)),
+    }
+
+    # Parse: HTML to raw rows
+    results['parse/espn'], (country, athletes) = timed(lambda: parse_espn(*pages['espn']), repeat)
+    results['parse/olympedia'], sports = timed(lambda: parse_olympedia(*pages['olympedia']), repeat)
+    results['parse/olympiandatabase'], (olympiad, medals) = timed(lambda: parse_olympiandatabase(*pages['olympiandatabase']), repeat)
+
+    # Clean: raw rows to typed, load-ready rows
+    raw = {'CountryMedals': country, 'AthletesMedals': athletes, 'Sports': sports, 'Olympiad': olympiad, 'ContinentalMedals': medals}
+    cleaned = {}
+    for dataset, df in raw.items():
+        check_keys(dataset, clean_dataset(df, dataset), datasets[dataset])
+        results[f'clean/{dataset}'], cleaned[dataset] = timed(lambda: clean_dataset(df, dataset), repeat)
+
+    # Write: CSV and Years-partitioned Parquet
+    csv_dir = os.path.join(work_dir, 'csv')
+    parquet_dir = os.path.join(work_dir, 'parquet')
+    os.makedirs(csv_dir, exist_ok=True)
+    results['write/csv'], _ = timed(lambda: [
+        df.to_csv(os.path.join(csv_dir, f'{dataset}.csv'), index=False) for dataset, df in datasets.items()
+    ], repeat)
+
+    def write_parquet():
+        shutil.rmtree(parquet_dir, ignore_errors=True)
+        for dataset, df in cleaned.items():
+            write_dataset(df, dataset, parquet_dir)
+    results['write/parquet'], _ = timed(write_parquet, repeat)
+
+    # Ingest and load through the local WebHDFS stand-in
+    stub = WebHdfsStub(os.path.join(work_dir, 'hdfs')).start()
+    try:
+        csv_files = sorted(os.path.join(csv_dir, name) for name in os.listdir(csv_dir))
+
+        def upload():
+            # Start without an upload manifest so every file is uploaded
+            manifest_path = os.path.join(work_dir, 'uploads.json')
+            if os.path.exists(manifest_path):
+                os.remove(manifest_path)
+            uploader = HdfsUploader(lambda: InsecureClient(stub.url, user='hadoop'), '/data/', manifest_path)
+            return uploader.upload_all(csv_files)
+        results['ingest/hdfs'], _ = timed(upload, repeat)
+
+        env = dict(os.environ, HDFS_URL=stub.url, HDFS_TARGET_FOLDER='/data/', LOG_LEVEL='WARNING')
+        load_runs = [run_load(env, work_dir) for _ in range(repeat)]
+        results['load/dataLoading'] = min(total for total, _ in load_runs)
+        results['load/db_insert'] = min(insert for _, insert in load_runs)
+    finally:
+        stub.stop()
+
+    return {f'{name}/x{scale}': seconds for name, seconds in results.items()}
+
+
+def compare(results, baseline, tolerance):
+    # Lines of current vs baseline timings, and the names that got slower than allowed
+    lines = [f"{'benchmark':<40} {'baseline':>10} {'current':>10} {'ratio':>7}"]
+    regressions = []
+    for name, seconds in results.items():
+        before = baseline.get(name)
+        if before is None:
+            lines.append(f"{name:<40} {'-':>10} {seconds:10.4f} {'new':>7}")
+            continue
+        ratio = seconds / before if before else float('inf')
+        flag = ''
+        if ratio > tolerance:
+            flag = '  slower'
+            regressions.append(name)
+        elif ratio < 1 / tolerance:
+            flag = '  faster'
+        lines.append(f"{name:<40} {before:10.4f} {seconds:10.4f} {ratio:7.2f}{flag}")
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline stages offline.')
+    parser.add_argument('--scales', type=int, nargs='+', default=list(DEFAULT_SCALES),
+                        help=f'row multipliers to run, e.g. {" ".join(map(str, ALL_SCALES))}')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='runs per benchmark, the fastest counts')
+    parser.add_argument('--baseline', default=os.path.join(SCRIPT_DIR, BASELINE_FILE), help='stored results to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='allowed slowdown factor')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix='olympics-benchmark-')
+    try:
+        for scale in args.scales:
+            scale_dir = os.path.join(work_dir, f'x{scale}')
+            os.makedirs(scale_dir)
+            results.update(benchmark_scale(scale, args.repeat, scale_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    lines, regressions = compare(results, baseline, args.tolerance)
+    print('\n'.join(lines))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(dict(baseline, **results), f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} benchmarks slower than {args.tolerance}x the baseline: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    # The scraper modules configure INFO logging on import, keep the timings quiet
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger().setLevel(logging.WARNING)
+    sys.exit(main())
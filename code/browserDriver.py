@@ -0,0 +1,138 @@
+import os
+import json
+import logging
+import threading
+from metrics import METRICS
+
+# selenium, webdriver_manager and fake_useragent are only imported once a
+# browser is actually needed, sources fetched over HTTP never load them
+
+# Resolved chromedriver binary and the Chrome version it matches, reused by
+# later runs until Chrome is updated. CHROMEDRIVER_PATH skips the resolution.
+DRIVER_CACHE_FILE = os.environ.get('CHROMEDRIVER_CACHE', os.path.join('driver_cache', 'chromedriver.json'))
+
+# User-Agents generated once per process and handed out in turn
+USER_AGENT_POOL_SIZE = 20
+
+# Used when fake_useragent cannot provide any
+FALLBACK_USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36',
+]
+
+
+def _read_driver_cache(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_driver_cache(path, entry):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(entry, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class DriverResolver:
+    # Resolves the chromedriver binary once per process. The result is kept
+    # in cache_file together with the installed Chrome version, so later runs
+    # skip webdriver_manager's version lookups and downloads until Chrome
+    # changes or the binary disappears.
+    def __init__(self, cache_file=DRIVER_CACHE_FILE):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._path = None
+
+    def path(self):
+        with self._lock:
+            if self._path is None:
+                with METRICS.timer('driver_resolve_seconds'):
+                    self._path = self._resolve()
+            return self._path
+
+    def _resolve(self):
+        configured = os.environ.get('CHROMEDRIVER_PATH')
+        if configured:
+            return configured
+
+        from webdriver_manager.chrome import ChromeDriverManager
+        manager = ChromeDriverManager()
+        try:
+            browser_version = manager.driver.get_browser_version_from_os()
+        except Exception as e:
+            logging.warning(f"Could not read the installed Chrome version: {str(e)}")
+            browser_version = None
+
+        cached = _read_driver_cache(self.cache_file)
+        if (cached.get('path') and os.path.exists(cached['path'])
+                and (browser_version is None or cached.get('browser_version') == browser_version)):
+            METRICS.inc('driver_resolve_total', result='cached')
+            logging.debug("Using cached chromedriver %s", cached['path'])
+            return cached['path']
+
+        path = manager.install()
+        _write_driver_cache(self.cache_file, {'path': path, 'browser_version': browser_version})
+        METRICS.inc('driver_resolve_total', result='installed')
+        logging.info(f"Resolved chromedriver {path} for Chrome {browser_version}")
+        return path
+
+
+class UserAgentPool:
+    # A fixed set of random User-Agents, generated on first use and rotated
+    # round-robin between the browsers of a run
+    def __init__(self, size=USER_AGENT_POOL_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._agents = None
+        self._next = 0
+
+    def _load(self):
+        try:
+            from fake_useragent import UserAgent
+            # Desktop only, the scraped tables are laid out differently on mobile
+            generator = UserAgent(platforms='desktop')
+            agents = list(dict.fromkeys(generator.random for _ in range(self.size)))
+        except Exception as e:
+            logging.warning(f"Falling back to built-in User-Agents: {str(e)}")
+            agents = []
+        return agents or list(FALLBACK_USER_AGENTS)
+
+    def next(self):
+        with self._lock:
+            if self._agents is None:
+                self._agents = self._load()
+            agent = self._agents[self._next % len(self._agents)]
+            self._next += 1
+            return agent
+
+
+# Shared by every browser started in this process
+DRIVER_RESOLVER = DriverResolver()
+USER_AGENTS = UserAgentPool()
+
+
+def create_driver(headless=True, user_agent=None):
+    # Start Chrome with the next User-Agent of the pool and the cached driver binary
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+
+    # Set up Chrome options
+    options = Options()
+    if headless:
+        options.add_argument("--headless")  # Ensure GUI is off
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument(f'user-agent={user_agent or USER_AGENTS.next()}')
+
+    # Initialize the Chrome driver with the options
+    with METRICS.timer('driver_startup_seconds'):
+        driver = webdriver.Chrome(service=Service(DRIVER_RESOLVER.path()), options=options)
+    return driver
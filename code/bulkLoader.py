@@ -0,0 +1,200 @@
+import os
+import csv
+import queue
+import logging
+import tempfile
+import threading
+from sqlalchemy import text, inspect
+from metrics import METRICS
+
+# Rows sent per INSERT statement / executemany batch
+DEFAULT_CHUNK_SIZE = 5000
+
+# Upper bound on bound parameters per statement (SQLite allows 32766, MySQL 65535)
+MAX_PARAMETERS = 32000
+
+# Backends selectable through LOAD_BACKEND
+BACKENDS = ('auto', 'multi', 'infile', 'executemany')
+
+# Chunks read ahead of the one being written when streaming
+DEFAULT_PREFETCH = 2
+
+# Marks the end of a prefetched stream
+_END = object()
+
+
+def quote_identifier(engine, name):
+    return engine.dialect.identifier_preparer.quote(name)
+
+
+def rows_per_chunk(df, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Keep multi-row statements under the parameter limit of the database
+    columns = max(len(df.columns), 1)
+    return max(1, min(chunk_size, MAX_PARAMETERS // columns))
+
+
+def df_to_rows(df):
+    # Plain Python tuples with None for missing values, ready for the DB-API
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+
+def prefetch(chunks, depth=DEFAULT_PREFETCH):
+    # Iterate chunks that are read on a background thread, at most `depth`
+    # of them ahead of the consumer. Reading blocks while the buffer is full,
+    # so memory stays bounded however long the stream is, and errors raised
+    # while reading are re-raised in the consumer.
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if not put((chunk, None)):
+                    return
+            put((_END, None))
+        except Exception as e:
+            put((_END, e))
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    reader = threading.Thread(target=produce, name='prefetch', daemon=True)
+    reader.start()
+    try:
+        while True:
+            chunk, error = buffer.get()
+            if chunk is _END:
+                if error is not None:
+                    raise error
+                return
+            yield chunk
+    finally:
+        # Also reached when the consumer fails, stop the reader and let it close the source
+        stop.set()
+        reader.join()
+
+
+class BulkLoader:
+    # Loads a DataFrame into a table in one transaction. Pass a connection to
+    # make the load part of a larger transaction instead.
+    name = None
+
+    def __init__(self, engine, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.engine = engine
+        self.chunk_size = chunk_size
+
+    def load(self, df, table_name, connection=None):
+        if connection is None:
+            with self.engine.begin() as connection:
+                return self._timed_load(df, table_name, connection)
+        return self._timed_load(df, table_name, connection)
+
+    def load_chunks(self, chunks, table_name, depth=DEFAULT_PREFETCH, connection=None):
+        # Write an iterable of DataFrames in one transaction while the next
+        # chunks are still being read
+        if connection is None:
+            with self.engine.begin() as connection:
+                return self.load_chunks(chunks, table_name, depth, connection)
+
+        row_count = 0
+        for chunk in prefetch(chunks, depth):
+            row_count += self._timed_load(chunk, table_name, connection)
+        return row_count
+
+    def _timed_load(self, df, table_name, connection):
+        # Insert time and rows per table, giving the DB insert rate
+        with METRICS.timer('db_insert_seconds', table=table_name):
+            row_count = self._load(df, table_name, connection)
+        METRICS.inc('db_rows_total', row_count, table=table_name)
+        return row_count
+
+    def _load(self, df, table_name, connection):
+        raise NotImplementedError
+
+
+class MultiRowInsertLoader(BulkLoader):
+    # One INSERT ... VALUES (...), (...), ... statement per chunk
+    name = 'multi'
+
+    def _load(self, df, table_name, connection):
+        df.to_sql(name=table_name, con=connection, if_exists='append', index=False,
+                  method='multi', chunksize=rows_per_chunk(df, self.chunk_size))
+        return len(df)
+
+
+class ExecuteManyLoader(BulkLoader):
+    # Prepared INSERT run through the driver's executemany. This is the
+    # fastest path on SQLite, which is used for local benchmarks.
+    name = 'executemany'
+
+    def _load(self, df, table_name, connection):
+        if not inspect(connection).has_table(table_name):
+            df.head(0).to_sql(name=table_name, con=connection, index=False)
+
+        columns = ', '.join(quote_identifier(self.engine, column) for column in df.columns)
+        marker = '?' if self.engine.dialect.paramstyle == 'qmark' else '%s'
+        placeholders = ', '.join([marker] * len(df.columns))
+        statement = f'INSERT INTO {quote_identifier(self.engine, table_name)} ({columns}) VALUES ({placeholders})'
+        rows = df_to_rows(df)
+
+        cursor = connection.connection.cursor()
+        try:
+            for start in range(0, len(rows), self.chunk_size):
+                cursor.executemany(statement, rows[start:start + self.chunk_size])
+        finally:
+            cursor.close()
+        return len(rows)
+
+
+class LoadDataInfileLoader(BulkLoader):
+    # Streams the whole table to MySQL with LOAD DATA LOCAL INFILE. Needs
+    # local_infile enabled on the server and on the client (see create_engine
+    # in dataLoading.py).
+    name = 'infile'
+
+    def _load(self, df, table_name, connection):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                df.to_csv(f, index=False, header=False, na_rep='\\N', quoting=csv.QUOTE_MINIMAL,
+                          lineterminator='\n')
+
+            columns = ', '.join(quote_identifier(self.engine, column) for column in df.columns)
+            statement = text(
+                f"LOAD DATA LOCAL INFILE :path INTO TABLE {quote_identifier(self.engine, table_name)} "
+                "CHARACTER SET utf8mb4 FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+                f"LINES TERMINATED BY '\\n' ({columns})"
+            )
+            connection.execute(statement, {'path': path.replace('\\', '/')})
+        finally:
+            os.remove(path)
+        return len(df)
+
+
+LOADERS = {
+    MultiRowInsertLoader.name: MultiRowInsertLoader,
+    ExecuteManyLoader.name: ExecuteManyLoader,
+    LoadDataInfileLoader.name: LoadDataInfileLoader,
+}
+
+
+def create_loader(engine, backend='auto', chunk_size=DEFAULT_CHUNK_SIZE):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown load backend {backend}, expected one of {BACKENDS}")
+    if backend == 'auto':
+        backend = 'executemany' if engine.dialect.name == 'sqlite' else 'multi'
+    if backend == 'infile' and engine.dialect.name != 'mysql':
+        raise ValueError("LOAD DATA LOCAL INFILE is only available on MySQL")
+
+    logging.info(f"Using {backend} bulk loader with chunks of {chunk_size} rows")
+    return LOADERS[backend](engine, chunk_size)
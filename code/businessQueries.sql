@@ -40,7 +40,7 @@ ORDER BY o.Years;
 SELECT Continent, Gold, Silver, Bronze, Total
 FROM ContinentalMedals
 WHERE Years = 2016
-AND Position = '1';
+AND Position = 1;
 
 -- 8. Find the Olympics with the highest number of participating nations and athletes:
 SELECT o.Years, o.Host_City, o.Nations, o.Athletes, cm.Gold, cm.Silver, cm.Bronze, cm.Total
@@ -49,9 +49,15 @@ LEFT JOIN ContinentalMedals cm ON o.Years = cm.Years AND cm.Continent = 'Asia'
 ORDER BY o.Nations DESC, o.Athletes DESC
 LIMIT 1;
 
--- 9. List the top athletes with their medal counts and the corresponding Olympic host city:
-SELECT am.Athlete_Name, am.Gold, am.Silver, am.Bronze, am.Total, o.Host_City, o.Years
-FROM AthletesMedals am
-JOIN Olympiad o ON am.Years = o.Years
-ORDER BY am.Total DESC
-LIMIT 10;
\ No newline at end of file
+-- 9. List the top athletes with their medal counts and the corresponding Olympic host city
+-- (the overall top 10 is always within the top 10 of each year):
+SELECT ta.Athlete_Name, ta.Gold, ta.Silver, ta.Bronze, ta.Total, o.Host_City, o.Years
+FROM TopAthletesByYear ta
+JOIN Olympiad o ON ta.Years = o.Years
+ORDER BY ta.Total DESC
+LIMIT 10;
+
+-- Career totals of a country across all Olympics:
+SELECT Team, Games, Gold, Silver, Bronze, Total, First_Year, Last_Year
+FROM CountryCareerTotals
+WHERE Team = 'United States';
\ No newline at end of file
@@ -0,0 +1,195 @@
+import os
+import sys
+import logging
+import argparse
+import pandas as pd
+from datasetCleaner import DATASET_COLUMNS, CSV_FOLDER
+from flagDownloader import DEFAULT_FLAG_DIR, flag_filename
+from metrics import METRICS
+
+# Where ContinentalMedals comes from: scrape (olympiandatabase.com, reconciled
+# against the derived totals) or derive (summed from the ESPN CountryMedals,
+# no pages fetched)
+CONTINENTAL_MEDALS_SOURCE = os.environ.get('CONTINENTAL_MEDALS_SOURCE', 'scrape')
+
+# Folder of the reconciliation report, relative to the code directory
+REPORT_FOLDER = 'reports'
+
+# Reference index of the continent of every flag code (the IOC code ESPN names
+# its flag images by), grouped like the continental associations of the NOCs
+# and named like the continents of the scraped table. `--seed` adds the codes
+# of new flag images and teams with an empty continent to fill in.
+INDEX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'continentIndex.csv')
+
+# Flag codes of teams that belong to no continent (independent and refugee athletes)
+NO_CONTINENT = {'ioc', 'eoi', 'ior'}
+
+MEDAL_COLUMNS = ['Gold', 'Silver', 'Bronze', 'Total']
+
+# Columns compared by the reconciliation, per (Years, Continent)
+RECONCILED_COLUMNS = ['Position'] + MEDAL_COLUMNS
+
+
+def flag_code(url):
+    # .../countries/500/usa.png&w=40 -> usa
+    return os.path.splitext(flag_filename(url))[0].lower()
+
+
+def read_index(index_file=INDEX_FILE):
+    # Flag code -> continent, codes still without a continent are left out
+    index = pd.read_csv(index_file, dtype=str, keep_default_na=False)
+    index = index[index['Continent'] != '']
+    return pd.Series(index['Continent'].values, index=index['Code'].str.lower(), name='Continent')
+
+
+def seed_codes(country_medals=None, flag_dir=DEFAULT_FLAG_DIR):
+    # Flag codes of the downloaded flag images and of the teams in CountryMedals
+    codes = set()
+    if os.path.isdir(flag_dir):
+        codes.update(os.path.splitext(name)[0].lower() for name in os.listdir(flag_dir) if name.endswith('.png'))
+    if country_medals is not None:
+        codes.update(country_medals['Flag_URL'].dropna().map(flag_code))
+    return codes - NO_CONTINENT
+
+
+def seed_index(country_medals=None, flag_dir=DEFAULT_FLAG_DIR, index_file=INDEX_FILE):
+    # Add the codes found in the data and the flag images to the index file,
+    # keeping the continents already assigned. Returns the codes without one.
+    index = pd.read_csv(index_file, dtype=str, keep_default_na=False) if os.path.exists(index_file) \
+        else pd.DataFrame(columns=['Code', 'Continent'])
+    new_codes = sorted(seed_codes(country_medals, flag_dir) - set(index['Code'].str.lower()))
+    if new_codes:
+        index = pd.concat([index, pd.DataFrame({'Code': new_codes, 'Continent': ''})], ignore_index=True)
+        index.sort_values('Code').to_csv(index_file, index=False)
+        logging.info(f"Added {len(new_codes)} flag codes to {index_file}")
+    return sorted(index.loc[index['Continent'] == '', 'Code'])
+
+
+def build_index(country_medals, index_file=INDEX_FILE):
+    # Team -> continent, through the flag code of each team's latest Flag_URL.
+    # A team whose code is not in the index fails the derivation rather than
+    # silently leaving its medals out of the totals.
+    flags = country_medals[['Team', 'Flag_URL']].dropna(subset=['Team'])
+    flags = flags.assign(Code=flags['Flag_URL'].map(flag_code, na_action='ignore'))
+    codes = flags.drop_duplicates('Team', keep='last').set_index('Team')['Code']
+
+    # Teams of independent and refugee athletes belong to no continent
+    excluded = sorted(codes[codes.isin(NO_CONTINENT)].index)
+    if excluded:
+        logging.info(f"Leaving out teams that belong to no continent: {excluded}")
+    codes = codes[~codes.isin(NO_CONTINENT)]
+
+    continents = codes.map(read_index(index_file))
+    unknown = continents.isna()
+    if unknown.any():
+        missing = {team: code for team, code in codes[unknown].items()}
+        raise ValueError(f"No continent for the teams {missing}, run `python continentIndex.py --seed` "
+                         f"and fill in their continents in {index_file}")
+    return continents
+
+
+def derive_continental_medals(country_medals, index):
+    # ContinentalMedals rows summed from CountryMedals for every year it has,
+    # positions ranked by gold, then silver, then bronze like the scraped table.
+    # Teams missing from the index belong to no continent, see build_index.
+    totals = (country_medals.assign(Continent=country_medals['Team'].map(index))
+              .dropna(subset=['Continent', 'Years'])
+              .groupby(['Years', 'Continent'], as_index=False)[MEDAL_COLUMNS].sum())
+    totals = totals.sort_values(['Years', 'Gold', 'Silver', 'Bronze', 'Continent'],
+                                ascending=[False, False, False, False, True])
+    totals['Position'] = totals.groupby('Years').cumcount() + 1
+    return totals[list(DATASET_COLUMNS['ContinentalMedals'])].reset_index(drop=True)
+
+
+def reconcile(derived, scraped):
+    # Rows of the years both tables have where they disagree, with a Status
+    # (mismatch, missing from derived, missing from scraped) and the columns that differ
+    years = set(derived['Years'].dropna()) & set(scraped['Years'].dropna())
+    merged = derived[derived['Years'].isin(years)].merge(
+        scraped[scraped['Years'].isin(years)], on=['Years', 'Continent'], how='outer',
+        suffixes=('_derived', '_scraped'), indicator=True)
+
+    differs = pd.DataFrame({
+        column: merged[f'{column}_derived'].ne(merged[f'{column}_scraped'])
+        for column in RECONCILED_COLUMNS
+    })
+    merged['Differences'] = differs.dot(pd.Index(differs.columns) + ' ').str.strip()
+    merged['Status'] = merged['_merge'].map({
+        'both': 'mismatch', 'left_only': 'missing from scraped', 'right_only': 'missing from derived',
+    }).astype(str)
+    report = merged[(merged['_merge'] != 'both') | differs.any(axis=1)].drop(columns='_merge')
+    return report.sort_values(['Years', 'Continent'], ascending=[False, True]).reset_index(drop=True)
+
+
+def derive_dataset(folder=CSV_FOLDER):
+    # ContinentalMedals derived from the saved CountryMedals
+    country_medals = pd.read_csv(os.path.join(folder, 'CountryMedals.csv'))
+    return derive_continental_medals(country_medals, build_index(country_medals))
+
+
+def write_report(report, report_folder=REPORT_FOLDER):
+    os.makedirs(report_folder, exist_ok=True)
+    report_path = os.path.join(report_folder, 'ContinentalMedals_reconciliation.csv')
+    report.to_csv(report_path, index=False)
+    for status, count in report['Status'].value_counts().items():
+        METRICS.inc('reconciliation_rows_total', int(count), dataset='ContinentalMedals', status=status)
+    return report_path
+
+
+def reconcile_datasets(folder=CSV_FOLDER, report_folder=REPORT_FOLDER):
+    # Compare the scraped ContinentalMedals with the totals derived from
+    # CountryMedals and write the disagreeing rows to the report
+    scraped = pd.read_csv(os.path.join(folder, 'ContinentalMedals.csv'))
+    try:
+        derived = derive_dataset(folder)
+    except ValueError as e:
+        logging.error(f"Cannot reconcile ContinentalMedals: {e}")
+        return None
+    report = reconcile(derived, scraped)
+    report_path = write_report(report, report_folder)
+    if report.empty:
+        logging.info("Derived ContinentalMedals match the scraped table")
+    else:
+        logging.warning(f"{len(report)} ContinentalMedals rows disagree with the totals derived from "
+                        f"CountryMedals, see {report_path}")
+    return report
+
+
+def replaces_saved(derived, folder=CSV_FOLDER, report_folder=REPORT_FOLDER):
+    # Whether derived may replace the saved ContinentalMedals: when there is
+    # none yet, or it has every year of the saved one and agrees with it.
+    # Otherwise the saved table, e.g. scraped before switching to derive, is kept.
+    path = os.path.join(folder, 'ContinentalMedals.csv')
+    if not os.path.exists(path):
+        return True
+    saved = pd.read_csv(path)
+    missing_years = sorted(set(saved['Years'].dropna()) - set(derived['Years'].dropna()))
+    report = reconcile(derived, saved)
+    if not missing_years and report.empty:
+        return True
+    report_path = write_report(report, report_folder)
+    logging.error(f"Keeping {path}: the derived totals lack the years {missing_years} and "
+                  f"{len(report)} rows disagree, see {report_path}. Remove it to save the derived totals.")
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the flag code to continent index.')
+    parser.add_argument('--seed', action='store_true',
+                        help='add the codes of the flag images and of CountryMedals to the index')
+    parser.add_argument('--folder', default=CSV_FOLDER, help='folder of CountryMedals.csv')
+    args = parser.parse_args()
+
+    if args.seed:
+        path = os.path.join(args.folder, 'CountryMedals.csv')
+        country_medals = pd.read_csv(path) if os.path.exists(path) else None
+        unassigned = seed_index(country_medals)
+        if unassigned:
+            logging.warning(f"Fill in the continents of {unassigned} in {INDEX_FILE}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
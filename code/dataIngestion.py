@@ -1,22 +1,47 @@
 import os
+import sys
+import posixpath
 from hdfs import InsecureClient
+from hdfsUploader import HdfsUploader, DEFAULT_WORKERS
+from hdfsCompression import compression_codec
+from metrics import setup as setup_metrics
 import logging
 
 # Configure logging
 logging.basicConfig(
     filename='upload_to_hdfs.log',
-    level=logging.DEBUG,
+    level=os.environ.get('LOG_LEVEL', 'INFO'),
     format='%(asctime)s %(levelname)s:%(message)s'
 )
 
+# Per-request HTTP logging of the HDFS client is only useful when debugging it
+logging.getLogger('urllib3').setLevel(logging.WARNING)
+logging.getLogger('hdfs').setLevel(logging.WARNING)
+
+# Label and export the metrics of this run
+setup_metrics('ingest')
+
+# HDFS connection details, HDFS_URL can point at a local WebHDFS stand-in (see webhdfsStub.py)
+hdfs_url = os.environ.get('HDFS_URL', 'http://100.118.221.23:9870')
+hdfs_user = os.environ.get('HDFS_USER', 'hadoop')
+
 # Set up HDFS client
 logging.info('Setting up HDFS client.')
-hdfs_client = InsecureClient(url='http://100.118.221.23:9870', user='hadoop')
+hdfs_client = InsecureClient(url=hdfs_url, user=hdfs_user)
 
 # Path to the folder containing CSV files on your local machine
-local_csv_folder = 'D:/Study Material/Data_Engineering/Final_Project/Olympics_Data/code/csvFiles'
+local_csv_folder = os.environ.get('LOCAL_CSV_FOLDER', 'D:/Study Material/Data_Engineering/Final_Project/Olympics_Data/code/csvFiles')
+# Typed Parquet partitions written by the scrapers (WRITE_PARQUET=1)
+local_parquet_folder = os.environ.get('LOCAL_PARQUET_FOLDER', 'D:/Study Material/Data_Engineering/Final_Project/Olympics_Data/code/parquetFiles')
 # Path in HDFS where you want to store the files
-hdfs_target_folder = '/home/hadoop/data/nameNode/data/'
+hdfs_target_folder = os.environ.get('HDFS_TARGET_FOLDER', '/home/hadoop/data/nameNode/data/')
+
+# Number of files uploaded in parallel
+upload_workers = int(os.environ.get('UPLOAD_WORKERS', DEFAULT_WORKERS))
+
+# Compression of the CSV files on HDFS: none (the default), gzip or zstd. dataLoading.py
+# detects the codec from the extension. Parquet partitions are already compressed internally.
+compression = compression_codec(os.environ.get('HDFS_COMPRESSION', 'none'))
 
 # Ensure the HDFS target folder exists
 try:
@@ -26,13 +51,50 @@ except Exception as e:
     logging.error(f'Failed to ensure HDFS target folder exists: {e}')
     raise
 
-# Upload each CSV file to HDFS
-for csv_file in os.listdir(local_csv_folder):
-    if csv_file.endswith('.csv'):
-        local_file_path = os.path.join(local_csv_folder, csv_file)
-        hdfs_file_path = os.path.join(hdfs_target_folder, csv_file)
-        try:
-            hdfs_client.upload(hdfs_file_path, local_file_path)
-            logging.info(f'Successfully uploaded {csv_file} to {hdfs_file_path}')
-        except Exception as e:
-            logging.error(f'Failed to upload {csv_file}: {e}')
+# Upload only the CSV files given on the command line, or all of them
+selected_files = set(sys.argv[1:])
+csv_files = [
+    csv_file for csv_file in sorted(os.listdir(local_csv_folder))
+    if csv_file.endswith('.csv') and (not selected_files or csv_file in selected_files)
+]
+
+# Upload changed CSV files to HDFS in parallel, unchanged ones are skipped
+uploader = HdfsUploader(
+    lambda: InsecureClient(url=hdfs_url, user=hdfs_user),
+    hdfs_target_folder,
+    os.path.join(local_csv_folder, '.manifest', 'hdfs_uploads.json'),
+    workers=upload_workers,
+    codec=compression,
+)
+results = uploader.upload_all([os.path.join(local_csv_folder, csv_file) for csv_file in csv_files])
+failed_files = [os.path.basename(path) for path in results['failed']]
+
+# Upload the Parquet partitions of the same datasets under <hdfs_target_folder>/parquet,
+# the scrapers only rewrite partitions whose rows changed so the rest are skipped
+selected_datasets = {os.path.splitext(csv_file)[0] for csv_file in csv_files}
+parquet_files = []
+if os.path.isdir(local_parquet_folder):
+    for dataset in sorted(os.listdir(local_parquet_folder)):
+        if dataset not in selected_datasets:
+            continue
+        for folder, _, files in os.walk(os.path.join(local_parquet_folder, dataset)):
+            parquet_files.extend(os.path.join(folder, name) for name in sorted(files) if name.endswith('.parquet'))
+
+if parquet_files:
+    parquet_uploader = HdfsUploader(
+        lambda: InsecureClient(url=hdfs_url, user=hdfs_user),
+        posixpath.join(hdfs_target_folder, 'parquet'),
+        os.path.join(local_parquet_folder, '_hdfs_uploads.json'),
+        workers=upload_workers,
+        local_root=local_parquet_folder,
+    )
+    parquet_results = parquet_uploader.upload_all(parquet_files)
+    failed_files.extend(os.path.relpath(path, local_parquet_folder) for path in parquet_results['failed'])
+
+# Files that were asked for but do not exist locally also count as failures
+failed_files.extend(sorted(selected_files - set(os.listdir(local_csv_folder))))
+
+# Report failures through the exit code so the pipeline can stop downstream tasks
+if failed_files:
+    logging.error(f'Upload failed for: {failed_files}')
+    sys.exit(1)
@@ -1,23 +1,42 @@
 import pandas as pd
 from hdfs import InsecureClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from bulkLoader import create_loader, quote_identifier, DEFAULT_CHUNK_SIZE, DEFAULT_PREFETCH
+from metrics import METRICS, setup as setup_metrics
+from summaryTables import ensure_summary_tables, scope_keys, refresh as refresh_summaries
+from parquetSink import DATASET_COLUMNS, read_partition, parse_partition, PARTITION_COLUMN, PART_FILENAME
+from deltaLoader import DeltaLoader, touched_years
+from tableDependencies import TABLE_DEPENDENCIES, TABLE_SCHEMAS
+from rowValidator import TableValidator
+from hdfsCompression import path_codec, path_variants, text_stream
 import os
+import sys
+import json
+import posixpath
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Configure logging
 logging.basicConfig(
     filename='data_import.log',
-    level=logging.DEBUG,
+    level=os.environ.get('LOG_LEVEL', 'INFO'),
     format='%(asctime)s %(levelname)s:%(message)s'
 )
 
-# HDFS connection details
-hdfs_host = 'http://100.118.221.23:9870'
-hdfs_user = 'hadoop'
+# Per-request HTTP logging of the HDFS client is only useful when debugging it
+logging.getLogger('urllib3').setLevel(logging.WARNING)
+logging.getLogger('hdfs').setLevel(logging.WARNING)
+
+# Label and export the metrics of this run
+setup_metrics('load')
+
+# HDFS connection details, HDFS_URL can point at a local WebHDFS stand-in (see webhdfsStub.py)
+hdfs_host = os.environ.get('HDFS_URL', 'http://100.118.221.23:9870')
+hdfs_user = os.environ.get('HDFS_USER', 'hadoop')
 hdfs_client = InsecureClient(hdfs_host, user=hdfs_user)
 
 # List of tables and their corresponding HDFS paths
-hdfs_directory = "/home/hadoop/data/nameNode/data/"
+hdfs_directory = os.environ.get('HDFS_TARGET_FOLDER', "/home/hadoop/data/nameNode/data/")
 tables = {
     'Olympiad': hdfs_directory + 'Olympiad.csv',
     'ContinentalMedals': hdfs_directory + 'ContinentalMedals.csv',
@@ -33,22 +52,227 @@ db_host = '192.168.56.101'
 db_port = '3306'  # Default MySQL port
 db_name = 'dataengg'
 
-# Create a connection string
-connection_string = f'mysql+pymysql://{db_username}:{db_password}@{db_host}:{db_port}/{db_name}'
+# Create a connection string, DATABASE_URL can point somewhere else (e.g. sqlite:///olympics.db)
+connection_string = os.environ.get(
+    'DATABASE_URL',
+    f'mysql+pymysql://{db_username}:{db_password}@{db_host}:{db_port}/{db_name}'
+)
+
+# Bulk load backend: auto, multi (multi-row INSERT), infile (MySQL LOAD DATA LOCAL INFILE) or executemany
+load_backend = os.environ.get('LOAD_BACKEND', 'auto')
+load_chunk_size = int(os.environ.get('LOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+
+# Tables loaded at once, each on its own pooled connection. SQLite allows a single
+# writer, so its tables are loaded one at a time by default.
+sqlite = connection_string.startswith('sqlite')
+load_workers = int(os.environ.get('LOAD_WORKERS', 1 if sqlite else 4))
+
+# Create an SQLAlchemy engine, LOAD DATA LOCAL INFILE must also be allowed on the client side
+connect_args = {'local_infile': True} if load_backend == 'infile' else {}
+pool_args = {} if sqlite else {'pool_size': load_workers, 'max_overflow': 0, 'pool_pre_ping': True}
+engine = create_engine(connection_string, connect_args=connect_args, **pool_args)
+loader = create_loader(engine, load_backend, load_chunk_size)
+
+# Summary tables are refreshed in the same transaction as every load
+with engine.begin() as connection:
+    ensure_summary_tables(connection)
+
+# Stream CSVs from HDFS in chunks of load_chunk_size rows, writing each chunk while the
+# next ones download. LOAD_STREAMING=0 reads every file completely before writing.
+load_streaming = os.environ.get('LOAD_STREAMING', '1') == '1'
+load_prefetch = int(os.environ.get('LOAD_PREFETCH', DEFAULT_PREFETCH))
+
+# Source format: csv (whole files) or parquet (Years partitions uploaded by dataIngestion.py)
+load_format = os.environ.get('LOAD_FORMAT', 'csv')
+parquet_directory = hdfs_directory + 'parquet/'
+
+# How rows reach the tables: delta (insert new and update changed rows by natural key,
+# see deltaLoader.py) or append (insert every row, Parquet partitions are replaced)
+load_mode = os.environ.get('LOAD_MODE', 'delta')
+delta_loader = DeltaLoader(engine, loader)
+
+# Also delete rows whose key is no longer in the CSV (delta mode). Parquet partitions
+# always drop the rows missing from them.
+load_delete_missing = os.environ.get('LOAD_DELETE_MISSING', '0') == '1'
+
+# Length and modification time of every Parquet partition at the time it was loaded
+loaded_partitions_folder = os.environ.get('LOADED_PARTITIONS_FOLDER', 'loaded_partitions')
+
+# Newest of every file and its compressed variants on HDFS (see hdfsCompression), so files
+# uploaded before and after a change of HDFS_COMPRESSION can coexist. One listing of
+# hdfs_directory resolves every table.
+def latest_variants(hdfs_paths):
+    try:
+        listing = dict(hdfs_client.list(hdfs_directory, status=True))
+    except Exception as e:
+        logging.warning(f'Failed to list {hdfs_directory}, reading uncompressed CSVs: {e}')
+        return {hdfs_path: hdfs_path for hdfs_path in hdfs_paths}
 
-# Create an SQLAlchemy engine
-engine = create_engine(connection_string)
+    resolved = {}
+    for hdfs_path in hdfs_paths:
+        variants = [
+            (listing[posixpath.basename(path)]['modificationTime'], path)
+            for path in path_variants(hdfs_path) if posixpath.basename(path) in listing
+        ]
+        resolved[hdfs_path] = max(variants)[1] if variants else hdfs_path
+    return resolved
 
-# Function to read CSV from HDFS and convert to Pandas DataFrame
+# Function to read CSV from HDFS and convert to Pandas DataFrame, decompressing it while it downloads
 def read_hdfs_csv(hdfs_path):
     try:
-        with hdfs_client.read(hdfs_path, encoding='utf-8') as reader:
+        with hdfs_client.read(hdfs_path) as reader:
             logging.info(f'Reading CSV file from HDFS path: {hdfs_path}')
-            return pd.read_csv(reader)
+            return pd.read_csv(text_stream(reader, path_codec(hdfs_path)))
     except Exception as e:
         logging.error(f'Failed to read CSV from HDFS path {hdfs_path}: {e}')
         raise
 
+# Generator of DataFrame chunks read from a CSV on HDFS as it downloads
+def read_hdfs_csv_chunks(hdfs_path):
+    try:
+        with hdfs_client.read(hdfs_path) as reader:
+            logging.info(f'Streaming CSV file from HDFS path: {hdfs_path}')
+            yield from pd.read_csv(text_stream(reader, path_codec(hdfs_path)), chunksize=load_chunk_size)
+    except Exception as e:
+        logging.error(f'Failed to stream CSV from HDFS path {hdfs_path}: {e}')
+        raise
+
+# Years loaded into a table, so only their summaries are refreshed. Tables without
+# Years get None and their summaries are rebuilt completely.
+def loaded_years(table_name):
+    return set() if PARTITION_COLUMN in DATASET_COLUMNS.get(table_name, {}) else None
+
+def add_years(years, pandas_df):
+    if years is not None and PARTITION_COLUMN in pandas_df.columns:
+        years.update(int(value) for value in pandas_df[PARTITION_COLUMN].dropna().unique())
+    return pandas_df
+
+# Insert a whole DataFrame and refresh the summaries of its Years in one transaction
+def load_with_summaries(table_name, pandas_df):
+    years = loaded_years(table_name)
+    with engine.begin() as connection:
+        row_count = loader.load(add_years(years, pandas_df), table_name, connection)
+        refresh_summaries(connection, table_name, years)
+    return row_count
+
+# Stream a CSV into its table and refresh the summaries of its Years in one transaction
+def stream_with_summaries(table_name, hdfs_path, validator):
+    years = loaded_years(table_name)
+    with engine.begin() as connection:
+        chunks = (add_years(years, validator.check(chunk)) for chunk in read_hdfs_csv_chunks(hdfs_path))
+        row_count = loader.load_chunks(chunks, table_name, load_prefetch, connection)
+        refresh_summaries(connection, table_name, years)
+    return row_count
+
+# Turn off MySQL foreign key checks while rows of a table are deleted and written back
+def disable_foreign_keys(connection):
+    if engine.dialect.name == 'mysql':
+        connection.execute(text('SET FOREIGN_KEY_CHECKS = 0'))
+
+def enable_foreign_keys(connection):
+    if engine.dialect.name == 'mysql':
+        connection.execute(text('SET FOREIGN_KEY_CHECKS = 1'))
+
+# Write only the new, changed and deleted rows of DataFrame chunks into a table (or one
+# partition of it) and refresh the summaries of the Years they touch in one transaction
+def delta_with_summaries(table_name, chunks, partition_value=None, delete_missing=load_delete_missing):
+    with engine.begin() as connection:
+        delta = delta_loader.plan(connection, table_name, chunks, partition_value, delete_missing)
+        if delta.inserts.empty and delta.updates.empty and delta.deletes.empty:
+            return 0
+        years = touched_years(delta)
+        # Olympiad keys stored twice are deleted and inserted again, references stay valid
+        disable_foreign_keys(connection)
+        try:
+            before = None
+            if inspect(connection).has_table(table_name):
+                # Summary keys of the rows about to change, they may not come back
+                before = scope_keys(connection, table_name, years)
+            row_count = delta_loader.apply(connection, table_name, delta)
+            refresh_summaries(connection, table_name, years, before)
+            return row_count
+        finally:
+            enable_foreign_keys(connection)
+
+# List the part files of a table's Parquet layout as (Years value or None, HDFS path, FileStatus)
+def list_parquet_partitions(table_name):
+    table_directory = parquet_directory + table_name
+    partitions = []
+    for name, status in hdfs_client.list(table_directory, status=True):
+        if status['type'] == 'DIRECTORY':
+            partition_value = parse_partition(name)
+            if partition_value is not None:
+                part_path = f'{table_directory}/{name}/{PART_FILENAME}'
+                partitions.append((partition_value, part_path, hdfs_client.status(part_path)))
+        elif name == PART_FILENAME:
+            partitions.append((None, f'{table_directory}/{name}', status))
+    return partitions
+
+# Function to read one Parquet partition from HDFS into a Pandas DataFrame
+def read_hdfs_parquet(hdfs_path, table_name, partition_value):
+    try:
+        with hdfs_client.read(hdfs_path) as reader:
+            logging.info(f'Reading Parquet partition from HDFS path: {hdfs_path}')
+            with METRICS.timer('hdfs_read_seconds', table=table_name):
+                data = reader.read()
+            METRICS.inc('hdfs_read_bytes_total', len(data), table=table_name)
+            return read_partition(data, table_name, partition_value)
+    except Exception as e:
+        logging.error(f'Failed to read Parquet from HDFS path {hdfs_path}: {e}')
+        raise
+
+# Replace the rows of one partition (or the whole table) in a single transaction
+def replace_partition(table_name, partition_value, pandas_df):
+    table = quote_identifier(engine, table_name)
+    years = None if partition_value is None else [partition_value]
+    with engine.begin() as connection:
+        # Olympiad rows are re-inserted with the same Years, so references stay valid
+        disable_foreign_keys(connection)
+        try:
+            before = None
+            if inspect(connection).has_table(table_name):
+                # Summary keys of the rows about to be replaced, they may not come back
+                before = scope_keys(connection, table_name, years)
+                if partition_value is None:
+                    connection.execute(text(f'DELETE FROM {table}'))
+                else:
+                    column = quote_identifier(engine, PARTITION_COLUMN)
+                    connection.execute(text(f'DELETE FROM {table} WHERE {column} = :value'), {'value': partition_value})
+            row_count = loader.load(pandas_df, table_name, connection)
+            refresh_summaries(connection, table_name, years, before)
+            return row_count
+        finally:
+            enable_foreign_keys(connection)
+
+# Load only the Parquet partitions that changed on HDFS since they were last loaded
+def load_parquet_table(table_name, validator):
+    manifest_path = os.path.join(loaded_partitions_folder, f'{table_name}.json')
+    loaded = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            loaded = json.load(f)
+
+    row_count = 0
+    for partition_value, part_path, status in list_parquet_partitions(table_name):
+        signature = [status['length'], status['modificationTime']]
+        if loaded.get(part_path) == signature:
+            logging.info(f'Skipping unchanged partition {part_path}')
+            continue
+
+        pandas_df = validator.check(read_hdfs_parquet(part_path, table_name, partition_value))
+        if load_mode == 'delta':
+            row_count += delta_with_summaries(table_name, [pandas_df], partition_value, delete_missing=True)
+        else:
+            row_count += replace_partition(table_name, partition_value, pandas_df)
+
+        # Remember the partition right away so a later failure does not reload it
+        loaded[part_path] = signature
+        os.makedirs(loaded_partitions_folder, exist_ok=True)
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(loaded, f, indent=2, sort_keys=True)
+
+    return row_count
+
 # # Function to read Excel from HDFS and convert to Pandas DataFrame
 # def read_hdfs_excel(hdfs_path):
 #     try:
@@ -59,22 +283,120 @@ def read_hdfs_csv(hdfs_path):
 #         logging.error(f'Failed to read Excel from HDFS path {hdfs_path}: {e}')
 #         raise
 
-# Iterate over the tables dictionary
-for table_name, hdfs_path in tables.items():
-    try:
-        logging.info(f'Processing table: {table_name} from path: {hdfs_path}')
-        if hdfs_path.endswith('.csv'):
-            # Read CSV file from HDFS into a Pandas DataFrame
-            pandas_df = read_hdfs_csv(hdfs_path)
-        # elif hdfs_path.endswith('.xls') or hdfs_path.endswith('.xlsx'):
-        #     # Read Excel file from HDFS into a Pandas DataFrame
-        #     pandas_df = read_hdfs_excel(hdfs_path)
-        else:
-            logging.warning(f'Unsupported file type: {hdfs_path}')
-            continue
+# Checks the rows of a table load against schemaFile.sql. Its parents are loaded first,
+# so the values its foreign keys may hold are read from them. A parent that is missing
+# or empty fails the table instead of quarantining every row, e.g. when a child is
+# loaded on its own before its parent ever was.
+def create_validator(table_name):
+    parent_keys = {}
+    schema = TABLE_SCHEMAS.get(table_name)
+    with engine.connect() as connection:
+        for key in (schema.foreign_keys if schema else []):
+            if not inspect(connection).has_table(key.parent):
+                raise RuntimeError(f'{table_name} references {key.parent}, which does not exist, load {key.parent} first')
+            column = quote_identifier(engine, key.parent_column)
+            select = f'SELECT DISTINCT {column} FROM {quote_identifier(engine, key.parent)}'
+            values = {row[0] for row in connection.execute(text(select)) if row[0] is not None}
+            if not values:
+                raise RuntimeError(f'{table_name} references {key.parent}, which has no {key.parent_column} values, '
+                                   f'load {key.parent} first')
+            parent_keys[key.column] = values
+    return TableValidator(table_name, parent_keys)
 
-        # Insert data into SQL table
-        pandas_df.to_sql(name=table_name, con=engine, if_exists='append', index=False)
-        logging.info(f'Successfully inserted data into {table_name}')
-    except Exception as e:
-        logging.error(f'Failed to insert data into {table_name}: {e}')
+# Load one table from HDFS in its own transaction(s), returns the rows written
+def load_table(table_name):
+    hdfs_path = tables[table_name]
+    validator = create_validator(table_name)
+    if load_format == 'parquet':
+        logging.info(f'Processing table: {table_name} from Parquet partitions in {parquet_directory}')
+        row_count = load_parquet_table(table_name, validator)
+        logging.info(f'Successfully loaded {row_count} changed rows into {table_name}')
+        return row_count
+
+    # The CSV may be stored compressed, read whichever copy was uploaded last
+    source_path = source_paths.get(hdfs_path, hdfs_path)
+    logging.info(f'Processing table: {table_name} from path: {source_path}')
+    if hdfs_path.endswith('.csv') and load_mode == 'delta':
+        # Only the differences with the table are written
+        chunks = read_hdfs_csv_chunks(source_path) if load_streaming else [read_hdfs_csv(source_path)]
+        row_count = delta_with_summaries(table_name, (validator.check(chunk) for chunk in chunks))
+        logging.info(f'Successfully wrote {row_count} changed rows into {table_name}')
+        return row_count
+    elif hdfs_path.endswith('.csv') and load_streaming:
+        row_count = stream_with_summaries(table_name, source_path, validator)
+        logging.info(f'Successfully streamed {row_count} rows into {table_name}')
+        return row_count
+    elif hdfs_path.endswith('.csv'):
+        # Read CSV file from HDFS into a Pandas DataFrame
+        pandas_df = validator.check(read_hdfs_csv(source_path))
+    # elif hdfs_path.endswith('.xls') or hdfs_path.endswith('.xlsx'):
+    #     # Read Excel file from HDFS into a Pandas DataFrame
+    #     pandas_df = read_hdfs_excel(hdfs_path)
+    else:
+        logging.warning(f'Unsupported file type: {hdfs_path}')
+        return 0
+
+    # Insert data into SQL table in large batches
+    row_count = load_with_summaries(table_name, pandas_df)
+    logging.info(f'Successfully inserted {row_count} rows into {table_name}')
+    return row_count
+
+# Load tables in parallel on load_workers threads, each table as soon as the tables its
+# foreign keys reference (TABLE_DEPENDENCIES, from schemaFile.sql) have loaded. Tables
+# whose parents failed, directly or further up, are not loaded. Returns the tables that
+# failed or were skipped.
+def load_tables(table_names):
+    waiting = {
+        table: {parent for parent in TABLE_DEPENDENCIES.get(table, []) if parent in table_names}
+        for table in table_names
+    }
+    failed = []
+    running = {}
+    with ThreadPoolExecutor(max_workers=load_workers) as executor:
+        while waiting or running:
+            for table in [table for table, parents in waiting.items() if not parents]:
+                del waiting[table]
+                running[executor.submit(load_table, table)] = table
+            if not running:
+                logging.error(f'Foreign keys form a cycle between {sorted(waiting)}')
+                return failed + list(waiting)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                table = running.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f'Failed to insert data into {table}: {e}')
+                    failed.append(table)
+                    # Rows of the children, and of their children in turn, could
+                    # reference rows that are not there
+                    skipped = [table]
+                    while skipped:
+                        parent = skipped.pop()
+                        for child in [child for child, parents in waiting.items() if parent in parents]:
+                            logging.error(f'Skipping {child}, it references {parent}')
+                            del waiting[child]
+                            failed.append(child)
+                            skipped.append(child)
+                    continue
+                for parents in waiting.values():
+                    parents.discard(table)
+    return failed
+
+# Load only the tables given on the command line, or all of them
+selected_tables = sys.argv[1:] or list(tables)
+unknown_tables = [table_name for table_name in selected_tables if table_name not in tables]
+for table_name in unknown_tables:
+    logging.error(f'Unknown table: {table_name}')
+
+selected_tables = [table_name for table_name in selected_tables if table_name in tables]
+
+# Which copy of every CSV to read, resolved once for all tables
+source_paths = latest_variants([tables[table_name] for table_name in selected_tables]) if load_format == 'csv' else {}
+
+failed_tables = unknown_tables + load_tables(selected_tables)
+
+# Report failures through the exit code so the pipeline can stop downstream tasks
+if failed_tables:
+    sys.exit(1)
@@ -0,0 +1,215 @@
+import os
+import time
+import logging
+from collections import namedtuple
+import pandas as pd
+from metrics import METRICS
+
+# One output column: its name in schemaFile.sql, the scraped headers it can
+# come from (first one present wins), its type and an optional parser that
+# turns the raw text into the value
+Column = namedtuple('Column', ['name', 'sources', 'dtype', 'parse'], defaults=[None])
+
+# Scraped values meaning "no value", compared after stripping whitespace
+NULL_TOKENS = ['', 'None', 'none', 'NaN', 'nan', 'N/A', 'n/a']
+
+# Pandas types used for the schema types
+PANDAS_DTYPES = {'int32': 'Int32', 'string': 'string'}
+
+# Folders the cleaned datasets are written to, relative to the code directory
+CSV_FOLDER = 'csvFiles'
+PARQUET_FOLDER = os.environ.get('PARQUET_FOLDER', 'parquetFiles')
+
+
+def parse_int(values):
+    # First number in the text, thousands separators dropped: '1.' -> 1, '11,315' -> 11315
+    return values.str.extract(r'(\d[\d,]*)', expand=False).str.replace(',', '', regex=False)
+
+
+def parse_host_city(values):
+    # 'Tokyo 2020' -> 'Tokyo'
+    return values.str.replace(r'\s+\d{4}$', '', regex=True)
+
+
+def parse_host_year(values):
+    # 'Tokyo 2020' -> '2020'
+    return values.str.extract(r'(\d{4})$', expand=False)
+
+
+# Declarative schema of every dataset, column order is the output order
+DATASET_SCHEMAS = {
+    'Olympiad': [
+        Column('Years', ['Years', 'Host City'], 'int32', parse_host_year),
+        Column('Host_City', ['Host_City', 'Host City'], 'string', parse_host_city),
+        Column('Nations', ['Nations'], 'int32'),
+        Column('Athletes', ['Athletes'], 'int32'),
+    ],
+    'ContinentalMedals': [
+        Column('Years', ['Years', 'Year'], 'int32'),
+        Column('Position', ['Position', 'Rank'], 'int32'),
+        Column('Continent', ['Continent'], 'string'),
+        Column('Gold', ['Gold'], 'int32'),
+        Column('Silver', ['Silver'], 'int32'),
+        Column('Bronze', ['Bronze'], 'int32'),
+        Column('Total', ['Total'], 'int32'),
+    ],
+    'Sports': [
+        Column('Abbreviation', ['Abbreviation'], 'string'),
+        Column('Discipline', ['Discipline'], 'string'),
+        Column('Sport', ['Sport'], 'string'),
+        Column('Season', ['Season'], 'string'),
+    ],
+    'AthletesMedals': [
+        Column('Athlete_Name', ['Athlete_Name', 'ATHLETE', 'NAME', 'GROUP'], 'string'),
+        Column('Gold', ['Gold', 'G'], 'int32'),
+        Column('Silver', ['Silver', 'S'], 'int32'),
+        Column('Bronze', ['Bronze', 'B'], 'int32'),
+        Column('Total', ['Total', 'TOTAL'], 'int32'),
+        Column('Years', ['Years', 'Year'], 'int32'),
+    ],
+    'CountryMedals': [
+        Column('Team', ['Team', 'GROUP', 'COUNTRY'], 'string'),
+        Column('Gold', ['Gold', 'G'], 'int32'),
+        Column('Silver', ['Silver', 'S'], 'int32'),
+        Column('Bronze', ['Bronze', 'B'], 'int32'),
+        Column('Total', ['Total', 'TOTAL'], 'int32'),
+        Column('Years', ['Years', 'Year'], 'int32'),
+        Column('Flag_URL', ['Flag_URL', 'Flag URL'], 'string'),
+    ],
+}
+
+# Column types per dataset, e.g. for the Parquet schema
+DATASET_COLUMNS = {
+    dataset: {column.name: column.dtype for column in columns}
+    for dataset, columns in DATASET_SCHEMAS.items()
+}
+
+# Natural key of every dataset: the columns identifying a row across loads
+DATASET_KEYS = {
+    'Olympiad': ['Years'],
+    'ContinentalMedals': ['Continent', 'Years'],
+    'Sports': ['Abbreviation'],
+    'AthletesMedals': ['Athlete_Name', 'Years'],
+    'CountryMedals': ['Team', 'Years'],
+}
+
+
+def find_source(df, dataset, column):
+    for source in column.sources:
+        if source in df.columns:
+            return source
+    raise ValueError(f"{dataset}: none of {column.sources} found in columns {list(df.columns)}")
+
+
+def clean_dataset(df, dataset):
+    # Turn scraped rows into load-ready rows in one pass over the columns:
+    # pick the source column, strip it, map null tokens to NA, parse it and
+    # cast it to the schema type. Rows without any value and duplicate rows
+    # are dropped afterwards.
+    started = time.perf_counter()
+    cleaned = {}
+    for column in DATASET_SCHEMAS[dataset]:
+        raw = df[find_source(df, dataset, column)]
+        values = raw.astype('string').str.strip()
+        values = values.mask(values.isin(NULL_TOKENS))
+        present = values.notna()
+
+        if column.parse is not None:
+            values = column.parse(values)
+        elif column.dtype == 'int32':
+            values = parse_int(values)
+
+        if column.dtype == 'int32':
+            values = pd.to_numeric(values, errors='coerce').astype(PANDAS_DTYPES['int32'])
+        else:
+            values = values.astype(PANDAS_DTYPES[column.dtype])
+
+        # Values that were there but could not be parsed
+        unparsed = int((present & values.isna()).sum())
+        if unparsed:
+            logging.warning(f"{dataset}.{column.name}: {unparsed} values could not be parsed and are stored as null")
+        cleaned[column.name] = values
+
+    cleaned_df = pd.DataFrame(cleaned).dropna(how='all').drop_duplicates().reset_index(drop=True)
+    METRICS.observe('clean_seconds', time.perf_counter() - started, dataset=dataset)
+    logging.info(f"Cleaned {dataset}: {len(df)} scraped rows, {len(cleaned_df)} kept")
+    return cleaned_df
+
+
+def save_dataset(df, dataset):
+    # Write the cleaned dataset to csvFiles, and as Years-partitioned
+    # Parquet when WRITE_PARQUET=1
+    os.makedirs(CSV_FOLDER, exist_ok=True)
+    csv_filename = os.path.join(CSV_FOLDER, f'{dataset}.csv')
+    df.to_csv(csv_filename, index=False)
+    METRICS.inc('rows_total', len(df), dataset=dataset)
+    METRICS.inc('csv_bytes_total', os.path.getsize(csv_filename), dataset=dataset)
+    logging.info(f"Cleaned data saved to {csv_filename}")
+
+    if os.environ.get('WRITE_PARQUET') == '1':
+        # Imported here, parquetSink takes its column types from this module
+        from parquetSink import write_dataset
+        write_dataset(df, dataset, PARQUET_FOLDER)
+    return csv_filename
+
+
+class DatasetWriter:
+    # Streaming counterpart of save_dataset for datasets produced in batches:
+    # cleaned batches are appended to the CSV (and Parquet partitions) as they
+    # arrive, so memory stays flat however many batches there are. Rows that
+    # were already written are skipped like drop_duplicates would. The outputs
+    # only replace the previous ones when the writer is closed without error.
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.rows = 0
+        self._seen = set()
+        os.makedirs(CSV_FOLDER, exist_ok=True)
+        self.csv_filename = os.path.join(CSV_FOLDER, f'{dataset}.csv')
+        self._tmp_path = self.csv_filename + '.tmp'
+        self._file = open(self._tmp_path, 'w', encoding='utf-8', newline='')
+        pd.DataFrame(columns=list(DATASET_COLUMNS[dataset])).to_csv(self._file, index=False)
+
+        self._parquet = None
+        if os.environ.get('WRITE_PARQUET') == '1':
+            # Imported here, parquetSink takes its column types from this module
+            from parquetSink import PartitionedWriter
+            self._parquet = PartitionedWriter(dataset, PARQUET_FOLDER)
+
+    def write(self, df):
+        # Append one cleaned batch
+        hashes = pd.util.hash_pandas_object(df, index=False)
+        new = ~hashes.isin(self._seen) & ~hashes.duplicated()
+        df = df[new.to_numpy()]
+        if df.empty:
+            return
+        self._seen.update(hashes[new])
+        df.to_csv(self._file, index=False, header=False)
+        if self._parquet is not None:
+            self._parquet.write(df)
+        self.rows += len(df)
+
+    def close(self):
+        self._file.close()
+        os.replace(self._tmp_path, self.csv_filename)
+        METRICS.inc('rows_total', self.rows, dataset=self.dataset)
+        METRICS.inc('csv_bytes_total', os.path.getsize(self.csv_filename), dataset=self.dataset)
+        logging.info(f"Cleaned data saved to {self.csv_filename} ({self.rows} rows)")
+        if self._parquet is not None:
+            self._parquet.close()
+        return self.csv_filename
+
+    def abort(self):
+        # Keep the outputs of the previous run
+        self._file.close()
+        os.remove(self._tmp_path)
+        if self._parquet is not None:
+            self._parquet.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
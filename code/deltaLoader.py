@@ -0,0 +1,143 @@
+import logging
+from collections import namedtuple
+import pandas as pd
+from sqlalchemy import text, inspect
+from bulkLoader import quote_identifier, df_to_rows
+from datasetCleaner import DATASET_COLUMNS, DATASET_KEYS
+from parquetSink import apply_schema, PARTITION_COLUMN
+from metrics import METRICS
+
+# Changes between a source and its table: rows to insert and to update (all
+# schema columns), keys to delete (key columns) and the number of rows that
+# are already up to date
+Delta = namedtuple('Delta', ['inserts', 'updates', 'deletes', 'unchanged'])
+
+
+def row_hashes(typed, columns):
+    # 64-bit hash per row of the given columns
+    return pd.util.hash_pandas_object(typed[columns], index=False).to_numpy()
+
+
+def touched_years(delta):
+    # Years of every row the delta writes or deletes, None for tables without Years
+    frames = [delta.inserts, delta.updates, delta.deletes]
+    if not all(PARTITION_COLUMN in frame.columns for frame in frames):
+        return None
+    return {int(year) for frame in frames for year in frame[PARTITION_COLUMN].dropna().unique()}
+
+
+class DeltaLoader:
+    # Loads a table as a delta against the rows it already holds instead of
+    # appending. Rows are hashed on their natural key (DATASET_KEYS) and on
+    # all their values, the same hashes are computed for the rows in the
+    # table, and only new rows are inserted and changed rows updated, so
+    # reloading unchanged data writes nothing. Keys that vanished from the
+    # source can be deleted, and keys stored more than once (e.g. by earlier
+    # appends) are rewritten as a single row.
+    def __init__(self, engine, loader):
+        self.engine = engine
+        self.loader = loader
+
+    def _quote(self, name):
+        return quote_identifier(self.engine, name)
+
+    def _target(self, connection, table_name, partition_value):
+        # Rows already in the table, or in one Years partition of it, typed like the source
+        if not inspect(connection).has_table(table_name):
+            return None
+        columns = ', '.join(self._quote(column) for column in DATASET_COLUMNS[table_name])
+        select = f'SELECT {columns} FROM {self._quote(table_name)}'
+        params = {}
+        if partition_value is not None:
+            select += f' WHERE {self._quote(PARTITION_COLUMN)} = :value'
+            params = {'value': partition_value}
+        return apply_schema(pd.read_sql(text(select), connection, params=params), table_name)
+
+    def plan(self, connection, table_name, chunks, partition_value=None, delete_missing=False):
+        # Compare an iterable of source DataFrames with the table. With
+        # partition_value only that partition of the table is compared.
+        keys = DATASET_KEYS[table_name]
+        columns = list(DATASET_COLUMNS[table_name])
+
+        target = self._target(connection, table_name, partition_value)
+        if target is None:
+            target = apply_schema(pd.DataFrame(columns=columns), table_name)
+        target_keys = row_hashes(target, keys)
+        stored = pd.Series(target_keys).duplicated(keep=False).to_numpy()
+        # Key hash -> value hash of the rows stored once, keys stored more than once
+        existing = dict(zip(target_keys[~stored], row_hashes(target, columns)[~stored]))
+        repeated = set(target_keys[stored])
+
+        inserts, updates, deletes = [], [], []
+        seen = set()
+        unchanged = 0
+        for chunk in chunks:
+            typed = apply_schema(chunk, table_name)
+            without_key = typed[keys].isna().any(axis=1).to_numpy()
+            if without_key.any():
+                logging.warning(f'{table_name}: skipping {int(without_key.sum())} rows without a value for {keys}')
+                typed = typed[~without_key].reset_index(drop=True)
+
+            key_hashes = row_hashes(typed, keys)
+            value_hashes = row_hashes(typed, columns)
+
+            # The first row of a key wins if the source repeats it
+            first = ~pd.Series(key_hashes).duplicated().to_numpy() & ~pd.Series(key_hashes).isin(seen).to_numpy()
+            if not first.all():
+                logging.warning(f'{table_name}: skipping {int((~first).sum())} rows repeating a key')
+            seen.update(key_hashes[first])
+
+            stored_hashes = [existing.get(key_hash) for key_hash in key_hashes]
+            is_new = first & pd.Series([value is None for value in stored_hashes]).to_numpy()
+            is_repeated = first & pd.Series(key_hashes).isin(repeated).to_numpy()
+            is_new &= ~is_repeated
+            is_changed = first & ~is_new & ~is_repeated & (
+                pd.Series([stored != value for stored, value in zip(stored_hashes, value_hashes)]).to_numpy())
+
+            unchanged += int((first & ~is_new & ~is_repeated & ~is_changed).sum())
+            inserts.append(typed[is_new | is_repeated])
+            updates.append(typed[is_changed])
+            deletes.append(typed.loc[is_repeated, keys])
+
+        if delete_missing:
+            vanished = ~pd.Series(target_keys).isin(seen).to_numpy()
+            deletes.append(target.loc[vanished, keys])
+
+        empty = target.iloc[:0]
+        delta = Delta(
+            inserts=pd.concat([empty] + inserts, ignore_index=True),
+            updates=pd.concat([empty] + updates, ignore_index=True),
+            deletes=pd.concat([empty[keys]] + deletes, ignore_index=True).drop_duplicates(),
+            unchanged=unchanged,
+        )
+        logging.info(f'Delta for {table_name}: {len(delta.inserts)} to insert, {len(delta.updates)} to update, '
+                     f'{len(delta.deletes)} keys to delete, {delta.unchanged} unchanged')
+        return delta
+
+    def apply(self, connection, table_name, delta):
+        # Write a delta inside the caller's transaction, returns the rows written
+        keys = DATASET_KEYS[table_name]
+        table = self._quote(table_name)
+        where = ' AND '.join(f'{self._quote(key)} = :k{i}' for i, key in enumerate(keys))
+        key_params = [f'k{i}' for i in range(len(keys))]
+
+        if not delta.deletes.empty:
+            with METRICS.timer('db_delete_seconds', table=table_name):
+                connection.execute(text(f'DELETE FROM {table} WHERE {where}'),
+                                   [dict(zip(key_params, row)) for row in df_to_rows(delta.deletes[keys])])
+
+        if not delta.updates.empty:
+            values = [column for column in DATASET_COLUMNS[table_name] if column not in keys]
+            assignments = ', '.join(f'{self._quote(column)} = :v{i}' for i, column in enumerate(values))
+            value_params = [f'v{i}' for i in range(len(values))]
+            with METRICS.timer('db_update_seconds', table=table_name):
+                connection.execute(text(f'UPDATE {table} SET {assignments} WHERE {where}'),
+                                   [dict(zip(value_params + key_params, row))
+                                    for row in df_to_rows(delta.updates[values + keys])])
+
+        inserted = self.loader.load(delta.inserts, table_name, connection) if not delta.inserts.empty else 0
+
+        for change, count in (('insert', inserted), ('update', len(delta.updates)),
+                              ('delete', len(delta.deletes)), ('unchanged', delta.unchanged)):
+            METRICS.inc('delta_rows_total', count, table=table_name, change=change)
+        return inserted + len(delta.updates) + len(delta.deletes)
@@ -0,0 +1,131 @@
+import queue
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# Default number of browsers kept alive by a pool
+DEFAULT_POOL_SIZE = 3
+
+# Default minimum number of seconds between two page loads on the same host
+DEFAULT_REQUEST_INTERVAL = 1.0
+
+
+def _is_timeout(error):
+    # Imported here so the pool can be imported without loading selenium
+    from selenium.common.exceptions import TimeoutException
+    return isinstance(error, TimeoutException)
+
+
+class HostRateLimiter:
+    # Hands out time slots per host so that concurrent workers never hit the
+    # same site more often than once every min_interval seconds
+    def __init__(self, min_interval=DEFAULT_REQUEST_INTERVAL):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+
+        delay = slot - now
+        if delay > 0:
+            logging.debug(f"Rate limiting {host}: waiting {delay:.2f}s")
+            time.sleep(delay)
+
+
+class DriverPool:
+    # A bounded set of WebDriver instances shared between worker threads.
+    # Drivers are started lazily (at most `size` of them) and reused for every
+    # page instead of starting a new Chrome per page.
+    def __init__(self, driver_factory, size=DEFAULT_POOL_SIZE, rate_limiter=None):
+        if size < 1:
+            raise ValueError("Driver pool size must be at least 1")
+        self.size = size
+        self.rate_limiter = rate_limiter
+        self._driver_factory = driver_factory
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _acquire(self):
+        # Block until one of the `size` slots is free, then reuse an idle
+        # driver or start a new one for that slot
+        self._slots.acquire()
+        if self._closed:
+            self._slots.release()
+            raise RuntimeError("Driver pool is closed")
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        try:
+            logging.info("Starting pooled driver")
+            return self._driver_factory()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, driver):
+        if self._closed:
+            self._discard(driver)
+        else:
+            self._idle.put(driver)
+            self._slots.release()
+
+    def _discard(self, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.warning(f"Failed to quit driver: {str(e)}")
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def driver(self):
+        driver = self._acquire()
+        try:
+            yield driver
+        except Exception as e:
+            if _is_timeout(e):
+                # The page was slow, the browser itself is still usable
+                self._release(driver)
+            else:
+                # The browser may be in an unknown state, replace it next time
+                self._discard(driver)
+            raise
+        else:
+            self._release(driver)
+
+    def get(self, driver, url):
+        # Load a page on a pooled driver, respecting the per-host rate limit
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait(url)
+        driver.get(url)
+
+    def close(self):
+        self._closed = True
+
+        # Drivers still in use are quit by their worker when released
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                driver.quit()
+            except Exception as e:
+                logging.warning(f"Failed to quit driver: {str(e)}")
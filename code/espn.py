@@ -1,87 +1,75 @@
-import os
-import time
+import sys
 import pandas as pd
-import requests
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 import logging
-from fake_useragent import UserAgent
-from sqlalchemy import create_engine
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-def create_driver_with_random_user_agent(headless=True):
-    # Generate a random User-Agent
-    user_agent = UserAgent().random
-
-    # Set up Chrome options
-    options = Options()
-    if headless:
-        options.add_argument("--headless")  # Ensure GUI is off
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument(f'user-agent={user_agent}')
-
-    # Initialize the Chrome driver with the options
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    return driver
-
-def download_image(url, save_path):
-    try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        with open(save_path, 'wb') as f:
-            f.write(response.content)
-        logging.info(f"Downloaded image to {save_path}")
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Failed to download image from {url}: {str(e)}")
-
-def scrape_table_data(url, year, data_type):
-    logging.info(f"Scraping {data_type} data for {year} from {url}")
-    
-    driver = create_driver_with_random_user_agent(False)
-    driver.get(url)
-
-    # Wait until the table is present
-    table = WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.CSS_SELECTOR, 'table.medals.olympics.has-team-logos'))
-    )
-
+from httpFetcher import FETCH_BROWSER
+from tableExtractor import parse_tables
+from scrapeManifest import DatasetManifest, records_digest
+from datasetCleaner import clean_dataset, save_dataset, DatasetWriter
+from continentIndex import CONTINENTAL_MEDALS_SOURCE, derive_dataset, replaces_saved
+from sources import Source, TableNotFound, register, run_sources
+from metrics import setup as setup_metrics
+
+# Medals table on both the country and athlete pages
+MEDALS_TABLE_SELECTOR = 'table.medals.olympics.has-team-logos'
+MEDALS_TABLE_CLASSES = 'medals olympics has-team-logos'
+
+# Team cells hold the full name and a short name only shown on narrow screens,
+# hidden in the browser window the pages are rendered in
+MEDALS_HIDDEN_CLASSES = 'show-mobile'
+
+# Text of the athlete pages past the last page of results, in place of the medals table
+ATHLETES_END_MARKER = 'No results found'
+
+# Upper bound on the athlete result pages of one year, in case the end of
+# the results is never detected
+MAX_ATHLETE_PAGES = 100
+
+# Athlete pages of one year failing in a row before the rest of the year is
+# left to the next run
+MAX_FAILED_ATHLETE_PAGES = 3
+
+# URLs to scrape for country medals
+COUNTRY_URLS = {
+    2004: 'https://www.espn.com/olympics/summer/2004/medals/_/view/overall',
+    2008: 'https://www.espn.com/olympics/summer/2008/medals/_/view/overall',
+    2012: 'https://www.espn.com/olympics/summer/2012/medals/_/view/overall',
+    2016: 'https://www.espn.com/olympics/summer/2016/medals/_/view/overall',
+    2020: 'https://www.espn.com/olympics/summer/2020/medals/_/view/overall'
+}
+
+# URLs to scrape for athletes, paginated with /sort/total/page/<page>
+ATHLETE_URLS = {
+    2004: 'https://www.espn.com/olympics/summer/2004/medals/_/view/athletes',
+    2008: 'https://www.espn.com/olympics/summer/2008/medals/_/view/athletes',
+    2012: 'https://www.espn.com/olympics/summer/2012/medals/_/view/athletes',
+    2016: 'https://www.espn.com/olympics/summer/2016/medals/_/view/athletes',
+    2020: 'https://www.espn.com/olympics/summer/2020/medals/_/view/athletes'
+}
+
+def athlete_page_url(url, page):
+    return f"{url}/sort/total/page/{page}"
+
+def parse_country_table(table, year, flags=None):
     # Extract the table headers
-    headers = [th.text for th in table.find_elements(By.CSS_SELECTOR, 'thead th')]
-    logging.info(f"Table headers: {headers}")
+    headers = list(table.headers)
+    logging.debug("Table headers: %s", headers)
 
     # Add header for the flag URL
     headers.append('Flag URL')
 
-    # Extract the table rows
-    rows = table.find_elements(By.CSS_SELECTOR, 'tbody tr')
-
-    # Create directory to save flag images
-    os.makedirs('flag_images', exist_ok=True)
-
     # Extract data from each row
     data = []
-    for row in rows:
-        cols = row.find_elements(By.CSS_SELECTOR, 'td')
-        cols_text = [col.text for col in cols]
+    for row in table.rows:
+        cols_text = row.cells
 
         # Try to get the flag URL
-        flag_url = ""
-        try:
-            flag_url = row.find_element(By.CSS_SELECTOR, 'td.team img').get_attribute('src')
-            flag_filename = flag_url.split('/')[-1].split('&')[0]  # Extract filename from URL
-            flag_save_path = os.path.join('flag_images', flag_filename)
-            download_image(flag_url, flag_save_path)
-        except Exception as e:
+        flag_url = row.image('team')
+        if flag_url:
+            # Queue the flag image, the download runs in the background
+            if flags is not None:
+                flags.submit(flag_url)
+        else:
             flag_url = None
-            flag_save_path = None
             logging.warning(f"No flag image found for row: {cols_text}, setting Flag URL to None.")
 
         # Add year and flag URL to the row data
@@ -89,121 +77,168 @@ def scrape_table_data(url, year, data_type):
         row_data['Year'] = year
         row_data['Flag URL'] = flag_url
         data.append(row_data)
-        logging.info(f"Row data for {year}: {cols_text} with Flag URL: {flag_url}")
+        logging.debug("Row data for %s: %s with Flag URL: %s", year, cols_text, flag_url)
 
-    driver.quit()
     return data
 
-def scrape_athlete_data(url, year):
-    logging.info(f"Scraping athlete data for {year} from {url}")
-    all_data = []
-
-    for page in range(1, 2):  # Iterate over the first 2 pages
-        paginated_url = f"{url}/sort/total/page/{page}"
-        logging.info(f"Opening URL: {paginated_url}")
-
-        driver = create_driver_with_random_user_agent()
-        driver.get(paginated_url)
-
-        # Wait until the table is present
-        table = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'table.medals.olympics.has-team-logos'))
-        )
-
-        # Extract the table headers
-        headers = [th.text for th in table.find_elements(By.CSS_SELECTOR, 'thead th')]
-        logging.info(f"Table headers: {headers}")
-
-        # Extract the table rows
-        rows = table.find_elements(By.CSS_SELECTOR, 'tbody tr')
-
-        # Extract data from each row
-        for row in rows:
-            cols = row.find_elements(By.CSS_SELECTOR, 'td')
-            cols = [col.text for col in cols]
-            # Add year to the row data
-            row_data = dict(zip(headers, cols))
-            row_data['Year'] = year
-            all_data.append(row_data)
-            logging.info(f"Row data for {year}, page {page}: {cols}")
-
-        driver.quit()
-    return all_data
-
-def clean_data(df):
-    # Check for null values
-    if df.isnull().sum().sum() > 0:
-        logging.info("Null values found in the DataFrame, filling them with 'Unknown'.")
-        df = df.fillna('Unknown')
-
-    # Check for duplicates
-    if df.duplicated().sum() > 0:
-        logging.info("Duplicates found in the DataFrame, removing them.")
-        df = df.drop_duplicates()
-
-    return df
-
-def main():
-    # Ensure the csvFiles directory exists
-    os.makedirs('csvFiles', exist_ok=True)
-
-    # URLs to scrape for country medals
-    country_url_list = {
-        2004: 'https://www.espn.com/olympics/summer/2004/medals/_/view/overall',
-        2008: 'https://www.espn.com/olympics/summer/2008/medals/_/view/overall',
-        2012: 'https://www.espn.com/olympics/summer/2012/medals/_/view/overall',
-        2016: 'https://www.espn.com/olympics/summer/2016/medals/_/view/overall',
-        2020: 'https://www.espn.com/olympics/summer/2020/medals/_/view/overall'
-    }
-
-    # URLs to scrape for athletes
-    athletes_url_list = {
-        2004: 'https://www.espn.com/olympics/summer/2004/medals/_/view/athletes',
-        2008: 'https://www.espn.com/olympics/summer/2008/medals/_/view/athletes',
-        2012: 'https://www.espn.com/olympics/summer/2012/medals/_/view/athletes',
-        2016: 'https://www.espn.com/olympics/summer/2016/medals/_/view/athletes',
-        2020: 'https://www.espn.com/olympics/summer/2020/medals/_/view/athletes'
-    }
-
-    # List to hold all country medals data
-    all_country_data = []
-
-    # List to hold all athletes data
-    all_athlete_data = []
-
-    # Scrape country medals data
-    try:
-        for year, url in country_url_list.items():
-            country_data = scrape_table_data(url, year, 'country medals')
-            all_country_data.extend(country_data)
-
-    except Exception as e:
-        logging.error(f"Error occurred: {str(e)}")
-
-    # Scrape athletes data
-    try:
-        for year, url in athletes_url_list.items():
-            athlete_data = scrape_athlete_data(url, year)
-            all_athlete_data.extend(athlete_data)
-
-    except Exception as e:
-        logging.error(f"Error occurred: {str(e)}")
-
-    # Create pandas DataFrames
-    df_country = pd.DataFrame(all_country_data)
-    df_athlete = pd.DataFrame(all_athlete_data)
-
-    # Clean DataFrames
-    df_country = clean_data(df_country)
-    df_athlete = clean_data(df_athlete)
-
-    # Print the DataFrames
-    print(df_country)
-    print(df_athlete)
-
-    # Save DataFrames to CSV within csvFiles directory
-    df_country.to_csv(os.path.join('csvFiles', 'CountryMedals.csv'), index=False)
-    df_athlete.to_csv(os.path.join('csvFiles', 'AthletesMedals.csv'), index=False)
+def parse_athlete_table(table, year, page):
+    # Extract the table headers
+    headers = table.headers
+    logging.debug("Table headers: %s", headers)
+
+    # Extract data from each row
+    data = []
+    for row in table.rows:
+        cols = row.cells
+        # Add year to the row data
+        row_data = dict(zip(headers, cols))
+        row_data['Year'] = year
+        data.append(row_data)
+        logging.debug("Row data for %s, page %s: %s", year, page, cols)
+
+    return data
+
+@register
+class Espn(Source):
+    name = 'espn'
+    datasets = ['CountryMedals', 'AthletesMedals']
+    if CONTINENTAL_MEDALS_SOURCE == 'derive':
+        # Summed from CountryMedals instead of being scraped by olympianDatabase
+        datasets = datasets + ['ContinentalMedals']
+
+    # The medals tables are rendered by JavaScript
+    fetch_mode = FETCH_BROWSER
+    browser_selector = MEDALS_TABLE_SELECTOR
+    # The page past the last page of athlete results has no medals table
+    pages_without_table = ('AthletesMedals',)
+
+    def is_complete(self, dataset, html):
+        return bool(parse_tables(html, MEDALS_TABLE_CLASSES)) or (
+            dataset == 'AthletesMedals' and ATHLETES_END_MARKER in html)
+
+    def catalogue(self):
+        # Country medals are one page per year; athlete pages are discovered
+        # by iter_athlete_pages, page 1 of every year is listed here
+        return {
+            'CountryMedals': {('espn', year, 1): url for year, url in COUNTRY_URLS.items()},
+            'AthletesMedals': {('espn', year, 1): athlete_page_url(url, 1) for year, url in ATHLETE_URLS.items()},
+        }
+
+    def extract(self, dataset, unit, url, html, context):
+        _, year, page = unit
+        tables = parse_tables(html, MEDALS_TABLE_CLASSES, MEDALS_HIDDEN_CLASSES)
+        if not tables:
+            if dataset == 'AthletesMedals':
+                if ATHLETES_END_MARKER in html:
+                    # Past the last page of results
+                    return []
+                raise TableNotFound(f"No medals table found in {url}")
+            raise ValueError(f"No medals table found in {url}")
+
+        # Make the image URLs absolute
+        table = tables[0].resolve_images(url)
+        if dataset == 'CountryMedals':
+            return parse_country_table(table, year, context.flags())
+        return parse_athlete_table(table, year, page)
+
+    def load_athlete_page(self, year, page, context, manifest):
+        # Rows of one athlete page, from the manifest when it is already stored.
+        # An empty list means the page is past the end of the results.
+        unit = ('espn', year, page)
+        if not manifest.missing([unit]):
+            logging.info(f"{manifest.dataset} {manifest.unit_key(*unit)} is up to date, skipping")
+            return manifest.combine([unit])
+        return self.run_unit('AthletesMedals', unit, athlete_page_url(ATHLETE_URLS[year], page), context, manifest)
+
+    def iter_athlete_pages(self, context, manifest):
+        # Yield (year, page, rows) for every athlete page of every year, page by
+        # page as they are parsed. The next page (or the first page of the next
+        # year) is fetched in the background while the caller processes the
+        # current one. A year ends at a page without rows, a page shorter than
+        # the first one or a page repeating the previous one. A page that fails
+        # every attempt is reported and replaced by the rows earlier runs
+        # stored for it (it is listed in context.failed_units and fetched
+        # again by the next run); the year is only given up after
+        # MAX_FAILED_ATHLETE_PAGES failures in a row.
+        def submit(year, page):
+            return context.executor.submit(self.load_athlete_page, year, page, context, manifest)
+
+        years = list(ATHLETE_URLS)
+        if not years:
+            return
+        year_index, page = 0, 1
+        pending = submit(years[0], 1)
+        page_size, previous, failures = None, None, 0
+        while pending is not None:
+            year = years[year_index]
+            try:
+                rows = pending.result()
+                failures = 0
+            except Exception as e:
+                logging.error(f"Error occurred while scraping athletes {year}, page {page}: {str(e)}")
+                rows, failures = None, failures + 1
+
+            digest = records_digest(rows) if rows else None
+            if digest is not None and digest == previous:
+                rows = []
+            stored = []
+            if rows is None:
+                # The rows of earlier runs stand in for the failed page
+                unit = ('espn', year, page)
+                if manifest.unit_key(*unit) in manifest.units:
+                    stored = manifest.combine([unit])
+                last_page = failures >= MAX_FAILED_ATHLETE_PAGES or page >= MAX_ATHLETE_PAGES
+                if last_page:
+                    logging.error(f"Athlete results for {year} are incomplete after page {page - failures}, "
+                                  f"rerun with --resume to fetch the rest")
+                    # So are the rows earlier runs stored for the pages after it
+                    later = sorted(entry['page'] for entry in manifest.units.values()
+                                   if entry['source'] == 'espn' and entry['year'] == year and entry['page'] > page)
+                    stored += manifest.combine([('espn', year, later_page) for later_page in later])
+            else:
+                last_page = not rows or (page_size is not None and len(rows) < page_size) or page >= MAX_ATHLETE_PAGES
+                if last_page:
+                    logging.info(f"Athlete results for {year} end at page {page if rows else page - 1}")
+
+            # Prefetch before handing the rows over
+            if not last_page:
+                next_year_index, next_page = year_index, page + 1
+            else:
+                next_year_index, next_page = year_index + 1, 1
+            pending = submit(years[next_year_index], next_page) if next_year_index < len(years) else None
+
+            if rows or stored:
+                yield year, page, rows or stored
+            if next_year_index != year_index:
+                page_size, previous, failures = None, None, 0
+            elif rows:
+                page_size = page_size or len(rows)
+                previous = digest
+            year_index, page = next_year_index, next_page
+
+    def run(self, context):
+        # Fetch the country medals while the athlete pages stream into their output
+        country_manifest, country_futures = self.submit_units('CountryMedals', context)
+
+        athlete_manifest = DatasetManifest('AthletesMedals')
+        with DatasetWriter('AthletesMedals') as athlete_writer:
+            for year, page, rows in self.iter_athlete_pages(context, athlete_manifest):
+                athlete_writer.write(clean_dataset(pd.DataFrame(rows), 'AthletesMedals'))
+
+        saved = self.save('CountryMedals', country_manifest, country_futures)
+        if 'ContinentalMedals' in self.datasets:
+            # Summed from the CountryMedals just saved, without them there is nothing to derive
+            if not saved:
+                logging.warning("No CountryMedals saved, not deriving ContinentalMedals.")
+                return
+            continental_medals = derive_dataset()
+            if replaces_saved(continental_medals):
+                save_dataset(clean_dataset(continental_medals, 'ContinentalMedals'), 'ContinentalMedals')
 
 if __name__ == "__main__":
-    main()
+    # Configure logging
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Label and export the metrics of this run
+    setup_metrics('scrape', 'espn')
+    sys.exit(0 if run_sources(['espn']) else 1)
@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from email.utils import formatdate
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+# Folder holding the readable flag files (usa.png, chn.png, ...)
+DEFAULT_FLAG_DIR = 'flag_images'
+
+# Number of concurrent downloads, also used as the HTTP connection pool size
+DEFAULT_WORKERS = 8
+
+# Seconds before a downloaded flag is revalidated with a conditional request
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+
+def flag_filename(url):
+    # Extract filename from URL, e.g. .../countries/500/usa.png&w=40 -> usa.png
+    return url.split('/')[-1].split('&')[0]
+
+
+def create_session(pool_size=DEFAULT_WORKERS):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class FlagDownloader:
+    # Downloads flag images in the background over one pooled session.
+    # Every URL is fetched at most once per run, each distinct image is stored
+    # once under its SHA-256 in <target_dir>/by-hash and the readable file name
+    # is a link to that blob. A manifest keeps the ETag/Last-Modified of each
+    # URL so later runs only send conditional requests.
+    def __init__(self, target_dir=DEFAULT_FLAG_DIR, workers=DEFAULT_WORKERS, max_age=DEFAULT_MAX_AGE, session=None):
+        self.target_dir = target_dir
+        self.store_dir = os.path.join(target_dir, 'by-hash')
+        self.manifest_path = os.path.join(target_dir, 'manifest.json')
+        self.max_age = max_age
+        self.session = session or create_session(workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='flag-download')
+        self._lock = threading.Lock()
+        self._futures = {}
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._manifest = self._load_manifest()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable flag manifest {self.manifest_path}: {str(e)}")
+            return {}
+
+    def _save_manifest(self):
+        with self._lock:
+            manifest = dict(self._manifest)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def submit(self, url):
+        # Queue a download without blocking the caller, duplicates share a future
+        with self._lock:
+            future = self._futures.get(url)
+            if future is None:
+                future = self._executor.submit(self._download, url)
+                self._futures[url] = future
+        return future
+
+    def _download(self, url):
+        save_path = os.path.join(self.target_dir, flag_filename(url))
+        with self._lock:
+            entry = dict(self._manifest.get(url, {}))
+
+        headers = {}
+        if os.path.exists(save_path):
+            if entry and time.time() - entry.get('checked', 0) < self.max_age:
+                logging.debug(f"Flag already on disk, skipping {url}")
+                return save_path
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            # Files from older runs without a manifest entry are revalidated
+            # against the time they were written
+            headers['If-Modified-Since'] = entry.get('last_modified') or formatdate(os.path.getmtime(save_path), usegmt=True)
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=30)
+            if response.status_code == 304:
+                logging.debug(f"Flag not modified: {url}")
+                if 'sha256' not in entry:
+                    # Adopt a file from an older run into the store
+                    with open(save_path, 'rb') as f:
+                        content = f.read()
+                    digest = hashlib.sha256(content).hexdigest()
+                    self._link(self._store_blob(digest, save_path, content), save_path)
+                    entry.update({'file': os.path.basename(save_path), 'sha256': digest})
+            else:
+                response.raise_for_status()  # Raise an exception for HTTP errors
+                digest = hashlib.sha256(response.content).hexdigest()
+                blob_path = self._store_blob(digest, save_path, response.content)
+                self._link(blob_path, save_path)
+                entry.update({
+                    'file': os.path.basename(save_path),
+                    'sha256': digest,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                })
+                logging.info(f"Downloaded image to {save_path}")
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Failed to download image from {url}: {str(e)}")
+            return None
+
+        entry['checked'] = time.time()
+        with self._lock:
+            self._manifest[url] = entry
+        return save_path
+
+    def _store_blob(self, digest, save_path, content):
+        extension = os.path.splitext(save_path)[1]
+        blob_path = os.path.join(self.store_dir, digest + extension)
+        if not os.path.exists(blob_path):
+            tmp_path = f"{blob_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, blob_path)
+        return blob_path
+
+    def _link(self, blob_path, save_path):
+        if os.path.exists(save_path) and os.path.samefile(blob_path, save_path):
+            return
+        tmp_path = f"{save_path}.{threading.get_ident()}.tmp"
+        try:
+            os.link(blob_path, tmp_path)
+        except OSError:
+            # File system without hard links, fall back to a copy
+            shutil.copyfile(blob_path, tmp_path)
+        os.replace(tmp_path, save_path)
+
+    def wait(self):
+        with self._lock:
+            futures = list(self._futures.values())
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                logging.error(f"Flag download failed: {str(e)}")
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown(wait=True)
+        self._save_manifest()
+        self.session.close()
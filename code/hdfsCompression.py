@@ -0,0 +1,89 @@
+import gzip
+import codecs
+import shutil
+import tempfile
+import contextlib
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always available
+    zstandard = None
+
+# Codec -> file extension added to compressed files, the codec of a file is
+# detected from it so compressed and uncompressed copies can coexist
+CODEC_EXTENSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+# Compression levels: gzip favours speed over the last few percent, zstd's default
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Bytes copied at a time while compressing
+COPY_CHUNK_SIZE = 1 << 20
+
+
+def require_zstandard():
+    if zstandard is None:
+        raise ImportError("zstd compression needs zstandard, install it with `pip install zstandard`")
+    return zstandard
+
+
+def compression_codec(name):
+    # HDFS_COMPRESSION value -> codec, None for uncompressed files
+    if name in (None, '', 'none'):
+        return None
+    if name not in CODEC_EXTENSIONS:
+        raise ValueError(f"Unknown compression {name}, expected none or one of {sorted(CODEC_EXTENSIONS)}")
+    if name == 'zstd':
+        require_zstandard()
+    return name
+
+
+def compressed_path(path, codec):
+    return path + CODEC_EXTENSIONS[codec] if codec else path
+
+
+def path_codec(path):
+    # Codec of a file from its extension, None when it is not compressed
+    for codec, extension in CODEC_EXTENSIONS.items():
+        if path.endswith(extension):
+            return codec
+    return None
+
+
+def path_variants(path):
+    # The uncompressed path and its compressed variants
+    return [path] + [compressed_path(path, codec) for codec in CODEC_EXTENSIONS]
+
+
+@contextlib.contextmanager
+def compressed_file(local_path, codec):
+    # Temporary file holding local_path compressed with codec, rewound for reading
+    with tempfile.TemporaryFile() as compressed, open(local_path, 'rb') as source:
+        if codec == 'gzip':
+            with gzip.GzipFile(fileobj=compressed, mode='wb', compresslevel=GZIP_LEVEL, mtime=0) as writer:
+                shutil.copyfileobj(source, writer, COPY_CHUNK_SIZE)
+        elif codec == 'zstd':
+            compressor = require_zstandard().ZstdCompressor(level=ZSTD_LEVEL)
+            compressor.copy_stream(source, compressed, read_size=COPY_CHUNK_SIZE)
+        else:
+            raise ValueError(f"Unknown compression {codec}")
+        compressed.seek(0)
+        yield compressed
+
+
+def decompressed_stream(reader, codec):
+    # Binary stream decompressing reader while it is read
+    if codec == 'gzip':
+        return gzip.GzipFile(fileobj=reader, mode='rb')
+    if codec == 'zstd':
+        return require_zstandard().ZstdDecompressor().stream_reader(reader)
+    return reader
+
+
+def text_stream(reader, codec, encoding='utf-8'):
+    # Text stream of a possibly compressed binary reader, e.g. for pd.read_csv. A
+    # codecs reader, like the HDFS client's own, copes with responses that close at EOF.
+    return codecs.getreader(encoding)(decompressed_stream(reader, codec))
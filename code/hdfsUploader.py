@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+import posixpath
+from metrics import METRICS
+from hdfsCompression import compressed_file, compressed_path
+from concurrent.futures import ThreadPoolExecutor
+
+# Default number of files uploaded at the same time
+DEFAULT_WORKERS = 4
+
+# Default number of attempts per file and the base delay between them
+DEFAULT_ATTEMPTS = 3
+DEFAULT_BACKOFF = 1.0
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HdfsUploader:
+    # Uploads local files to one HDFS folder, skipping files that have not
+    # changed since their last successful upload. A local manifest records
+    # size, mtime and SHA-256 of every uploaded file together with the length
+    # and modification time HDFS reported for it, so both local edits and
+    # remote deletes/replacements trigger a new upload. With a local_root the
+    # folder structure below it is kept on HDFS, otherwise files are flat.
+    # With a codec (see hdfsCompression) files are compressed on the way and
+    # stored with the codec's extension appended.
+    def __init__(self, client_factory, hdfs_folder, manifest_path, workers=DEFAULT_WORKERS,
+                 attempts=DEFAULT_ATTEMPTS, backoff=DEFAULT_BACKOFF, local_root=None, codec=None):
+        self.client_factory = client_factory
+        self.hdfs_folder = hdfs_folder
+        self.local_root = local_root
+        self.manifest_path = manifest_path
+        self.workers = workers
+        self.attempts = attempts
+        self.backoff = backoff
+        self.codec = codec
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.manifest = self._load_manifest()
+
+    def _client(self):
+        # One client (and HTTP session) per worker thread
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.client_factory()
+        return client
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f'Ignoring unreadable upload manifest {self.manifest_path}: {e}')
+            return {}
+
+    def _save_manifest(self):
+        with self._lock:
+            manifest = dict(self.manifest)
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def hdfs_path(self, local_path):
+        if self.local_root:
+            relative_path = os.path.relpath(local_path, self.local_root).replace(os.sep, '/')
+        else:
+            relative_path = os.path.basename(local_path)
+        return compressed_path(posixpath.join(self.hdfs_folder, relative_path), self.codec)
+
+    def _local_state(self, local_path, entry):
+        stat = os.stat(local_path)
+        state = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        # Only hash the file when size or mtime moved, a touched but
+        # identical file is still unchanged
+        if entry and entry.get('size') == state['size'] and entry.get('mtime_ns') == state['mtime_ns']:
+            state['sha256'] = entry.get('sha256')
+        else:
+            state['sha256'] = file_sha256(local_path)
+        return state
+
+    def _needs_upload(self, local_path, hdfs_path, entry, state):
+        if not entry or entry.get('sha256') != state['sha256']:
+            return 'changed locally'
+        remote = self._client().status(hdfs_path, strict=False)
+        if remote is None:
+            return 'missing on HDFS'
+        if remote.get('length') != entry.get('hdfs_length') or remote.get('modificationTime') != entry.get('hdfs_mtime'):
+            return 'changed on HDFS'
+        return None
+
+    def _upload_file(self, local_path):
+        hdfs_path = self.hdfs_path(local_path)
+        with self._lock:
+            entry = dict(self.manifest.get(hdfs_path, {}))
+
+        for attempt in range(1, self.attempts + 1):
+            try:
+                state = self._local_state(local_path, entry)
+                reason = self._needs_upload(local_path, hdfs_path, entry, state)
+                if reason is None:
+                    # Keep the new mtime so the next run can skip hashing again
+                    with self._lock:
+                        self.manifest[hdfs_path] = dict(entry, **state)
+                    logging.info(f'Skipping unchanged {local_path}')
+                    return 'skipped'
+
+                client = self._client()
+                sent = self._send(client, local_path, hdfs_path, state['size'])
+                METRICS.inc('hdfs_upload_bytes_total', sent)
+                remote = client.status(hdfs_path)
+                with self._lock:
+                    self.manifest[hdfs_path] = dict(
+                        state,
+                        hdfs_length=remote.get('length'),
+                        hdfs_mtime=remote.get('modificationTime'),
+                        uploaded_at=time.time(),
+                    )
+                logging.info(f'Successfully uploaded {local_path} to {hdfs_path} ({reason})')
+                return 'uploaded'
+            except Exception as e:
+                if attempt == self.attempts:
+                    logging.error(f'Failed to upload {local_path} after {attempt} attempts: {e}')
+                    raise
+                delay = self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                logging.warning(f'Upload of {local_path} failed ({e}), retrying in {delay:.1f}s')
+                time.sleep(delay)
+
+    def _send(self, client, local_path, hdfs_path, size):
+        # Write the file to HDFS, returns the bytes sent
+        if not self.codec:
+            with METRICS.timer('hdfs_upload_seconds'):
+                client.upload(hdfs_path, local_path, overwrite=True)
+            return size
+
+        with compressed_file(local_path, self.codec) as data:
+            sent = os.fstat(data.fileno()).st_size
+            with METRICS.timer('hdfs_upload_seconds'):
+                client.write(hdfs_path, data=data, overwrite=True)
+        logging.info(f'Compressed {local_path} with {self.codec}: {size} -> {sent} bytes')
+        return sent
+
+    def upload_all(self, local_paths):
+        # Returns the lists of uploaded, skipped and failed local paths
+        results = {'uploaded': [], 'skipped': [], 'failed': []}
+        if not local_paths:
+            return results
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(local_paths))) as executor:
+            futures = {path: executor.submit(self._upload_file, path) for path in local_paths}
+            for path, future in futures.items():
+                try:
+                    results[future.result()].append(path)
+                except Exception:
+                    results['failed'].append(path)
+
+        self._save_manifest()
+        for result, paths in results.items():
+            METRICS.inc('hdfs_files_total', len(paths), result=result)
+        logging.info(
+            f"Upload finished: {len(results['uploaded'])} uploaded, "
+            f"{len(results['skipped'])} unchanged, {len(results['failed'])} failed"
+        )
+        return results
@@ -0,0 +1,75 @@
+import os
+import logging
+import requests
+from flagDownloader import create_session
+from driverPool import HostRateLimiter, DEFAULT_REQUEST_INTERVAL
+
+# How a source loads its pages: plain HTTP for server-rendered tables, or a
+# headless browser for pages that build their tables with JavaScript
+FETCH_HTTP = 'http'
+FETCH_BROWSER = 'browser'
+FETCH_MODES = (FETCH_HTTP, FETCH_BROWSER)
+
+# Connections kept open per host
+DEFAULT_POOL_SIZE = 4
+
+# Seconds to wait for a response
+DEFAULT_TIMEOUT = 30
+
+# Sent instead of the requests default, which some sites block
+DEFAULT_USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+)
+
+
+def fetch_mode(default):
+    # The source's own mode unless SCRAPER_FETCH_MODE forces one for all sources
+    mode = os.environ.get('SCRAPER_FETCH_MODE') or default
+    if mode not in FETCH_MODES:
+        raise ValueError(f"Unknown fetch mode {mode}, expected one of {FETCH_MODES}")
+    return mode
+
+
+class HttpFetcher:
+    # Fetches pages over one pooled requests session, at most one request
+    # per host every min_interval seconds
+    def __init__(self, session=None, rate_limiter=None, timeout=DEFAULT_TIMEOUT, user_agent=DEFAULT_USER_AGENT):
+        self.session = session or create_session(DEFAULT_POOL_SIZE)
+        self.session.headers['User-Agent'] = user_agent
+        self.rate_limiter = rate_limiter or HostRateLimiter(DEFAULT_REQUEST_INTERVAL)
+        self.timeout = timeout
+
+    def fetch(self, url):
+        self.rate_limiter.wait(url)
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        # Without a charset header requests assumes ISO-8859-1, detect it instead
+        if 'charset' not in response.headers.get('Content-Type', '').lower():
+            response.encoding = response.apparent_encoding
+        return response.text
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def fetch_page(url, mode, fetcher, browser_loader, is_complete):
+    # Load a page the way its source needs. In HTTP mode the browser is only
+    # started when the request fails or the server HTML does not contain the
+    # expected tables (is_complete(html) is false), e.g. after a site redesign.
+    if mode == FETCH_HTTP:
+        try:
+            html = fetcher.fetch(url)
+            if is_complete(html):
+                return html
+            logging.warning(f"Expected tables missing from the HTML of {url}, falling back to a browser")
+        except requests.RequestException as e:
+            logging.warning(f"HTTP fetch of {url} failed ({e}), falling back to a browser")
+    return browser_loader(url)
+
@@ -1,36 +1,100 @@
-import subprocess
-import threading
+import os
+import sys
+import argparse
 import logging
-import pandas as pd
+from pipeline import Pipeline
+from pageCache import MODES
+from metrics import METRICS, METRICS_DIR_ENV, collect, rate
+from scrape import SOURCES, COMPLETION_FOLDER, completion_marker
+from tableDependencies import TABLE_DEPENDENCIES
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-final_status = []
-# Function to run a scraping script
-def run_scraping_script(script_name):
-    logging.info(f"Starting scraping with {script_name}")
-    subprocess.run(["python", script_name])
-    logging.info(f"Finished scraping with {script_name}")
-    final_status.append(script_name)
+# All scripts use paths relative to the code directory
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Pipeline stages in order, each with the number of tasks allowed to run at once
+STAGES = ['scrape', 'ingest', 'load']
+STAGE_LIMITS = {
+    'scrape': 1,
+    'ingest': 2,
+    'load': 2,
+}
+
+def script_command(script_name, *args):
+    return [sys.executable, script_name, *args]
+
+def build_pipeline(until='load', stage_limits=STAGE_LIMITS, resume=False):
+    # One scrape of all sources in a single process sharing browsers, HTTP
+    # sessions and caches. It marks every source as soon as that source is
+    # scraped, so the source's ingest starts then, followed by a load per table.
+    stages = STAGES[:STAGES.index(until) + 1]
+    pipeline = Pipeline(stage_limits, cwd=SCRIPT_DIR)
+    if 'scrape' in stages:
+        completion_dir = os.path.join(SCRIPT_DIR, COMPLETION_FOLDER)
+        pipeline.add('scrape', 'scrape', script_command(
+            'scrape.py', '--completion-dir', completion_dir, *(['--resume'] if resume else [])))
+        for source in SOURCES:
+            pipeline.add_marker(f'scraped:{source}', 'scrape', completion_marker(source, completion_dir), 'scrape')
+
+    for source, datasets in SOURCES.items():
+        csv_files = [f'{dataset}.csv' for dataset in datasets]
+        previous = [f'scraped:{source}'] if 'scrape' in stages else []
+        if 'ingest' in stages:
+            pipeline.add(f'ingest:{source}', 'ingest', script_command('dataIngestion.py', *csv_files), previous)
+            previous = [f'ingest:{source}']
+        if 'load' in stages:
+            for table in datasets:
+                depends_on = previous + [f'load:{parent}' for parent in TABLE_DEPENDENCIES.get(table, [])]
+                pipeline.add(f'load:{table}', 'load', script_command('dataLoading.py', table), depends_on)
+
+    return pipeline
+
+def metrics_summary(metrics):
+    # Throughput of the stages that ran, derived from the combined metrics
+    lines = ["Pipeline metrics summary:"]
+    rates = [
+        ('page fetch', rate(metrics, 'page_bytes_total', 'page_fetch_seconds'), 1024, 'KB/s'),
+        ('HDFS upload', rate(metrics, 'hdfs_upload_bytes_total', 'hdfs_upload_seconds'), 1024 * 1024, 'MB/s'),
+        ('DB insert', rate(metrics, 'db_rows_total', 'db_insert_seconds'), 1, 'rows/s'),
+    ]
+    for label, value, unit, suffix in rates:
+        if value is not None:
+            lines.append(f"  {label:<12} {value / unit:12.1f} {suffix}")
+    return '\n'.join(lines)
 
 def main():
-    # Define the scraping scripts
-    scripts = ["espn.py", "olympedia.py", "olympianDatabase.py"]
-    # scripts = ["espn.py"]
-    
-    # Start threading for each scraping script
-    threads = []
-    for script in scripts:
-        thread = threading.Thread(target=run_scraping_script, args=(script,))
-        threads.append(thread)
-        thread.start()
-
-    # Wait for all threads to complete
-    for thread in threads:
-        thread.join()
-    
-    logging.info(final_status)
+    parser = argparse.ArgumentParser(description='Run the Olympics data pipeline.')
+    parser.add_argument('--until', choices=STAGES, default='load', help='last stage to run')
+    parser.add_argument('--cache-mode', choices=MODES, help='page cache mode passed on to the scrapers')
+    parser.add_argument('--refresh', action='store_true', help='scrape every unit again, even if already stored')
+    parser.add_argument('--resume', action='store_true', help='continue an interrupted scrape, redoing only failed and missing units')
+    parser.add_argument('--metrics-dir', default='metrics', help='folder for per-stage metrics (JSON and Prometheus text)')
+    args = parser.parse_args()
+
+    # The scrapers run as child processes and read their cache settings from the environment
+    if args.cache_mode:
+        os.environ['SCRAPER_CACHE_MODE'] = args.cache_mode
+    if args.refresh:
+        os.environ['SCRAPER_REFRESH'] = '1'
+
+    # Every script writes its metrics to this folder, start from an empty one
+    os.makedirs(args.metrics_dir, exist_ok=True)
+    for name in os.listdir(args.metrics_dir):
+        if name.endswith(('.json', '.prom')):
+            os.remove(os.path.join(args.metrics_dir, name))
+    os.environ[METRICS_DIR_ENV] = os.path.abspath(args.metrics_dir)
+
+    pipeline = build_pipeline(args.until, resume=args.resume)
+    succeeded = pipeline.run()
+    logging.info(pipeline.summary())
+
+    for task in pipeline.tasks.values():
+        METRICS.observe('task_seconds', task.duration, stage=task.stage, task=task.name, status=task.status)
+    combined = collect(args.metrics_dir, METRICS)
+    logging.info(metrics_summary(combined))
+    return 0 if succeeded else 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
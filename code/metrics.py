@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import atexit
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+
+# Folder the pipeline processes write their metrics to (set by main.py), unset disables the export
+METRICS_DIR_ENV = 'METRICS_DIR'
+
+# Combined files written by main.py after a run
+JSON_FILENAME = 'pipeline.json'
+PROMETHEUS_FILENAME = 'pipeline.prom'
+
+COUNTER = 'counter'
+SUMMARY = 'summary'
+
+
+def add_span(spans, started, ended):
+    # Insert [started, ended] into sorted, disjoint intervals, merging the
+    # ones it overlaps
+    index = bisect.bisect_left(spans, [started, ended])
+    if index and spans[index - 1][1] >= started:
+        index -= 1
+        started, ended = spans[index][0], max(ended, spans[index][1])
+    last = index
+    while last < len(spans) and spans[last][0] <= ended:
+        ended = max(ended, spans[last][1])
+        last += 1
+    spans[index:last] = [[started, ended]]
+    return spans
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in sorted(labels.items())) + '}'
+
+
+def _copy_entry(entry):
+    copy = dict(entry, labels=dict(entry['labels']))
+    if 'spans' in copy:
+        copy['spans'] = [list(span) for span in copy['spans']]
+    return copy
+
+
+class Metrics:
+    # Thread-safe counters (rows, bytes, files) and timing summaries (count,
+    # sum, min, max of seconds, and the wall-clock intervals the timed work
+    # ran in, overlapping ones merged), each keyed by name and labels. Default
+    # labels such as stage and source are added to everything recorded.
+    def __init__(self, **labels):
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _entry(self, name, kind, labels):
+        labels = {**self.labels, **{k: str(v) for k, v in labels.items()}}
+        key = (name, tuple(sorted(labels.items())))
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = {'name': name, 'type': kind, 'labels': labels}
+            if kind == COUNTER:
+                entry['value'] = 0
+            else:
+                entry.update(count=0, sum=0.0, min=None, max=None, spans=[])
+            self._entries[key] = entry
+        return entry
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self._entry(name, COUNTER, labels)['value'] += value
+
+    def observe(self, name, seconds, **labels):
+        # Seconds of something that just ended
+        ended = time.time()
+        self._observe(name, seconds, ended - seconds, ended, labels)
+
+    def _observe(self, name, seconds, started, ended, labels):
+        with self._lock:
+            entry = self._entry(name, SUMMARY, labels)
+            entry['count'] += 1
+            entry['sum'] += seconds
+            entry['min'] = seconds if entry['min'] is None else min(entry['min'], seconds)
+            entry['max'] = seconds if entry['max'] is None else max(entry['max'], seconds)
+            add_span(entry['spans'], started, ended)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started_at = time.time()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self._observe(name, seconds, started_at, started_at + seconds, labels)
+
+    def merge(self, entries):
+        # Add entries exported by another process
+        with self._lock:
+            for other in entries:
+                entry = self._entry(other['name'], other['type'], other['labels'])
+                if other['type'] == COUNTER:
+                    entry['value'] += other['value']
+                    continue
+                entry['count'] += other['count']
+                entry['sum'] += other['sum']
+                for bound, pick in (('min', min), ('max', max)):
+                    if other.get(bound) is not None:
+                        entry[bound] = other[bound] if entry[bound] is None else pick(entry[bound], other[bound])
+                for started, ended in other.get('spans', []):
+                    add_span(entry['spans'], started, ended)
+
+    def snapshot(self):
+        with self._lock:
+            return [_copy_entry(entry) for _, entry in sorted(self._entries.items())]
+
+    def to_prometheus(self):
+        lines = []
+        typed = set()
+        for entry in self.snapshot():
+            name = entry['name']
+            if name not in typed:
+                lines.append(f"# TYPE {name} {entry['type']}")
+                typed.add(name)
+            labels = _format_labels(entry['labels'])
+            if entry['type'] == COUNTER:
+                lines.append(f"{name}{labels} {entry['value']}")
+            else:
+                lines.append(f"{name}_count{labels} {entry['count']}")
+                lines.append(f"{name}_sum{labels} {entry['sum']:.6f}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        # Prometheus text for .prom files, JSON otherwise
+        if path.endswith('.prom'):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), indent=2)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+# Metrics of the current process
+METRICS = Metrics()
+
+
+def setup(stage, source=None):
+    # Label everything this process records and, when METRICS_DIR is set,
+    # write it there as JSON when the process exits
+    METRICS.labels['stage'] = stage
+    if source is not None:
+        METRICS.labels['source'] = source
+
+    metrics_dir = os.environ.get(METRICS_DIR_ENV)
+    if metrics_dir:
+        path = os.path.join(metrics_dir, f'{stage}_{source or "all"}_{os.getpid()}.json')
+        atexit.register(METRICS.write, path)
+    return METRICS
+
+
+def collect(metrics_dir, extra=None):
+    # Combine the files written by every process of a run into pipeline.json
+    # and pipeline.prom, including the metrics of the calling process
+    combined = Metrics()
+    for name in sorted(os.listdir(metrics_dir)):
+        if not name.endswith('.json') or name == JSON_FILENAME:
+            continue
+        try:
+            with open(os.path.join(metrics_dir, name), 'r', encoding='utf-8') as f:
+                combined.merge(json.load(f))
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable metrics file {name}: {e}")
+    if extra is not None:
+        combined.merge(extra.snapshot())
+
+    combined.write(os.path.join(metrics_dir, JSON_FILENAME))
+    combined.write(os.path.join(metrics_dir, PROMETHEUS_FILENAME))
+    return combined
+
+
+def rate(metrics, amount_name, seconds_name, **labels):
+    # amount per second over all entries matching the labels, e.g. rows/s or
+    # bytes/s. Work timed on several threads or processes overlaps, and tasks
+    # sharing labels may run far apart, so the amount is divided by the
+    # wall-clock time covered by the union of their intervals rather than by
+    # the summed seconds, which files exported without intervals fall back to.
+    def matches(entry):
+        return all(entry['labels'].get(k) == str(v) for k, v in labels.items())
+
+    entries = [entry for entry in metrics.snapshot() if matches(entry)]
+    amount = sum(e['value'] for e in entries if e['name'] == amount_name)
+    timings = [e for e in entries if e['name'] == seconds_name]
+    if timings and all(e.get('spans') for e in timings):
+        spans = []
+        for entry in timings:
+            for started, ended in entry['spans']:
+                add_span(spans, started, ended)
+        seconds = sum(ended - started for started, ended in spans)
+    else:
+        seconds = sum(e['sum'] for e in timings)
+    return amount / seconds if seconds else None
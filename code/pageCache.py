@@ -0,0 +1,199 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+import threading
+from urllib.parse import urlparse
+from metrics import METRICS
+
+# Cache modes
+MODE_OFF = 'off'        # always fetch, never read or write the cache
+MODE_RECORD = 'record'  # serve fresh cached pages, fetch and store the rest
+MODE_REPLAY = 'replay'  # only serve cached or fixture pages, never fetch
+MODES = (MODE_OFF, MODE_RECORD, MODE_REPLAY)
+
+# Defaults, overridable through the environment so that scripts started by
+# main.py pick up the same settings
+DEFAULT_CACHE_DIR = 'page_cache'
+DEFAULT_MODE = MODE_RECORD
+DEFAULT_TTL = None  # historical results never change, keep pages forever
+
+
+class PageNotCached(Exception):
+    pass
+
+
+# Characters of the readable part of a cached file name
+SLUG_LENGTH = 160
+
+
+def page_slug(url):
+    # Readable, file-system safe form of a URL, so fixtures can be saved by hand
+    return re.sub(r'[^A-Za-z0-9]+', '_', url.split('://', 1)[-1]).strip('_')
+
+
+def page_filename(url):
+    # The slug is lossy and truncated, a short hash of the full URL keeps
+    # different URLs apart
+    digest = hashlib.sha256(url.encode('utf-8')).hexdigest()[:12]
+    return f'{page_slug(url)[:SLUG_LENGTH]}_{digest}.html'
+
+
+class PageCache:
+    # URL-keyed store of fetched HTML. Each page is kept as <slug>_<hash>.html
+    # with a .json sidecar recording the URL and when it was fetched; a page
+    # whose sidecar names another URL is not served. Fixtures may also be
+    # saved under the plain <slug>.html.
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, mode=DEFAULT_MODE, ttl=DEFAULT_TTL, fixture_dir=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cache mode {mode}, expected one of {MODES}")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.ttl = ttl
+        self.fixture_dir = fixture_dir
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        ttl = os.environ.get('SCRAPER_CACHE_TTL')
+        return cls(
+            cache_dir=os.environ.get('SCRAPER_CACHE_DIR', DEFAULT_CACHE_DIR),
+            mode=os.environ.get('SCRAPER_CACHE_MODE', DEFAULT_MODE),
+            ttl=float(ttl) if ttl else DEFAULT_TTL,
+            fixture_dir=os.environ.get('SCRAPER_FIXTURE_DIR') or None,
+        )
+
+    def _paths(self, url, directory=None, filename=None):
+        html_path = os.path.join(directory or self.cache_dir, filename or page_filename(url))
+        return html_path, html_path[:-len('.html')] + '.json'
+
+    def _read_meta(self, url, meta_path):
+        # Sidecar of a page, None when it records another URL
+        if not os.path.exists(meta_path):
+            return {}
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if meta.get('url', url) != url:
+            logging.warning(f"Cached page {meta_path} is for {meta['url']}, not {url}")
+            return None
+        return meta
+
+    def _read_page(self, url, directory=None, filename=None, check_ttl=False):
+        html_path, meta_path = self._paths(url, directory, filename)
+        if not os.path.exists(html_path):
+            return None
+        meta = self._read_meta(url, meta_path)
+        if meta is None:
+            return None
+
+        if check_ttl and self.ttl is not None:
+            fetched_at = meta.get('fetched_at', os.path.getmtime(html_path))
+            if time.time() - fetched_at > self.ttl:
+                logging.info(f"Cached page expired: {url}")
+                return None
+
+        with open(html_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def _read(self, url, check_ttl):
+        return self._read_page(url, check_ttl=check_ttl)
+
+    def _read_fixture(self, url):
+        if not self.fixture_dir:
+            return None
+        html = self._read_page(url, self.fixture_dir)
+        if html is None:
+            html = self._read_page(url, self.fixture_dir, page_slug(url) + '.html')
+        return html
+
+    def store(self, url, html):
+        html_path, meta_path = self._paths(url)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._lock:
+            for path, content in ((html_path, html), (meta_path, json.dumps({'url': url, 'fetched_at': time.time()}))):
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+
+    def _fetch(self, url, fetch):
+        # Page-fetch latency and size per host
+        host = urlparse(url).netloc
+        with METRICS.timer('page_fetch_seconds', host=host):
+            html = fetch()
+        METRICS.inc('page_bytes_total', len(html.encode('utf-8')), host=host)
+        return html
+
+    def get(self, url, fetch, is_complete=None):
+        # Return the HTML for url, calling fetch() only when the cache cannot
+        # serve it. In replay mode a missing page is an error instead. Pages
+        # for which is_complete(html) is false, e.g. ones whose table had not
+        # loaded yet, are returned but neither stored nor served from the cache.
+        if self.mode == MODE_OFF:
+            return self._fetch(url, fetch)
+
+        html = self._read(url, check_ttl=self.mode == MODE_RECORD)
+        if html is not None and is_complete is not None and not is_complete(html):
+            logging.warning(f"Ignoring the incomplete cached page for {url}")
+            html = None
+        if html is None and self.mode == MODE_REPLAY:
+            html = self._read_fixture(url)
+        if html is not None:
+            with self._lock:
+                self.hits += 1
+            METRICS.inc('page_cache_hits_total', host=urlparse(url).netloc)
+            logging.info(f"Using cached page for {url}")
+            return html
+
+        with self._lock:
+            self.misses += 1
+        if self.mode == MODE_REPLAY:
+            raise PageNotCached(f"No cached or fixture page for {url}")
+
+        html = self._fetch(url, fetch)
+        if is_complete is None or is_complete(html):
+            self.store(url, html)
+        else:
+            logging.info(f"Not caching the incomplete page for {url}")
+        return html
+
+    def invalidate(self, url):
+        for path in self._paths(url):
+            if os.path.exists(path):
+                os.remove(path)
+        logging.info(f"Invalidated cached page for {url}")
+
+    def clear(self):
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+        logging.info(f"Cleared page cache {self.cache_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the scraper page cache.')
+    parser.add_argument('--cache-dir', default=os.environ.get('SCRAPER_CACHE_DIR', DEFAULT_CACHE_DIR))
+    parser.add_argument('--invalidate', nargs='+', metavar='URL', help='drop the cached copy of these pages')
+    parser.add_argument('--clear', action='store_true', help='drop every cached page')
+    args = parser.parse_args()
+
+    cache = PageCache(args.cache_dir)
+    if args.clear:
+        cache.clear()
+    for url in args.invalidate or []:
+        cache.invalidate(url)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
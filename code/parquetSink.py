@@ -0,0 +1,227 @@
+import os
+import io
+import json
+import shutil
+import hashlib
+import logging
+import pandas as pd
+from datasetCleaner import DATASET_COLUMNS
+from metrics import METRICS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = None
+    pq = None
+
+# Column partitioning every dataset that has it
+PARTITION_COLUMN = 'Years'
+
+# File written inside every partition folder
+PART_FILENAME = 'part.parquet'
+
+# Per-partition content hashes, used to skip rewriting unchanged partitions
+MANIFEST_FILENAME = '_manifest.json'
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet output needs pyarrow, install it with `pip install pyarrow`")
+
+
+def arrow_schema(dataset, columns=None):
+    require_pyarrow()
+    types = {'int32': pa.int32(), 'string': pa.string()}
+    return pa.schema([
+        (column, types[dtype])
+        for column, dtype in DATASET_COLUMNS[dataset].items()
+        if columns is None or column in columns
+    ])
+
+
+def apply_schema(df, dataset):
+    # Keep the schema's columns in schema order and coerce them to their types
+    typed = pd.DataFrame(index=df.index)
+    for column, dtype in DATASET_COLUMNS[dataset].items():
+        if column not in df.columns:
+            raise ValueError(f"{dataset} is missing column {column}")
+        if dtype == 'int32':
+            values = pd.to_numeric(df[column], errors='coerce')
+            coerced = int((values.isna() & df[column].notna()).sum())
+            if coerced:
+                logging.warning(f"{dataset}.{column}: {coerced} non-numeric values stored as null")
+            typed[column] = values.astype('Int32')
+        else:
+            typed[column] = df[column].astype('string')
+    return typed.reset_index(drop=True)
+
+
+def partition_dirname(value):
+    return f'{PARTITION_COLUMN}={value}'
+
+
+def parse_partition(dirname):
+    # 'Years=2004' -> 2004, anything else -> None
+    name, _, value = dirname.partition('=')
+    if name != PARTITION_COLUMN or not value:
+        return None
+    return int(value)
+
+
+def frame_digest(df):
+    return hashlib.sha256(df.to_csv(index=False).encode('utf-8')).hexdigest()
+
+
+def to_parquet_bytes(df, dataset):
+    require_pyarrow()
+    table = pa.Table.from_pandas(df, schema=arrow_schema(dataset, df.columns), preserve_index=False)
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    return buffer.getvalue()
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _read_manifest(dataset_dir):
+    manifest_path = os.path.join(dataset_dir, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _split_partitions(typed):
+    # Partition folder name -> rows without the partition column, or a single
+    # unnamed partition for datasets without Years, and the number of rows
+    # left out because their Years is null
+    if PARTITION_COLUMN not in typed.columns:
+        return {'': typed}, 0
+    present = typed[PARTITION_COLUMN].notna()
+    partitions = {
+        partition_dirname(int(value)): group.drop(columns=[PARTITION_COLUMN])
+        for value, group in typed[present].groupby(PARTITION_COLUMN, sort=True)
+    }
+    return partitions, int((~present).sum())
+
+
+def _report_dropped(dataset, dropped):
+    # Rows without Years belong to no partition, so they never reach Parquet
+    if dropped:
+        METRICS.inc('rows_dropped_total', dropped, dataset=dataset, reason=f'null {PARTITION_COLUMN}')
+        logging.warning(f"Parquet {dataset}: {dropped} rows with a null {PARTITION_COLUMN} left out of the partitions")
+
+
+def _finish_dataset(dataset_dir, manifest, new_manifest):
+    # Drop partitions that no longer have any rows and store the new hashes
+    for name in set(manifest) - set(new_manifest):
+        if name:
+            shutil.rmtree(os.path.join(dataset_dir, name), ignore_errors=True)
+    _write_atomic(os.path.join(dataset_dir, MANIFEST_FILENAME),
+                  json.dumps(new_manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+
+def write_dataset(df, dataset, root):
+    # Write <root>/<dataset>/Years=<year>/part.parquet for every year (or a
+    # single part.parquet for datasets without Years). Partitions whose rows
+    # did not change are left untouched so downstream uploads can skip them.
+    require_pyarrow()
+    typed = apply_schema(df, dataset)
+    dataset_dir = os.path.join(root, dataset)
+    manifest = _read_manifest(dataset_dir)
+    partitions, dropped = _split_partitions(typed)
+    _report_dropped(dataset, dropped)
+
+    written = []
+    new_manifest = {}
+    for name, part in partitions.items():
+        digest = frame_digest(part)
+        new_manifest[name] = digest
+        part_path = os.path.join(dataset_dir, name, PART_FILENAME)
+        if manifest.get(name) == digest and os.path.exists(part_path):
+            continue
+        _write_atomic(part_path, to_parquet_bytes(part.reset_index(drop=True), dataset))
+        written.append(name or dataset)
+
+    _finish_dataset(dataset_dir, manifest, new_manifest)
+    logging.info(f"Parquet {dataset}: {len(written)} of {len(partitions)} partitions written")
+    return written
+
+
+class PartitionedWriter:
+    # Streaming counterpart of write_dataset: every batch is appended to one
+    # open Parquet file per partition, so only the current batch is held in
+    # memory. The partition hashes are built incrementally and match
+    # frame_digest of the whole partition, so unchanged partitions are still
+    # left untouched when the writer is closed.
+    def __init__(self, dataset, root):
+        require_pyarrow()
+        self.dataset = dataset
+        self.dataset_dir = os.path.join(root, dataset)
+        self._parts = {}
+        self._dropped = 0
+
+    def write(self, df):
+        typed = apply_schema(df, self.dataset)
+        partitions, dropped = _split_partitions(typed)
+        self._dropped += dropped
+        for name, part in partitions.items():
+            part = part.reset_index(drop=True)
+            state = self._parts.get(name)
+            if state is None:
+                tmp_path = os.path.join(self.dataset_dir, name, PART_FILENAME + '.tmp')
+                os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+                schema = arrow_schema(self.dataset, part.columns)
+                state = self._parts[name] = {
+                    'writer': pq.ParquetWriter(tmp_path, schema),
+                    'schema': schema,
+                    'tmp_path': tmp_path,
+                    'hash': hashlib.sha256(part.iloc[:0].to_csv(index=False).encode('utf-8')),
+                }
+            state['writer'].write_table(pa.Table.from_pandas(part, schema=state['schema'], preserve_index=False))
+            state['hash'].update(part.to_csv(index=False, header=False).encode('utf-8'))
+
+    def close(self):
+        manifest = _read_manifest(self.dataset_dir)
+        written = []
+        new_manifest = {}
+        for name, state in self._parts.items():
+            state['writer'].close()
+            digest = state['hash'].hexdigest()
+            new_manifest[name] = digest
+            part_path = os.path.join(self.dataset_dir, name, PART_FILENAME)
+            if manifest.get(name) == digest and os.path.exists(part_path):
+                os.remove(state['tmp_path'])
+                continue
+            os.replace(state['tmp_path'], part_path)
+            written.append(name or self.dataset)
+
+        _finish_dataset(self.dataset_dir, manifest, new_manifest)
+        _report_dropped(self.dataset, self._dropped)
+        logging.info(f"Parquet {self.dataset}: {len(written)} of {len(new_manifest)} partitions written")
+        return written
+
+    def abort(self):
+        # Leave the previous partitions as they were
+        for state in self._parts.values():
+            state['writer'].close()
+            os.remove(state['tmp_path'])
+        self._parts = {}
+        self._dropped = 0
+
+
+def read_partition(data, dataset, partition_value=None):
+    # Parquet bytes of one partition back into a DataFrame, with the
+    # partition column restored from its folder name
+    require_pyarrow()
+    df = pq.read_table(io.BytesIO(data)).to_pandas()
+    if partition_value is not None:
+        df[PARTITION_COLUMN] = partition_value
+    columns = [column for column in DATASET_COLUMNS[dataset] if column in df.columns]
+    return df[columns]
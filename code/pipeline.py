@@ -0,0 +1,237 @@
+import os
+import time
+import logging
+import subprocess
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Task states
+PENDING = 'pending'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+# Seconds between checks for the marker files of running tasks
+MARKER_POLL_INTERVAL = 0.5
+
+
+class Task:
+    def __init__(self, name, stage, command, depends_on=(), marker=None):
+        self.name = name
+        self.stage = stage
+        self.command = command
+        self.depends_on = list(depends_on)
+        # Marker tasks run no command, see Pipeline.add_marker
+        self.marker = marker
+        self.status = PENDING
+        self.returncode = None
+        self.ready = None
+        self.started = None
+        self.finished = None
+
+    @property
+    def duration(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    @property
+    def queued(self):
+        # Time spent waiting for a free slot in its stage after the inputs were ready
+        if self.ready is None or self.started is None:
+            return 0.0
+        return self.started - self.ready
+
+
+class Pipeline:
+    # Runs a DAG of commands. A task starts as soon as all of its own
+    # dependencies have succeeded and its stage has a free slot; a failed task
+    # skips everything downstream of it while independent branches carry on.
+    # Marker tasks let other tasks start on part of a long-running task's work.
+    def __init__(self, stage_limits=None, cwd=None, default_limit=1):
+        self.stage_limits = dict(stage_limits or {})
+        self.default_limit = default_limit
+        self.cwd = cwd
+        self.tasks = {}
+        self.started = None
+        self.finished = None
+
+    def add(self, name, stage, command, depends_on=()):
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task: {name}")
+        task = Task(name, stage, command, depends_on)
+        self.tasks[name] = task
+        return task
+
+    def add_marker(self, name, stage, path, producer):
+        # A task without a command that succeeds as soon as the producer task
+        # writes the file at path, and fails if the producer ends without
+        # writing it. It takes no slot of its stage.
+        task = self.add(name, stage, None, [producer])
+        task.marker = path
+        return task
+
+    def _check_markers(self, pending):
+        # Settle the marker tasks whose producer has started or was skipped
+        now = time.monotonic()
+        for name, task in list(pending.items()):
+            if task.marker is None:
+                continue
+            producer = self.tasks[task.depends_on[0]]
+            if producer.status == SKIPPED:
+                task.status = SKIPPED
+                del pending[name]
+                logging.warning(f"Skipping {name} because {producer.name} did not run")
+                continue
+            if producer.started is None:
+                continue
+            if os.path.exists(task.marker):
+                task.status = SUCCEEDED
+                logging.info(f"Finished {name}")
+            elif producer.status in (SUCCEEDED, FAILED):
+                task.status = FAILED
+                logging.error(f"{name} failed: {producer.name} ended without writing {task.marker}")
+            else:
+                continue
+            del pending[name]
+            task.ready = task.started = producer.started
+            task.finished = now
+
+    def _validate(self):
+        for task in self.tasks.values():
+            for dependency in task.depends_on:
+                if dependency not in self.tasks:
+                    raise ValueError(f"Task {task.name} depends on unknown task {dependency}")
+
+        # Kahn's algorithm, anything left over is part of a cycle
+        remaining = {name: set(task.depends_on) for name, task in self.tasks.items()}
+        while True:
+            done = [name for name, deps in remaining.items() if not deps]
+            if not done:
+                break
+            for name in done:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(done)
+        if remaining:
+            raise ValueError(f"Dependency cycle between tasks: {sorted(remaining)}")
+
+    def _limit(self, stage):
+        return self.stage_limits.get(stage, self.default_limit)
+
+    def _run_task(self, task):
+        logging.info(f"Starting {task.name}: {' '.join(task.command)}")
+        result = subprocess.run(task.command, cwd=self.cwd)
+        return result.returncode
+
+    def _skip_failed_branches(self, pending):
+        changed = True
+        while changed:
+            changed = False
+            for name, task in list(pending.items()):
+                if task.marker is not None:
+                    # Settled by _check_markers, which sees its producer fail
+                    continue
+                failed = [d for d in task.depends_on if self.tasks[d].status in (FAILED, SKIPPED)]
+                if failed:
+                    task.status = SKIPPED
+                    del pending[name]
+                    changed = True
+                    logging.warning(f"Skipping {name} because {', '.join(failed)} did not succeed")
+
+    def run(self):
+        self._validate()
+        self.started = time.monotonic()
+
+        # Markers left by earlier runs do not count
+        for task in self.tasks.values():
+            if task.marker is not None and os.path.exists(task.marker):
+                os.remove(task.marker)
+
+        pending = dict(self.tasks)
+        running = {}
+        stage_running = defaultdict(int)
+
+        with ThreadPoolExecutor(max_workers=max(len(self.tasks), 1)) as executor:
+            while pending or running:
+                self._check_markers(pending)
+                self._skip_failed_branches(pending)
+
+                # Launch every ready task that fits in its stage limit, in definition order
+                now = time.monotonic()
+                for name, task in list(pending.items()):
+                    if task.marker is not None:
+                        continue
+                    if any(self.tasks[d].status != SUCCEEDED for d in task.depends_on):
+                        continue
+                    if task.ready is None:
+                        task.ready = now
+                    if stage_running[task.stage] >= self._limit(task.stage):
+                        continue
+
+                    del pending[name]
+                    stage_running[task.stage] += 1
+                    task.status = RUNNING
+                    task.started = time.monotonic()
+                    running[executor.submit(self._run_task, task)] = task
+
+                if not running:
+                    break
+
+                # Wake up now and then to look for markers while their producers run
+                markers = any(task.marker is not None for task in pending.values())
+                done, _ = wait(running, timeout=MARKER_POLL_INTERVAL if markers else None,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    task.finished = time.monotonic()
+                    stage_running[task.stage] -= 1
+                    try:
+                        task.returncode = future.result()
+                    except Exception as e:
+                        logging.error(f"Could not run {task.name}: {str(e)}")
+                        task.returncode = None
+
+                    if task.returncode == 0:
+                        task.status = SUCCEEDED
+                        logging.info(f"Finished {task.name} in {task.duration:.1f}s")
+                    else:
+                        task.status = FAILED
+                        logging.error(f"{task.name} failed with exit code {task.returncode}")
+
+        self.finished = time.monotonic()
+        return all(task.status == SUCCEEDED for task in self.tasks.values())
+
+    def critical_path(self):
+        # Walk back from the task that finished last, always through the
+        # dependency that finished last, i.e. the one that gated its start
+        finished = [task for task in self.tasks.values() if task.finished is not None]
+        if not finished:
+            return []
+
+        task = max(finished, key=lambda t: t.finished)
+        path = [task]
+        while True:
+            dependencies = [self.tasks[d] for d in task.depends_on if self.tasks[d].finished is not None]
+            if not dependencies:
+                break
+            task = max(dependencies, key=lambda t: t.finished)
+            path.append(task)
+        return list(reversed(path))
+
+    def summary(self):
+        lines = ["Pipeline timing summary:"]
+        for task in self.tasks.values():
+            lines.append(
+                f"  {task.name:<32} {task.status:<10} {task.duration:8.1f}s"
+                f"  (queued {task.queued:.1f}s)"
+            )
+
+        path = self.critical_path()
+        if path:
+            total = sum(task.duration + task.queued for task in path)
+            lines.append(f"Critical path ({total:.1f}s): " + ' -> '.join(task.name for task in path))
+        if self.started is not None and self.finished is not None:
+            lines.append(f"Wall time: {self.finished - self.started:.1f}s")
+        return '\n'.join(lines)
@@ -0,0 +1,217 @@
+import os
+import sys
+import glob
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from metrics import METRICS
+
+try:
+    import duckdb
+except ImportError:  # The query API is optional
+    duckdb = None
+
+# Datasets exposed as views, named like the MySQL tables
+DATASETS = ['Olympiad', 'ContinentalMedals', 'Sports', 'AthletesMedals', 'CountryMedals']
+
+# Output folders of the scrapers, relative to the code directory
+CSV_FOLDER = 'csvFiles'
+PARQUET_FOLDER = os.environ.get('PARQUET_FOLDER', 'parquetFiles')
+
+SOURCES = ('csv', 'parquet')
+
+# Results kept in the LRU cache
+DEFAULT_CACHE_SIZE = 128
+
+# The nine queries of businessQueries.sql, parameters are bound with ?. Ties in
+# top_athletes are broken by name and year so the LIMIT is deterministic.
+QUERIES = {
+    'disciplines_by_season': '''
+        SELECT DISTINCT Discipline, Season
+        FROM Sports
+        ORDER BY Season, Discipline''',
+    'olympiad': '''
+        SELECT Years, Host_City, Nations, Athletes
+        FROM Olympiad
+        WHERE Years = ?''',
+    'country_medals': '''
+        SELECT Team, Gold, Silver, Bronze, Total
+        FROM CountryMedals
+        WHERE Years = ?
+        ORDER BY Total DESC''',
+    'athlete_medals': '''
+        SELECT Athlete_Name, Gold, Silver, Bronze, Total
+        FROM AthletesMedals
+        WHERE Years = ?
+        ORDER BY Total DESC''',
+    'continent_totals': '''
+        SELECT Continent, SUM(Gold) AS Total_Gold, SUM(Silver) AS Total_Silver,
+               SUM(Bronze) AS Total_Bronze, SUM(Total) AS Grand_Total
+        FROM ContinentalMedals
+        WHERE Years = ?
+        GROUP BY Continent
+        ORDER BY Grand_Total DESC''',
+    'country_history': '''
+        SELECT cm.Team, cm.Gold, cm.Silver, cm.Bronze, cm.Total, o.Years, o.Host_City
+        FROM CountryMedals cm
+        JOIN Olympiad o ON cm.Years = o.Years
+        WHERE cm.Team = ?
+        ORDER BY o.Years''',
+    'top_continent': '''
+        SELECT Continent, Gold, Silver, Bronze, Total
+        FROM ContinentalMedals
+        WHERE Years = ?
+        AND Position = 1''',
+    'largest_olympiad': '''
+        SELECT o.Years, o.Host_City, o.Nations, o.Athletes, cm.Gold, cm.Silver, cm.Bronze, cm.Total
+        FROM Olympiad o
+        LEFT JOIN ContinentalMedals cm ON o.Years = cm.Years AND cm.Continent = ?
+        ORDER BY o.Nations DESC, o.Athletes DESC
+        LIMIT 1''',
+    'top_athletes': '''
+        SELECT am.Athlete_Name, am.Gold, am.Silver, am.Bronze, am.Total, o.Host_City, o.Years
+        FROM AthletesMedals am
+        JOIN Olympiad o ON am.Years = o.Years
+        ORDER BY am.Total DESC, am.Gold DESC, am.Athlete_Name, o.Years
+        LIMIT ?''',
+}
+
+
+def require_duckdb():
+    if duckdb is None:
+        raise ImportError("The query API needs duckdb, install it with `pip install duckdb`")
+
+
+def _literal(path):
+    return "'" + path.replace("'", "''") + "'"
+
+
+class OlympicsQueries:
+    # Runs the business queries in-process with DuckDB directly over the CSV
+    # or Parquet outputs, no database server needed. Results are kept in an
+    # LRU cache keyed by query, parameters and the data version (size and
+    # mtime of the files read), so they are reused until the files change.
+    def __init__(self, source='csv', csv_folder=CSV_FOLDER, parquet_folder=PARQUET_FOLDER, cache_size=DEFAULT_CACHE_SIZE):
+        require_duckdb()
+        if source not in SOURCES:
+            raise ValueError(f"Unknown source {source}, expected one of {SOURCES}")
+        self.source = source
+        self.csv_folder = csv_folder
+        self.parquet_folder = parquet_folder
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = duckdb.connect()
+        self._views_version = None
+
+    def _files(self, dataset):
+        if self.source == 'csv':
+            path = os.path.join(self.csv_folder, f'{dataset}.csv')
+            return [path] if os.path.exists(path) else []
+        return sorted(glob.glob(os.path.join(self.parquet_folder, dataset, '**', '*.parquet'), recursive=True))
+
+    def data_version(self):
+        # Changes whenever a file is added, removed or rewritten
+        version = []
+        for dataset in DATASETS:
+            for path in self._files(dataset):
+                stat = os.stat(path)
+                version.append((path, stat.st_size, stat.st_mtime_ns))
+        return tuple(version)
+
+    def _create_views(self, version):
+        for dataset in DATASETS:
+            files = self._files(dataset)
+            if not files:
+                continue
+            if self.source == 'csv':
+                relation = f"read_csv_auto({_literal(files[0])}, header=true)"
+            else:
+                # Years comes back from the Years=<year> folder names
+                pattern = os.path.join(self.parquet_folder, dataset, '**', '*.parquet')
+                relation = f"read_parquet({_literal(pattern)}, hive_partitioning=true)"
+            self._connection.execute(f'CREATE OR REPLACE VIEW {dataset} AS SELECT * FROM {relation}')
+        self._views_version = version
+
+    def query(self, name, *params):
+        version = self.data_version()
+        key = (name, params, version)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                METRICS.inc('query_cache_hits_total', query=name)
+                return self._cache[key].copy()
+
+            self.misses += 1
+            if version != self._views_version:
+                self._create_views(version)
+            with METRICS.timer('query_seconds', query=name):
+                result = self._connection.execute(QUERIES[name], list(params)).fetchdf()
+
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return result.copy()
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # The business queries
+
+    def disciplines_by_season(self):
+        return self.query('disciplines_by_season')
+
+    def olympiad(self, year):
+        return self.query('olympiad', int(year))
+
+    def country_medals(self, year):
+        return self.query('country_medals', int(year))
+
+    def athlete_medals(self, year):
+        return self.query('athlete_medals', int(year))
+
+    def continent_totals(self, year):
+        return self.query('continent_totals', int(year))
+
+    def country_history(self, team):
+        return self.query('country_history', team)
+
+    def top_continent(self, year):
+        return self.query('top_continent', int(year))
+
+    def largest_olympiad(self, continent='Asia'):
+        return self.query('largest_olympiad', continent)
+
+    def top_athletes(self, limit=10):
+        return self.query('top_athletes', int(limit))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a business query over the pipeline outputs.')
+    parser.add_argument('query', choices=sorted(QUERIES), help='query to run')
+    parser.add_argument('params', nargs='*', help='query parameters, e.g. a year or a team')
+    parser.add_argument('--source', choices=SOURCES, default='csv', help='read csvFiles or the Parquet partitions')
+    args = parser.parse_args()
+
+    with OlympicsQueries(args.source) as queries:
+        print(getattr(queries, args.query)(*args.params).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
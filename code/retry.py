@@ -0,0 +1,34 @@
+import time
+import random
+import logging
+from metrics import METRICS
+
+# Attempts per unit, including the first one
+DEFAULT_ATTEMPTS = 4
+
+# Backoff before retry n is drawn from [0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** n)]
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, maximum=BACKOFF_MAX):
+    # Exponential backoff with full jitter, so workers that failed together
+    # do not all retry at the same moment
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+def retry_call(function, description, attempts=DEFAULT_ATTEMPTS, retry_if=lambda error: True, sleep=time.sleep):
+    # Call function until it succeeds, at most `attempts` times. Errors for
+    # which retry_if is false are raised at once, the last error is raised
+    # when every attempt failed.
+    for attempt in range(attempts):
+        try:
+            return function()
+        except Exception as e:
+            if attempt + 1 >= attempts or not retry_if(e):
+                raise
+            delay = backoff_delay(attempt)
+            METRICS.inc('retries_total')
+            logging.warning(f"{description} failed ({type(e).__name__}: {str(e).strip()}), "
+                            f"retry {attempt + 1} of {attempts - 1} in {delay:.1f}s")
+            sleep(delay)
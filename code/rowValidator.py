@@ -0,0 +1,100 @@
+import os
+import logging
+import pandas as pd
+from tableDependencies import TABLE_SCHEMAS
+from datasetCleaner import DATASET_KEYS
+from metrics import METRICS
+
+# Folder the rows rejected by the last load of every table are written to
+QUARANTINE_FOLDER = os.environ.get('QUARANTINE_FOLDER', 'quarantine')
+
+# Column of a quarantined row listing the constraints it breaks
+REASON_COLUMN = 'Rejected_Because'
+
+# SQL types checked as integers and the range of a MySQL INT
+INT_TYPES = ('INT', 'INTEGER')
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+class TableValidator:
+    # Checks the rows of one table load against schemaFile.sql before they
+    # reach the database: INT columns must hold integers in range (numeric
+    # text such as '1.' is converted), VARCHAR values must fit their length,
+    # natural key columns (DATASET_KEYS) must not be null, UNIQUE columns
+    # must not repeat within the load and foreign key columns
+    # must hold values of their parent table (parent_keys, column -> values).
+    # Every check is vectorized over the whole DataFrame. Rows breaking a
+    # constraint are left out of the load and written to
+    # <QUARANTINE_FOLDER>/<table>.csv with the reasons, so the other rows
+    # still load in one pass.
+    def __init__(self, table_name, parent_keys=None, folder=QUARANTINE_FOLDER):
+        self.table_name = table_name
+        self.schema = TABLE_SCHEMAS.get(table_name)
+        self.parent_keys = parent_keys or {}
+        self.path = os.path.join(folder, f'{table_name}.csv')
+        self.rejected = 0
+        # Values of the UNIQUE columns accepted so far, across chunks
+        self._seen = {}
+
+        # The quarantine file only holds the rows of the latest load
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def check(self, df):
+        # Rows of df that satisfy the schema, with INT columns as Int64
+        if self.schema is None:
+            return df
+
+        checked = df.copy()
+        failures = {}
+        for name, column in self.schema.columns.items():
+            if name not in df.columns:
+                continue
+            present = df[name].notna()
+            if column.type in INT_TYPES:
+                numbers = pd.to_numeric(df[name], errors='coerce')
+                invalid = present & (numbers.isna() | (numbers % 1 != 0) | (numbers < INT_MIN) | (numbers > INT_MAX))
+                failures[f'{name} is not an INT'] = invalid
+                checked[name] = numbers.where(~invalid).astype('Int64')
+            elif column.length is not None:
+                failures[f'{name} is longer than {column.length}'] = present & (
+                    df[name].astype('string').str.len() > column.length)
+
+        for name in DATASET_KEYS.get(self.table_name, []):
+            if name in df.columns:
+                failures[f'{name} is null'] = df[name].isna()
+
+        for key in self.schema.foreign_keys:
+            if key.column in checked.columns and key.column in self.parent_keys:
+                values = checked[key.column]
+                failures[f'{key.column} is not in {key.parent}'] = values.notna() & ~values.isin(self.parent_keys[key.column])
+
+        flags = pd.DataFrame(failures, index=df.index, dtype=bool)
+        rejected = flags.any(axis=1)
+
+        # Later rows repeating a value of a UNIQUE column, among the otherwise valid rows
+        for name, column in self.schema.columns.items():
+            if column.unique and name in checked.columns:
+                seen = self._seen.setdefault(name, set())
+                values = checked[name]
+                repeated = ~rejected & values.notna() & (values.duplicated() | values.isin(seen))
+                flags[f'{name} is not unique'] = repeated
+                rejected |= repeated
+                seen.update(values[~rejected].dropna())
+
+        if rejected.any():
+            self.quarantine(df[rejected], flags[rejected])
+        return checked[~rejected]
+
+    def quarantine(self, rows, flags):
+        reasons = flags.dot(pd.Index(flags.columns) + '; ').str.rstrip('; ')
+        rows = rows.assign(**{REASON_COLUMN: reasons})
+        for reason, count in flags.sum().items():
+            if count:
+                METRICS.inc('rows_rejected_total', int(count), table=self.table_name, reason=reason)
+        logging.warning(f'{self.table_name}: quarantined {len(rows)} rows to {self.path}: '
+                        f'{", ".join(sorted(set(reasons)))}')
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        rows.to_csv(self.path, mode='a', header=not os.path.exists(self.path), index=False)
+        self.rejected += len(rows)
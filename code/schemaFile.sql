@@ -13,6 +13,8 @@ DROP TABLE IF EXISTS Olympiad;
 DROP TABLE IF EXISTS CountryMedals;
 DROP TABLE IF EXISTS ContinentalMedals;
 DROP TABLE IF EXISTS AthletesMedals;
+DROP TABLE IF EXISTS CountryCareerTotals;
+DROP TABLE IF EXISTS TopAthletesByYear;
 
 -- Enable foreign key checks
 SET FOREIGN_KEY_CHECKS = 1;
@@ -49,7 +51,7 @@ CREATE TABLE CountryMedals (
 CREATE TABLE ContinentalMedals (
     id INT AUTO_INCREMENT PRIMARY KEY,
     Years INT,
-    Position VARCHAR(10),
+    Position INT,
     Continent VARCHAR(255),
     Gold INT,
     Silver INT,
@@ -68,3 +70,35 @@ CREATE TABLE AthletesMedals (
     Years INT,
     FOREIGN KEY (Years) REFERENCES Olympiad(Years)
 );
+
+-- Secondary indexes for the filters, sorts and joins in businessQueries.sql
+CREATE INDEX idx_countrymedals_years_total ON CountryMedals (Years, Total);
+CREATE INDEX idx_countrymedals_team_years ON CountryMedals (Team, Years);
+CREATE INDEX idx_athletesmedals_years_total ON AthletesMedals (Years, Total);
+CREATE INDEX idx_continentalmedals_years_position ON ContinentalMedals (Years, Position);
+CREATE INDEX idx_sports_season_discipline ON Sports (Season, Discipline);
+
+-- Summary tables, refreshed by dataLoading.py for the Years/Teams of every load (see summaryTables.py,
+-- which creates them from these statements). TopAthletesByYear is ranked with ROW_NUMBER(), which
+-- needs MySQL 8.0 or later.
+CREATE TABLE CountryCareerTotals (
+    Team VARCHAR(255) PRIMARY KEY,
+    Games INT,
+    Gold INT,
+    Silver INT,
+    Bronze INT,
+    Total INT,
+    First_Year INT,
+    Last_Year INT
+);
+
+CREATE TABLE TopAthletesByYear (
+    Years INT,
+    Rank_In_Year INT,
+    Athlete_Name VARCHAR(255),
+    Gold INT,
+    Silver INT,
+    Bronze INT,
+    Total INT,
+    PRIMARY KEY (Years, Rank_In_Year)
+);
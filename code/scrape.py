@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import logging
+import argparse
+from sources import SOURCE_REGISTRY, ScrapeContext, run_sources
+from scrapeManifest import ScrapeRun, DEFAULT_MANIFEST_DIR
+from datasetCleaner import CSV_FOLDER
+from continentIndex import CONTINENTAL_MEDALS_SOURCE, reconcile_datasets
+from metrics import setup as setup_metrics
+
+# Importing the source modules registers their sources
+import espn
+import olympedia
+import olympianDatabase
+
+# Sources in registry order, each with the datasets (CSV file / MySQL table) it produces
+SOURCES = {name: list(source.datasets) for name, source in SOURCE_REGISTRY.items()}
+
+# Dataset -> source producing it
+DATASET_SOURCES = {dataset: name for name, datasets in SOURCES.items() for dataset in datasets}
+
+# Sources whose datasets the ContinentalMedals reconciliation compares, while it is scraped
+RECONCILED_SOURCES = sorted({DATASET_SOURCES[dataset] for dataset in ('CountryMedals', 'ContinentalMedals')
+                             if dataset in DATASET_SOURCES}) if CONTINENTAL_MEDALS_SOURCE == 'scrape' else []
+
+# Folder of the files marking each source scraped by the current run, which
+# main.py starts the source's ingest on
+COMPLETION_FOLDER = os.path.join(DEFAULT_MANIFEST_DIR, 'done')
+
+
+def completion_marker(source, folder=COMPLETION_FOLDER):
+    return os.path.join(folder, f'{source}.done')
+
+
+def mark_completed(source, folder=COMPLETION_FOLDER):
+    os.makedirs(folder, exist_ok=True)
+    with open(completion_marker(source, folder), 'w', encoding='utf-8') as f:
+        f.write(f'{time.time()}\n')
+
+
+def reconcile():
+    if not all(os.path.exists(os.path.join(CSV_FOLDER, f'{dataset}.csv')) for dataset in ('CountryMedals', 'ContinentalMedals')):
+        logging.warning("CountryMedals or ContinentalMedals is missing, not reconciling them")
+        return
+    try:
+        reconcile_datasets()
+    except Exception as e:
+        logging.error(f"Reconciling ContinentalMedals failed: {str(e)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scrape the Olympics sources in one process.')
+    parser.add_argument('sources', nargs='*', help=f"sources to scrape ({', '.join(SOURCES)}), all by default")
+    parser.add_argument('--resume', action='store_true',
+                        help='continue an interrupted run, fetching only its failed and missing units')
+    parser.add_argument('--completion-dir', help='write <source>.done here as soon as a source is scraped')
+    args = parser.parse_args()
+    unknown = [name for name in args.sources if name not in SOURCES]
+    if unknown:
+        parser.error(f"unknown sources: {', '.join(unknown)}")
+    names = args.sources or list(SOURCES)
+
+    # Label and export the metrics of this run
+    run_name = '+'.join(names) if args.sources else None
+    setup_metrics('scrape', run_name)
+
+    # Checkpoint the run so an interrupted one can be resumed
+    run = ScrapeRun(name=run_name)
+    os.environ.update(run.start(os.environ.get('SCRAPER_REFRESH') == '1', resume=args.resume))
+    on_finished = (lambda source: mark_completed(source, args.completion_dir)) if args.completion_dir else None
+    with ScrapeContext() as context:
+        succeeded = run_sources(names, context, on_finished)
+
+    # While ContinentalMedals is still scraped, compare it with the totals derived
+    # from CountryMedals when this run scraped both
+    if RECONCILED_SOURCES and set(RECONCILED_SOURCES) <= set(names):
+        reconcile()
+    # Failed units keep the rows of earlier runs, the outputs are still usable
+    run.finish(succeeded and not context.failed_units)
+    return 0 if succeeded else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+# Folder next to the CSV outputs holding manifests and per-unit row data
+DEFAULT_MANIFEST_DIR = os.path.join('csvFiles', '.manifest')
+
+# State of the last scrape run, used by --resume. A run of some of the
+# sources keeps its own state in _run.<sources>.json, so the per-source scrapes
+# started by main.py do not overwrite each other's.
+RUN_FILENAME = '_run.json'
+
+
+def records_digest(records):
+    # Hash of the canonical JSON form of a unit's rows
+    payload = json.dumps(records, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable manifest {path}: {str(e)}")
+        return {}
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+class DatasetManifest:
+    # Tracks which (source, year, page) units of a dataset have already been
+    # scraped. The rows of every unit are kept in their own JSON file, so a
+    # run only fetches the missing or stale units and rebuilds the output by
+    # combining all unit files. Units that failed every attempt are listed
+    # in <dataset>.failed.json until they are stored.
+    def __init__(self, dataset, manifest_dir=DEFAULT_MANIFEST_DIR, refresh=None, refreshed_since=None):
+        if refresh is None:
+            refresh = os.environ.get('SCRAPER_REFRESH') == '1'
+        if refreshed_since is None and os.environ.get('SCRAPER_RESUME_SINCE'):
+            refreshed_since = float(os.environ['SCRAPER_RESUME_SINCE'])
+        self.dataset = dataset
+        self.refresh = refresh
+        # With refresh, units stored after this time already count as refreshed
+        self.refreshed_since = refreshed_since
+        self.parts_dir = os.path.join(manifest_dir, dataset)
+        self.path = os.path.join(manifest_dir, f'{dataset}.json')
+        self.failed_path = os.path.join(manifest_dir, f'{dataset}.failed.json')
+        self._lock = threading.Lock()
+        self.units = _read_json(self.path)
+        self.failed = _read_json(self.failed_path)
+
+    @staticmethod
+    def unit_key(source, year, page=1):
+        return f'{source}/{year}/{page}'
+
+    def _part_path(self, source, year, page):
+        return os.path.join(self.parts_dir, f'{source}_{year}_{page}.json')
+
+    def _read_part(self, source, year, page):
+        with open(self._part_path(source, year, page), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def is_current(self, source, year, page=1):
+        # A unit is current when it was stored before and its rows are still
+        # on disk unchanged
+        entry = self.units.get(self.unit_key(source, year, page))
+        if entry is None:
+            return False
+        if self.refresh and (self.refreshed_since is None or entry.get('updated_at', 0) < self.refreshed_since):
+            return False
+        try:
+            return records_digest(self._read_part(source, year, page)) == entry['sha256']
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def missing(self, units):
+        return [unit for unit in units if not self.is_current(*unit)]
+
+    def store(self, source, year, page, records):
+        digest = records_digest(records)
+        part_path = self._part_path(source, year, page)
+        os.makedirs(self.parts_dir, exist_ok=True)
+
+        with self._lock:
+            tmp_path = f'{part_path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(records, f, default=str)
+            os.replace(tmp_path, part_path)
+
+            previous = self.units.get(self.unit_key(source, year, page), {})
+            self.units[self.unit_key(source, year, page)] = {
+                'source': source,
+                'year': year,
+                'page': page,
+                'rows': len(records),
+                'sha256': digest,
+                'updated_at': time.time(),
+            }
+            _write_json(self.path, self.units)
+            if self.failed.pop(self.unit_key(source, year, page), None) is not None:
+                _write_json(self.failed_path, self.failed)
+
+        if previous.get('sha256') == digest:
+            logging.info(f"{self.dataset} {self.unit_key(source, year, page)} unchanged")
+        else:
+            logging.info(f"Stored {len(records)} rows for {self.dataset} {self.unit_key(source, year, page)}")
+
+    def mark_failed(self, source, year, page, error):
+        # Record a unit that failed every attempt; rows stored by an earlier
+        # run are kept and the unit is retried by the next run
+        with self._lock:
+            self.failed[self.unit_key(source, year, page)] = {
+                'source': source,
+                'year': year,
+                'page': page,
+                'error': f'{type(error).__name__}: {str(error).strip()}',
+                'failed_at': time.time(),
+            }
+            _write_json(self.failed_path, self.failed)
+
+    def combine(self, units):
+        # Rows of all stored units in the order given; units that were never
+        # scraped successfully are left out
+        records = []
+        for source, year, page in units:
+            if self.unit_key(source, year, page) not in self.units:
+                logging.warning(f"No data stored for {self.dataset} {self.unit_key(source, year, page)}")
+                continue
+            try:
+                records.extend(self._read_part(source, year, page))
+            except (OSError, ValueError) as e:
+                logging.error(f"Failed to read {self.dataset} {self.unit_key(source, year, page)}: {str(e)}")
+        return records
+
+
+class ScrapeRun:
+    # Checkpoint of a whole scrape run. A run that did not finish cleanly can
+    # be resumed: with --resume the units stored or failed by it are not
+    # redone, so only its failed and missing units are fetched again, even
+    # when it was a refresh run.
+    def __init__(self, manifest_dir=DEFAULT_MANIFEST_DIR, name=None):
+        filename = RUN_FILENAME if name is None else RUN_FILENAME.replace('.json', f'.{name}.json')
+        self.path = os.path.join(manifest_dir, filename)
+
+    def last(self):
+        return _read_json(self.path)
+
+    def start(self, refresh, resume=False):
+        # Returns the environment the scrapers of this run read
+        previous = self.last()
+        if resume and previous and not previous.get('completed'):
+            logging.info(f"Resuming the scrape run started at {time.ctime(previous['started_at'])}")
+            run = dict(previous)
+        else:
+            if resume:
+                logging.info("The last scrape run completed, only failed and missing units are fetched")
+            run = {'started_at': time.time(), 'refresh': refresh}
+        run['completed'] = False
+        _write_json(self.path, run)
+
+        env = {'SCRAPER_REFRESH': '1' if run['refresh'] else '0'}
+        if run['refresh']:
+            env['SCRAPER_RESUME_SINCE'] = repr(run['started_at'])
+        return env
+
+    def finish(self, completed):
+        run = self.last()
+        run['completed'] = completed
+        run['finished_at'] = time.time()
+        _write_json(self.path, run)
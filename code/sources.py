@@ -0,0 +1,282 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+from driverPool import DriverPool, HostRateLimiter
+from browserDriver import create_driver
+from httpFetcher import HttpFetcher, FETCH_HTTP, fetch_mode, fetch_page
+from flagDownloader import FlagDownloader
+from pageCache import PageCache, PageNotCached, MODE_REPLAY
+from scrapeManifest import DatasetManifest
+from retry import retry_call
+from datasetCleaner import clean_dataset, save_dataset
+
+# Number of browsers shared by all sources of a run
+DRIVER_POOL_SIZE = 3
+
+# Threads fetching and parsing the pages of all sources
+SCRAPE_WORKERS = 6
+
+# Minimum number of seconds between two requests to the same host, over
+# HTTP and in browsers alike
+REQUEST_INTERVAL = 1.0
+
+# Seconds a browser waits for the expected table to appear
+BROWSER_WAIT = 10
+
+# Errors a retry cannot fix: pages without the expected tables and pages
+# missing from the cache in replay mode
+PERMANENT_ERRORS = (ValueError, LookupError, PageNotCached)
+
+
+class TableNotFound(Exception):
+    # A page without the table a source waits for: the page may still have
+    # been loading, so the error is transient
+    pass
+
+
+# Source name -> Source subclass, filled by @register
+SOURCE_REGISTRY = {}
+
+
+def register(source_class):
+    SOURCE_REGISTRY[source_class.name] = source_class
+    return source_class
+
+
+class ScrapeContext:
+    # Resources shared by every source scraped in one process: the page
+    # cache, one HTTP session, one per-host rate limiter and one worker pool.
+    # The browsers and the flag downloader are only started when a source
+    # first needs them. Replay runs only parse cached pages and stay offline,
+    # so they download no flags.
+    def __init__(self, cache=None, pool_size=DRIVER_POOL_SIZE, workers=SCRAPE_WORKERS):
+        self.cache = cache if cache is not None else PageCache.from_env()
+        self.rate_limiter = HostRateLimiter(REQUEST_INTERVAL)
+        self.http = HttpFetcher(rate_limiter=self.rate_limiter)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._drivers = None
+        self._flags = None
+        # (dataset, unit) of every unit that failed all attempts
+        self.failed_units = []
+
+    def drivers(self):
+        with self._lock:
+            if self._drivers is None:
+                self._drivers = DriverPool(create_driver, size=self.pool_size, rate_limiter=self.rate_limiter)
+            return self._drivers
+
+    def flags(self):
+        # Flag downloader, None in replay mode
+        if self.cache.mode == MODE_REPLAY:
+            return None
+        with self._lock:
+            if self._flags is None:
+                self._flags = FlagDownloader()
+            return self._flags
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self._flags is not None:
+            self._flags.close()
+        if self._drivers is not None:
+            self._drivers.close()
+        self.http.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def submit_missing_units(executor, manifest, jobs):
+    # Only schedule the units that are not already stored in the manifest
+    futures = {}
+    missing = set(manifest.missing(jobs))
+    for unit, (function, args) in jobs.items():
+        if unit not in missing:
+            logging.info(f"{manifest.dataset} {manifest.unit_key(*unit)} is up to date, skipping")
+            continue
+        futures[unit] = executor.submit(function, *args)
+    return futures
+
+
+def wait_for_units(manifest, futures):
+    # Wait for every submitted unit. Units checkpoint themselves as they
+    # finish; a failed unit keeps the rows of earlier runs and is retried by
+    # the next run.
+    for unit, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            logging.error(f"Error occurred while scraping {manifest.dataset} {manifest.unit_key(*unit)}: {str(e)}")
+
+
+def is_transient(error):
+    return not isinstance(error, PERMANENT_ERRORS)
+
+
+class Source:
+    # One scraped website. A subclass names the datasets it produces, gives
+    # the URL of every (source, year, page) unit of them in catalogue() and
+    # turns a fetched page into rows in extract(). Fetching (HTTP or browser
+    # per fetch_mode), the page cache, the unit manifests, cleaning against
+    # the dataset schema and saving are shared by all sources.
+    name = None
+    datasets = []
+
+    # How pages are loaded, see httpFetcher
+    fetch_mode = FETCH_HTTP
+
+    # CSS selector of the table a browser waits for
+    browser_selector = None
+
+    # Datasets whose pages may lack that table, e.g. pages past the last page
+    # of results: the browser returns them after waiting and extract() raises
+    # TableNotFound unless the page says it is empty. The page is loaded once
+    # more before its missing table counts as the end of the results.
+    pages_without_table = ()
+
+    # Column names of datasets whose rows are extracted as lists
+    columns = {}
+
+    def catalogue(self):
+        # {dataset: {(source, year, page): url}}
+        raise NotImplementedError
+
+    def extract(self, dataset, unit, url, html, context):
+        # Rows of one fetched page
+        raise NotImplementedError
+
+    def is_complete(self, dataset, html):
+        # Whether HTML has what extract() needs. Server HTML that does not is
+        # loaded in a browser instead, and no incomplete page is cached.
+        return True
+
+    def load_with_browser(self, url, context, dataset=None):
+        # Imported here so runs that never start a browser skip loading selenium
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+
+        pool = context.drivers()
+        with pool.driver() as driver:
+            pool.get(driver, url)
+
+            # Wait until the table is present
+            try:
+                WebDriverWait(driver, BROWSER_WAIT).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, self.browser_selector))
+                )
+            except TimeoutException:
+                if dataset not in self.pages_without_table:
+                    raise
+                logging.info(f"No {self.browser_selector} table in {url} after {BROWSER_WAIT}s")
+            return driver.page_source
+
+    def fetch(self, dataset, url, context):
+        # Serve the page from the cache when possible, otherwise load it the way this source needs
+        is_complete = lambda html: self.is_complete(dataset, html)
+        return context.cache.get(url, lambda: fetch_page(
+            url, fetch_mode(self.fetch_mode), context.http,
+            lambda page_url: self.load_with_browser(page_url, context, dataset),
+            is_complete), is_complete)
+
+    def scrape_unit(self, dataset, unit, url, context):
+        logging.info(f"Scraping {dataset} {DatasetManifest.unit_key(*unit)} from {url}")
+        try:
+            return self.extract(dataset, unit, url, self.fetch(dataset, url, context), context)
+        except TableNotFound:
+            if dataset not in self.pages_without_table:
+                raise
+        # A slow page looks like one past the last page, only a page still
+        # without its table when loaded again is taken as the end
+        logging.info(f"No table in {url}, loading it again")
+        try:
+            return self.extract(dataset, unit, url, self.fetch(dataset, url, context), context)
+        except TableNotFound:
+            logging.info(f"No table in {url} after loading it again, taking it as the end of the results")
+            return []
+
+    def run_unit(self, dataset, unit, url, context, manifest):
+        # Scrape one unit, retrying transient errors with backoff, and
+        # checkpoint it to the manifest as soon as it is done
+        try:
+            rows = retry_call(lambda: self.scrape_unit(dataset, unit, url, context),
+                              f"{dataset} {manifest.unit_key(*unit)}", retry_if=is_transient)
+        except Exception as e:
+            manifest.mark_failed(*unit, e)
+            context.failed_units.append((dataset, unit))
+            raise
+        if rows:
+            manifest.store(*unit, rows)
+        return rows
+
+    def submit_units(self, dataset, context):
+        # Start fetching the units of a dataset that are not stored yet
+        manifest = DatasetManifest(dataset)
+        jobs = {
+            unit: (self.run_unit, (dataset, unit, url, context, manifest))
+            for unit, url in self.catalogue()[dataset].items()
+        }
+        return manifest, submit_missing_units(context.executor, manifest, jobs)
+
+    def save(self, dataset, manifest, futures):
+        # Wait for the fetched units, then clean and save the rows of every
+        # unit of the dataset, including the ones stored by earlier runs.
+        # Returns whether the dataset was saved.
+        wait_for_units(manifest, futures)
+        records = manifest.combine(self.catalogue()[dataset])
+        if not records:
+            logging.warning(f"No data found for {dataset}.")
+            return False
+        df = pd.DataFrame(records, columns=self.columns.get(dataset))
+        logging.debug("DataFrame for %s:\n%s", dataset, df)
+        save_dataset(clean_dataset(df, dataset), dataset)
+        return True
+
+    def run(self, context):
+        # Submit the missing units of every dataset first so they are fetched
+        # concurrently, then save the datasets in turn
+        pending = {dataset: self.submit_units(dataset, context) for dataset in self.datasets}
+        for dataset, (manifest, futures) in pending.items():
+            self.save(dataset, manifest, futures)
+
+
+def run_sources(names, context=None, on_finished=None):
+    # Scrape the named sources concurrently in this process, sharing one
+    # context, calling on_finished(name) as soon as a source has saved its
+    # datasets. Returns whether every source finished; units that failed
+    # every attempt are listed in context.failed_units.
+    unknown = [name for name in names if name not in SOURCE_REGISTRY]
+    if unknown:
+        raise ValueError(f"Unknown sources {unknown}, expected some of {sorted(SOURCE_REGISTRY)}")
+
+    owns_context = context is None
+    if owns_context:
+        context = ScrapeContext()
+    succeeded = True
+    try:
+        with ThreadPoolExecutor(max_workers=max(len(names), 1)) as runner:
+            futures = {runner.submit(SOURCE_REGISTRY[name]().run, context): name for name in names}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                    logging.info(f"Finished scraping {name}")
+                    if on_finished is not None:
+                        on_finished(name)
+                except Exception as e:
+                    logging.error(f"Error occurred while scraping {name}: {str(e)}")
+                    succeeded = False
+        if context.failed_units:
+            logging.error(f"{len(context.failed_units)} units failed every attempt, "
+                          f"rerun with --resume to fetch only the failed and missing units")
+    finally:
+        if owns_context:
+            context.close()
+    return succeeded
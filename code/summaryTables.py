@@ -0,0 +1,103 @@
+import logging
+from sqlalchemy import inspect, text, bindparam
+from metrics import METRICS
+from tableDependencies import CREATE_STATEMENTS, INDEX_STATEMENTS
+
+# Athletes kept per year in TopAthletesByYear
+TOP_ATHLETES = 10
+
+# Summary tables kept up to date by dataLoading.py, created from their DDL in
+# schemaFile.sql. Every summary is derived from one source table and refreshed
+# per scope key: the Years that were loaded, or the Teams that appear in them.
+# `select` computes the rows of the keys given in {filter}. TopAthletesByYear
+# ranks with ROW_NUMBER(), which needs MySQL 8.0 or later (SQLite 3.25).
+SUMMARY_TABLES = {
+    'CountryCareerTotals': {
+        'source': 'CountryMedals',
+        'scope': 'Team',
+        'select': '''SELECT Team, COUNT(DISTINCT Years), SUM(Gold), SUM(Silver), SUM(Bronze), SUM(Total),
+                   MIN(Years), MAX(Years)
+            FROM CountryMedals
+            WHERE Team IS NOT NULL {filter}
+            GROUP BY Team''',
+    },
+    'TopAthletesByYear': {
+        'source': 'AthletesMedals',
+        'scope': 'Years',
+        'select': f'''SELECT Years, Rank_In_Year, Athlete_Name, Gold, Silver, Bronze, Total
+            FROM (
+                SELECT Years, Athlete_Name, Gold, Silver, Bronze, Total,
+                       ROW_NUMBER() OVER (PARTITION BY Years ORDER BY Total DESC, Gold DESC, Silver DESC, Athlete_Name) AS Rank_In_Year
+                FROM AthletesMedals
+                WHERE Years IS NOT NULL {{filter}}
+            ) ranked
+            WHERE Rank_In_Year <= {TOP_ATHLETES}''',
+    },
+}
+
+
+def ensure_summary_tables(connection):
+    for summary in SUMMARY_TABLES:
+        connection.execute(text(CREATE_STATEMENTS[summary]))
+
+
+def ensure_indexes(connection, table_name):
+    # Create the missing secondary indexes schemaFile.sql declares for a table
+    # once it exists; Olympiad.Years is already UNIQUE
+    inspector = inspect(connection)
+    if not inspector.has_table(table_name):
+        return
+    existing = {index['name'] for index in inspector.get_indexes(table_name)}
+    for name, statement in INDEX_STATEMENTS.get(table_name, {}).items():
+        if name not in existing:
+            connection.execute(text(statement))
+            logging.info(f'Created index {name} on {table_name}')
+
+
+def _keys_statement(sql, column, keys):
+    # Limit a statement to the given keys of `column`, or leave it unrestricted for keys=None
+    if keys is None:
+        return text(sql.format(filter='')), {}
+    statement = text(sql.format(filter=f'AND {column} IN :keys')).bindparams(bindparam('keys', expanding=True))
+    return statement, {'keys': list(keys)}
+
+
+def scope_keys(connection, table_name, years):
+    # Keys of every summary fed by table_name that rows of `years` touch;
+    # None means all of them. Call it before and after replacing rows, so keys
+    # that disappear with the old rows are refreshed as well.
+    keys = {}
+    for summary, definition in SUMMARY_TABLES.items():
+        if definition['source'] != table_name:
+            continue
+        if years is None:
+            keys[summary] = None
+        elif definition['scope'] == 'Years':
+            keys[summary] = set(years)
+        else:
+            scope = definition['scope']
+            statement, params = _keys_statement(
+                f'SELECT DISTINCT {scope} FROM {table_name} WHERE {scope} IS NOT NULL {{filter}}', 'Years', years)
+            keys[summary] = {row[0] for row in connection.execute(statement, params)}
+    return keys
+
+
+def refresh(connection, table_name, years=None, before=None):
+    # Recompute the summary rows of the scope keys touched by loading `years`
+    # of table_name (all rows for years=None), inside the load's transaction
+    ensure_indexes(connection, table_name)
+    keys = scope_keys(connection, table_name, years)
+    for summary, summary_keys in keys.items():
+        if summary_keys is not None and before is not None and before.get(summary):
+            summary_keys = summary_keys | before[summary]
+        if summary_keys is not None and not summary_keys:
+            continue
+
+        definition = SUMMARY_TABLES[summary]
+        with METRICS.timer('summary_refresh_seconds', summary=summary):
+            delete, params = _keys_statement(f"DELETE FROM {summary} WHERE 1 = 1 {{filter}}", definition['scope'], summary_keys)
+            connection.execute(delete, params)
+            insert, params = _keys_statement(f"INSERT INTO {summary} {definition['select']}", definition['scope'], summary_keys)
+            result = connection.execute(insert, params)
+        scope = 'all' if summary_keys is None else len(summary_keys)
+        logging.info(f'Refreshed {summary} for {scope} {definition["scope"]} keys ({result.rowcount} rows)')
@@ -0,0 +1,80 @@
+import os
+import re
+from collections import namedtuple
+
+# DDL the load order and the load-time checks are derived from
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schemaFile.sql')
+
+CREATE_TABLE = re.compile(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?\s*\((.*?)\);', re.IGNORECASE | re.DOTALL)
+FOREIGN_KEY = re.compile(r'FOREIGN\s+KEY\s*\(`?(\w+)`?\)\s*REFERENCES\s+`?(\w+)`?\s*\(`?(\w+)`?\)', re.IGNORECASE)
+CREATE_INDEX = re.compile(r'CREATE\s+INDEX\s+`?(\w+)`?\s+ON\s+`?(\w+)`?\s*\([^)]*\)', re.IGNORECASE)
+COLUMN = re.compile(r'`?(\w+)`?\s+(\w+)(?:\s*\((\d+)\))?(.*)', re.IGNORECASE)
+
+# One column of a CREATE TABLE: its SQL type, VARCHAR length (or None) and whether it is UNIQUE
+SqlColumn = namedtuple('SqlColumn', ['name', 'type', 'length', 'unique'])
+
+# FOREIGN KEY (column) REFERENCES parent(parent_column)
+ForeignKey = namedtuple('ForeignKey', ['column', 'parent', 'parent_column'])
+
+TableSchema = namedtuple('TableSchema', ['columns', 'foreign_keys'])
+
+
+def read_ddl(schema_file=SCHEMA_FILE):
+    # The schema without its comments
+    with open(schema_file, 'r', encoding='utf-8') as f:
+        return re.sub(r'--[^\n]*', '', f.read())
+
+
+def read_create_statements(schema_file=SCHEMA_FILE):
+    # Table -> its CREATE TABLE statement, made idempotent
+    return {
+        table: f'CREATE TABLE IF NOT EXISTS {table} ({body.rstrip()}\n)'
+        for table, body in CREATE_TABLE.findall(read_ddl(schema_file))
+    }
+
+
+def read_index_statements(schema_file=SCHEMA_FILE):
+    # Table -> {index name: its CREATE INDEX statement}
+    indexes = {}
+    for statement in CREATE_INDEX.finditer(read_ddl(schema_file)):
+        name, table = statement.groups()
+        indexes.setdefault(table, {})[name] = statement.group(0)
+    return indexes
+
+
+def read_schema(schema_file=SCHEMA_FILE):
+    # Table -> TableSchema for every CREATE TABLE of the schema, one column or
+    # constraint per line as in schemaFile.sql
+    schemas = {}
+    for table, body in CREATE_TABLE.findall(read_ddl(schema_file)):
+        columns, foreign_keys = {}, []
+        for line in body.splitlines():
+            line = line.strip().rstrip(',')
+            if not line:
+                continue
+            foreign_key = FOREIGN_KEY.match(line)
+            if foreign_key:
+                foreign_keys.append(ForeignKey(*foreign_key.groups()))
+                continue
+            column = COLUMN.match(line)
+            if column and column.group(1).upper() not in ('PRIMARY', 'UNIQUE', 'KEY', 'INDEX', 'CONSTRAINT'):
+                name, sql_type, length, rest = column.groups()
+                columns[name] = SqlColumn(name, sql_type.upper(), int(length) if length else None,
+                                          'UNIQUE' in rest.upper())
+        schemas[table] = TableSchema(columns, foreign_keys)
+    return schemas
+
+
+def read_dependencies(schemas):
+    # Table -> tables its foreign keys reference
+    return {
+        table: sorted({key.parent for key in schema.foreign_keys if key.parent != table})
+        for table, schema in schemas.items()
+    }
+
+
+# Computed once from schemaFile.sql
+TABLE_SCHEMAS = read_schema()
+TABLE_DEPENDENCIES = read_dependencies(TABLE_SCHEMAS)
+CREATE_STATEMENTS = read_create_statements()
+INDEX_STATEMENTS = read_index_statements()
@@ -0,0 +1,260 @@
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+# Text inside these elements is never rendered
+HIDDEN_TAGS = ('script', 'style', 'template')
+
+# Elements without an end tag, they never hold text
+VOID_TAGS = ('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr')
+
+# Text-level elements styling part of a line; the text of every other element
+# is set apart by a space, as a browser lays out blocks, flex items and line breaks
+INLINE_TAGS = ('a', 'abbr', 'b', 'bdi', 'cite', 'code', 'em', 'font', 'i', 'mark', 'q', 's', 'small',
+               'strong', 'sub', 'sup', 'time', 'u')
+
+# Tags closing a td, th or tr whose end tag was left out, as HTML allows
+IMPLIED_END = {
+    'td': ('td', 'th', 'tr', 'tbody', 'thead', 'tfoot', 'table'),
+    'th': ('td', 'th', 'tr', 'tbody', 'thead', 'tfoot', 'table'),
+    'tr': ('tr', 'tbody', 'thead', 'tfoot', 'table'),
+}
+
+# Inline styles that hide an element
+HIDDEN_STYLE = re.compile(r'display\s*:\s*none|visibility\s*:\s*hidden', re.IGNORECASE)
+
+
+class TableRow:
+    def __init__(self):
+        self.cells = []         # text of each td
+        self.cell_classes = []  # class names of each td
+        self.images = []        # first img src of each td, None if there is none
+
+    def image(self, cell_class=None):
+        # First image in the row, optionally only from cells with a given class
+        for classes, src in zip(self.cell_classes, self.images):
+            if src is None:
+                continue
+            if cell_class is None or cell_class in classes:
+                return src
+        return None
+
+
+class Table:
+    def __init__(self):
+        self.headers = []
+        self.rows = []
+
+    def resolve_images(self, base_url):
+        # Turn relative image links into absolute URLs, like Selenium's
+        # get_attribute('src') does
+        for row in self.rows:
+            row.images = [urljoin(base_url, src) if src is not None else None for src in row.images]
+        return self
+
+
+def normalize_text(parts):
+    # Text of a cell with every run of whitespace collapsed to one space, like
+    # the visible text Selenium returns on one line
+    return ' '.join(''.join(parts).split())
+
+
+def is_hidden(tag, attrs, hidden_classes):
+    # Whether an element and its text are left out of the visible text
+    if tag in HIDDEN_TAGS or 'hidden' in attrs or attrs.get('aria-hidden') == 'true':
+        return True
+    if HIDDEN_STYLE.search(attrs.get('style') or ''):
+        return True
+    return bool(hidden_classes & set((attrs.get('class') or '').split()))
+
+
+class TableBuilder:
+    # Accumulates the header and body cells found inside one root element.
+    # Rows and cells belong to the innermost table holding them: a table
+    # nested in a cell only adds its text to that cell (it is collected as a
+    # table of its own when it matches too). Text of hidden elements (see
+    # is_hidden) is skipped.
+    def __init__(self, root_tag=None, hidden_classes=()):
+        self.table = Table()
+        self.root_tag = root_tag
+        self.root_depth = 1
+        self.hidden_classes = set(hidden_classes)
+        self._hidden_tag = None
+        self._hidden_depth = 0
+        # Open table elements, counting the root when it is a table itself
+        self._table_depth = 1 if root_tag == 'table' else 0
+        self._thead_depth = 0
+        self._row = None
+        self._row_headers = []
+        self._cell = None
+
+    def start(self, tag, attrs):
+        if tag == self.root_tag:
+            self.root_depth += 1
+        self._track_hidden_start(tag, attrs)
+        if tag not in INLINE_TAGS:
+            self._separate()
+
+        if tag == 'table':
+            self._table_depth += 1
+        if self._table_depth > 1:
+            # Inside a nested table
+            return
+
+        if tag == 'thead':
+            self._thead_depth += 1
+        elif tag == 'tr':
+            self._finish_row()
+            self._row = TableRow()
+        elif tag in ('td', 'th'):
+            self._finish_cell()
+            self._cell = {
+                'tag': tag,
+                'classes': (attrs.get('class') or '').split(),
+                'text': [],
+                'image': None,
+            }
+        elif tag == 'img' and self._cell is not None and self._cell['image'] is None:
+            self._cell['image'] = attrs.get('src')
+
+    def end(self, tag):
+        # Returns True once the root element itself has been closed
+        self._track_hidden_end(tag)
+        if tag not in INLINE_TAGS:
+            self._separate()
+
+        if self._table_depth > 1:
+            if tag == 'table':
+                self._table_depth -= 1
+        elif tag == 'thead':
+            self._finish_row()
+            self._thead_depth = max(self._thead_depth - 1, 0)
+        elif tag in ('td', 'th'):
+            self._finish_cell()
+        elif tag == 'tr':
+            self._finish_row()
+        elif tag == 'table':
+            self._table_depth = max(self._table_depth - 1, 0)
+
+        if tag == self.root_tag:
+            self.root_depth -= 1
+            if self.root_depth == 0:
+                self.finish()
+                return True
+        return False
+
+    def _track_hidden_start(self, tag, attrs):
+        # The outermost hidden element is followed through the elements of
+        # the same tag nested in it
+        if tag in VOID_TAGS:
+            return
+        if self._hidden_depth == 1 and tag in IMPLIED_END.get(self._hidden_tag, ()) and tag != 'table':
+            # The next cell or row starts, the hidden one ends
+            self._hidden_tag, self._hidden_depth = None, 0
+        if self._hidden_tag is None:
+            if is_hidden(tag, attrs, self.hidden_classes):
+                self._hidden_tag, self._hidden_depth = tag, 1
+        elif tag == self._hidden_tag:
+            self._hidden_depth += 1
+
+    def _track_hidden_end(self, tag):
+        if tag != self._hidden_tag and self._hidden_depth == 1 and tag in IMPLIED_END.get(self._hidden_tag, ()):
+            self._hidden_tag, self._hidden_depth = None, 0
+        elif tag == self._hidden_tag:
+            self._hidden_depth -= 1
+            if self._hidden_depth == 0:
+                self._hidden_tag = None
+
+    def _separate(self):
+        if self._cell is not None and self._hidden_tag is None:
+            self._cell['text'].append(' ')
+
+    def data(self, text):
+        if self._cell is not None and self._hidden_tag is None:
+            self._cell['text'].append(text)
+
+    def finish(self):
+        self._finish_row()
+
+    def _finish_cell(self):
+        cell = self._cell
+        if cell is None:
+            return
+        self._cell = None
+
+        text = normalize_text(cell['text'])
+        if cell['tag'] == 'th':
+            self._row_headers.append(text)
+            return
+
+        if self._row is None:
+            self._row = TableRow()
+        self._row.cells.append(text)
+        self._row.cell_classes.append(cell['classes'])
+        self._row.images.append(cell['image'])
+
+    def _finish_row(self):
+        self._finish_cell()
+        row, row_headers = self._row, self._row_headers
+        self._row, self._row_headers = None, []
+
+        # th cells inside thead, or a leading row made only of th cells, are
+        # the column headers
+        has_cells = row is not None and row.cells
+        if row_headers and (self._thead_depth or (not has_cells and not self.table.headers)):
+            self.table.headers.extend(row_headers)
+        if has_cells:
+            self.table.rows.append(row)
+
+
+class TableParser(HTMLParser):
+    # Collects every element carrying all of the requested class names, in
+    # document order and including nested matches, the same elements Selenium
+    # would return for that class. Without class names the whole document is
+    # treated as a single table, which is what an element's outerHTML gives.
+    # Elements with one of hidden_classes are treated as hidden, for the
+    # classes a site hides through its style sheets.
+    def __init__(self, class_names=None, hidden_classes=None):
+        super().__init__(convert_charrefs=True)
+        self.class_names = set(class_names.split()) if class_names else set()
+        self.hidden_classes = set(hidden_classes.split()) if hidden_classes else set()
+        self.tables = []
+        self._builders = []
+        if not self.class_names:
+            self._open(None)
+
+    def _open(self, root_tag):
+        builder = TableBuilder(root_tag, self.hidden_classes)
+        self._builders.append(builder)
+        self.tables.append(builder.table)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        for builder in self._builders:
+            builder.start(tag, attrs)
+
+        classes = set((attrs.get('class') or '').split())
+        if self.class_names and self.class_names <= classes:
+            self._open(tag)
+
+    def handle_endtag(self, tag):
+        self._builders = [builder for builder in self._builders if not builder.end(tag)]
+
+    def handle_data(self, data):
+        for builder in self._builders:
+            builder.data(data)
+
+    def close(self):
+        super().close()
+        for builder in self._builders:
+            builder.finish()
+        self._builders = []
+
+
+def parse_tables(html, class_names=None, hidden_classes=None):
+    # Parse every element with the given class names out of a page source
+    parser = TableParser(class_names, hidden_classes)
+    parser.feed(html)
+    parser.close()
+    return parser.tables
+
@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+from continentIndex import build_index, derive_continental_medals, replaces_saved, seed_index
+
+FLAG_URL = 'https://a.espncdn.com/combiner/i?img=/i/teamlogos/countries/500/{}.png&w=40'
+
+
+def country_medals(teams):
+    # teams: [(team, code, year, gold, silver, bronze)]
+    return pd.DataFrame([
+        {'Team': team, 'Flag_URL': FLAG_URL.format(code) if code else None, 'Years': year,
+         'Gold': gold, 'Silver': silver, 'Bronze': bronze, 'Total': gold + silver + bronze}
+        for team, code, year, gold, silver, bronze in teams
+    ])
+
+
+@pytest.fixture
+def index_file(tmp_path):
+    path = tmp_path / 'continentIndex.csv'
+    path.write_text('Code,Continent\nusa,America\ncan,America\nfra,Europe\nger,\n')
+    return str(path)
+
+
+def test_derive_sums_teams_per_continent(index_file):
+    medals = country_medals([
+        ('United States', 'usa', 2012, 46, 29, 29),
+        ('Canada', 'can', 2012, 1, 5, 12),
+        ('France', 'fra', 2012, 11, 11, 12),
+        ('Independent Olympic Athletes', 'ioc', 2012, 0, 1, 1),
+    ])
+    derived = derive_continental_medals(medals, build_index(medals, index_file))
+    assert derived.to_dict('records') == [
+        {'Years': 2012, 'Position': 1, 'Continent': 'America', 'Gold': 47, 'Silver': 34, 'Bronze': 41, 'Total': 122},
+        {'Years': 2012, 'Position': 2, 'Continent': 'Europe', 'Gold': 11, 'Silver': 11, 'Bronze': 12, 'Total': 34},
+    ]
+
+
+def test_teams_without_a_continent_fail(index_file):
+    medals = country_medals([('United States', 'usa', 2012, 1, 0, 0), ('Germany', 'ger', 2012, 1, 0, 0),
+                             ('Nowhere', None, 2012, 1, 0, 0)])
+    with pytest.raises(ValueError, match='Germany.*Nowhere'):
+        build_index(medals, index_file)
+
+
+def test_seed_adds_new_codes_without_a_continent(index_file, tmp_path):
+    flag_dir = tmp_path / 'flags'
+    flag_dir.mkdir()
+    for name in ('usa.png', 'jpn.png', 'ioc.png'):
+        (flag_dir / name).write_bytes(b'')
+    medals = country_medals([('Kenya', 'ken', 2012, 2, 4, 5)])
+
+    assert seed_index(medals, str(flag_dir), index_file) == ['ger', 'jpn', 'ken']
+    index = pd.read_csv(index_file, keep_default_na=False)
+    assert dict(zip(index['Code'], index['Continent']))['usa'] == 'America'
+
+
+def test_saved_table_is_kept_while_it_disagrees(tmp_path):
+    derived = pd.DataFrame([{'Years': 2012, 'Position': 1, 'Continent': 'Europe',
+                             'Gold': 1, 'Silver': 1, 'Bronze': 1, 'Total': 3}])
+    folder, report_folder = tmp_path / 'csv', str(tmp_path / 'reports')
+    folder.mkdir()
+    assert replaces_saved(derived, str(folder), report_folder)
+
+    derived.to_csv(folder / 'ContinentalMedals.csv', index=False)
+    assert replaces_saved(derived, str(folder), report_folder)
+
+    derived.assign(Gold=2, Total=4).to_csv(folder / 'ContinentalMedals.csv', index=False)
+    assert not replaces_saved(derived, str(folder), report_folder)
+
+    pd.concat([derived, derived.assign(Years=2016)]).to_csv(folder / 'ContinentalMedals.csv', index=False)
+    assert not replaces_saved(derived, str(folder), report_folder)
@@ -0,0 +1,156 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, event, text
+from bulkLoader import create_loader
+from deltaLoader import DeltaLoader
+
+OLYMPIAD_DDL = '''CREATE TABLE Olympiad (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    Years INT{unique},
+    Host_City VARCHAR(255),
+    Nations INT,
+    Athletes INT
+)'''
+
+COUNTRY_MEDALS_DDL = '''CREATE TABLE CountryMedals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    Team VARCHAR(255),
+    Gold INT,
+    Silver INT,
+    Bronze INT,
+    Total INT,
+    Years INT,
+    Flag_URL VARCHAR(255),
+    FOREIGN KEY (Years) REFERENCES Olympiad(Years)
+)'''
+
+OLYMPIADS = pd.DataFrame({
+    'Years': [2012, 2016],
+    'Host_City': ['London', 'Rio'],
+    'Nations': [204, 207],
+    'Athletes': [10568, 11238],
+})
+
+COUNTRY_MEDALS = pd.DataFrame({
+    'Team': ['United States', 'Great Britain', 'United States'],
+    'Gold': [46, 29, 46],
+    'Silver': [29, 17, 37],
+    'Bronze': [29, 19, 38],
+    'Total': [104, 65, 121],
+    'Years': [2012, 2012, 2016],
+    'Flag_URL': ['usa.png', 'gbr.png', 'usa.png'],
+})
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+@pytest.fixture
+def database(tmp_path):
+    # SQLite database with the tables of schemaFile.sql and a log of the
+    # write statements the driver runs
+    engine = create_engine(f"sqlite:///{tmp_path / 'olympics.db'}")
+    statements = []
+
+    @event.listens_for(engine, 'connect')
+    def trace(dbapi_connection, record):
+        dbapi_connection.set_trace_callback(
+            lambda statement: statements.append(statement) if statement.lstrip().upper().startswith(WRITES) else None)
+
+    with engine.begin() as connection:
+        connection.execute(text(OLYMPIAD_DDL.format(unique=' UNIQUE')))
+        connection.execute(text(COUNTRY_MEDALS_DDL))
+    return engine, statements
+
+
+def load(engine, table_name, df, delete_missing=False):
+    delta_loader = DeltaLoader(engine, create_loader(engine, 'multi'))
+    with engine.begin() as connection:
+        delta = delta_loader.plan(connection, table_name, [df], delete_missing=delete_missing)
+        return delta, delta_loader.apply(connection, table_name, delta)
+
+
+def rows(engine, table_name, columns):
+    with engine.connect() as connection:
+        df = pd.read_sql(text(f'SELECT {", ".join(columns)} FROM {table_name} ORDER BY id'), connection)
+    return [tuple(row) for row in df.itertuples(index=False)]
+
+
+def test_reloading_unchanged_rows_writes_nothing(database):
+    engine, statements = database
+    load(engine, 'CountryMedals', COUNTRY_MEDALS)
+    statements.clear()
+
+    delta, written = load(engine, 'CountryMedals', COUNTRY_MEDALS)
+    assert written == 0
+    assert delta.unchanged == 3 and delta.inserts.empty and delta.updates.empty and delta.deletes.empty
+    assert statements == []
+
+
+def test_a_changed_row_is_updated(database):
+    engine, statements = database
+    load(engine, 'CountryMedals', COUNTRY_MEDALS)
+    statements.clear()
+
+    changed = COUNTRY_MEDALS.copy()
+    changed.loc[1, ['Gold', 'Total']] = [30, 66]
+    delta, written = load(engine, 'CountryMedals', changed)
+    assert written == 1 and len(delta.updates) == 1 and delta.unchanged == 2
+    assert [statement.split()[0] for statement in statements] == ['UPDATE']
+    assert rows(engine, 'CountryMedals', ['Team', 'Gold', 'Total', 'Years']) == [
+        ('United States', 46, 104, 2012), ('Great Britain', 30, 66, 2012), ('United States', 46, 121, 2016)]
+
+
+def test_a_key_stored_twice_is_deleted_and_inserted_once(database):
+    engine, statements = database
+    # Rows appended twice by loads before the delta loader
+    with engine.begin() as connection:
+        pd.concat([COUNTRY_MEDALS, COUNTRY_MEDALS.iloc[[0]]]).to_sql('CountryMedals', connection, if_exists='append', index=False)
+    statements.clear()
+
+    delta, _ = load(engine, 'CountryMedals', COUNTRY_MEDALS)
+    assert delta.deletes[['Team', 'Years']].values.tolist() == [['United States', 2012]]
+    assert len(delta.inserts) == 1 and delta.unchanged == 2
+    assert [statement.split()[0] for statement in statements] == ['DELETE', 'INSERT']
+    assert sorted(rows(engine, 'CountryMedals', ['Team', 'Years'])) == [
+        ('Great Britain', 2012), ('United States', 2012), ('United States', 2016)]
+
+
+def test_delete_missing_removes_rows_gone_from_the_source(database):
+    engine, _ = database
+    load(engine, 'CountryMedals', COUNTRY_MEDALS)
+    source = COUNTRY_MEDALS.iloc[[0, 2]]
+
+    delta, written = load(engine, 'CountryMedals', source)
+    assert written == 0 and len(rows(engine, 'CountryMedals', ['Team'])) == 3
+
+    delta, written = load(engine, 'CountryMedals', source, delete_missing=True)
+    assert written == 1 and delta.deletes[['Team', 'Years']].values.tolist() == [['Great Britain', 2012]]
+    assert rows(engine, 'CountryMedals', ['Team', 'Years']) == [('United States', 2012), ('United States', 2016)]
+
+
+def test_olympiad_rows_are_rewritten_with_foreign_keys_disabled(tmp_path):
+    # Olympiad created by appends, without its UNIQUE key and with a year
+    # stored twice, while CountryMedals rows reference it. Foreign keys are
+    # not checked, as dataLoading.py disables them around every delta.
+    engine = create_engine(f"sqlite:///{tmp_path / 'olympics.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(OLYMPIAD_DDL.format(unique='')))
+        connection.execute(text(COUNTRY_MEDALS_DDL))
+        pd.concat([OLYMPIADS, OLYMPIADS.iloc[[0]]]).to_sql('Olympiad', connection, if_exists='append', index=False)
+        COUNTRY_MEDALS.to_sql('CountryMedals', connection, if_exists='append', index=False)
+        assert connection.execute(text('PRAGMA foreign_keys')).scalar() == 0
+
+    changed = OLYMPIADS.copy()
+    changed.loc[1, 'Athletes'] = 11180
+    delta, written = load(engine, 'Olympiad', changed)
+    assert len(delta.deletes) == 1 and len(delta.inserts) == 1 and len(delta.updates) == 1
+    assert written == 3
+    assert sorted(rows(engine, 'Olympiad', ['Years', 'Host_City', 'Athletes'])) == [
+        (2012, 'London', 10568), (2016, 'Rio', 11180)]
+
+    # Every CountryMedals row still has exactly one Olympiad
+    with engine.connect() as connection:
+        parents = connection.execute(text(
+            'SELECT COUNT(*) FROM CountryMedals c JOIN Olympiad o ON o.Years = c.Years')).scalar()
+    assert parents == len(COUNTRY_MEDALS)
+    assert len(rows(engine, 'CountryMedals', ['Team'])) == len(COUNTRY_MEDALS)
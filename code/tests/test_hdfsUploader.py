@@ -0,0 +1,81 @@
+import json
+import pytest
+from hdfs import InsecureClient
+from hdfsUploader import HdfsUploader
+from webhdfsStub import WebHdfsStub
+
+
+@pytest.fixture
+def stub(tmp_path):
+    stub = WebHdfsStub(str(tmp_path / 'hdfs')).start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def csv_files(tmp_path):
+    csv_dir = tmp_path / 'csv'
+    csv_dir.mkdir()
+    paths = []
+    for name in ('Olympiad', 'Sports'):
+        path = csv_dir / f'{name}.csv'
+        path.write_text(f'{name}\n1\n')
+        paths.append(str(path))
+    return paths
+
+
+def uploader(stub, tmp_path, client_factory=None):
+    factory = client_factory or (lambda: InsecureClient(stub.url, user='hadoop'))
+    return HdfsUploader(factory, '/data/', str(tmp_path / 'uploads.json'), attempts=1, backoff=0)
+
+
+def read_manifest(tmp_path):
+    with open(tmp_path / 'uploads.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_unchanged_files_are_skipped(stub, tmp_path, csv_files):
+    assert uploader(stub, tmp_path).upload_all(csv_files)['uploaded'] == csv_files
+    assert (tmp_path / 'hdfs' / 'data' / 'Sports.csv').read_text() == 'Sports\n1\n'
+
+    results = uploader(stub, tmp_path).upload_all(csv_files)
+    assert results['skipped'] == csv_files and results['uploaded'] == []
+
+
+def test_files_changed_or_deleted_on_hdfs_are_uploaded_again(stub, tmp_path, csv_files):
+    uploader(stub, tmp_path).upload_all(csv_files)
+    remote = tmp_path / 'hdfs' / 'data'
+    (remote / 'Olympiad.csv').write_text('replaced on the cluster\n')
+    (remote / 'Sports.csv').unlink()
+
+    results = uploader(stub, tmp_path).upload_all(csv_files)
+    assert results['uploaded'] == csv_files
+    assert (remote / 'Olympiad.csv').read_text() == 'Olympiad\n1\n'
+    assert (remote / 'Sports.csv').read_text() == 'Sports\n1\n'
+
+
+def test_a_failed_upload_leaves_its_manifest_entry(stub, tmp_path, csv_files):
+    uploader(stub, tmp_path).upload_all(csv_files)
+    before = read_manifest(tmp_path)
+
+    class FailingClient(InsecureClient):
+        # Writes part of Sports.csv and then loses the connection
+        def upload(self, hdfs_path, local_path, **kwargs):
+            if hdfs_path.endswith('Sports.csv'):
+                self.write(hdfs_path, data='Spo', overwrite=True)
+                raise ConnectionError('connection reset')
+            return super().upload(hdfs_path, local_path, **kwargs)
+
+    for path in csv_files:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('2\n')
+    results = uploader(stub, tmp_path, lambda: FailingClient(stub.url, user='hadoop')).upload_all(csv_files)
+    assert results['uploaded'] == [csv_files[0]] and results['failed'] == [csv_files[1]]
+
+    after = read_manifest(tmp_path)
+    assert after['/data/Sports.csv'] == before['/data/Sports.csv']
+    assert after['/data/Olympiad.csv'] != before['/data/Olympiad.csv']
+
+    # The next run uploads the file again
+    assert uploader(stub, tmp_path).upload_all(csv_files)['uploaded'] == [csv_files[1]]
+    assert (tmp_path / 'hdfs' / 'data' / 'Sports.csv').read_text() == 'Sports\n1\n2\n'
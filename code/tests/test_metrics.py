@@ -0,0 +1,45 @@
+from metrics import Metrics, rate
+
+
+def timed(metrics, started, ended, rows, **labels):
+    metrics._observe('db_insert_seconds', ended - started, started, ended, labels)
+    metrics.inc('db_rows_total', rows, **labels)
+
+
+def test_rate_divides_by_the_wall_clock_span():
+    metrics = Metrics()
+    # Two workers overlapping for a second, then one more second of work
+    timed(metrics, 100.0, 102.0, 300, table='A')
+    timed(metrics, 101.0, 103.0, 300, table='B')
+    assert rate(metrics, 'db_rows_total', 'db_insert_seconds') == 200
+    assert rate(metrics, 'db_rows_total', 'db_insert_seconds', table='A') == 150
+
+
+def test_gaps_between_timings_are_not_counted():
+    metrics = Metrics()
+    # An ingest task, then another one long after it with the same labels
+    timed(metrics, 100.0, 102.0, 200, stage='ingest')
+    timed(metrics, 500.0, 501.0, 100, stage='ingest')
+    timed(metrics, 500.5, 502.0, 100, stage='ingest')
+    assert metrics.snapshot()[0]['spans'] == [[100.0, 102.0], [500.0, 502.0]]
+    assert rate(metrics, 'db_rows_total', 'db_insert_seconds') == 100
+
+
+def test_span_survives_merging_processes():
+    first, second = Metrics(), Metrics()
+    timed(first, 100.0, 101.0, 100)
+    timed(second, 100.5, 102.0, 100)
+    combined = Metrics()
+    combined.merge(first.snapshot())
+    combined.merge(second.snapshot())
+    assert rate(combined, 'db_rows_total', 'db_insert_seconds') == 100
+
+
+def test_entries_without_a_span_use_the_summed_seconds():
+    metrics = Metrics()
+    metrics.merge([
+        {'name': 'db_insert_seconds', 'type': 'summary', 'labels': {}, 'count': 2, 'sum': 4.0, 'min': 2.0, 'max': 2.0},
+        {'name': 'db_rows_total', 'type': 'counter', 'labels': {}, 'value': 400},
+    ])
+    assert rate(metrics, 'db_rows_total', 'db_insert_seconds') == 100
+    assert rate(metrics, 'db_rows_total', 'page_fetch_seconds') is None
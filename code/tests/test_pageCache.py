@@ -0,0 +1,47 @@
+import json
+import pytest
+from pageCache import MODE_RECORD, MODE_REPLAY, PageCache, PageNotCached, page_filename, page_slug
+
+QUERY_URL = 'https://www.olympiandatabase.com/index.php?id=418&L=1'
+PATH_URL = 'https://www.olympiandatabase.com/index.php/id/418/L/1'
+
+
+def test_urls_with_the_same_slug_get_different_files():
+    assert page_slug(QUERY_URL) == page_slug(PATH_URL)
+    assert page_filename(QUERY_URL) != page_filename(PATH_URL)
+    long_url = 'https://www.espn.com/' + 'a' * 300
+    assert page_filename(long_url + '1') != page_filename(long_url + '2')
+
+
+def test_pages_are_only_served_for_their_own_url(tmp_path):
+    cache = PageCache(str(tmp_path), MODE_RECORD)
+    assert cache.get(QUERY_URL, lambda: 'query') == 'query'
+    assert cache.get(PATH_URL, lambda: 'path') == 'path'
+    assert cache.get(QUERY_URL, lambda: 'fetched again') == 'query'
+
+    _, meta_path = cache._paths(QUERY_URL)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'url': PATH_URL, 'fetched_at': 0}, f)
+    assert cache.get(QUERY_URL, lambda: 'fetched again') == 'fetched again'
+
+
+def test_fixtures_may_use_the_readable_slug(tmp_path):
+    fixtures = tmp_path / 'fixtures'
+    fixtures.mkdir()
+    (fixtures / (page_slug(QUERY_URL) + '.html')).write_text('fixture')
+    cache = PageCache(str(tmp_path / 'cache'), MODE_REPLAY, fixture_dir=str(fixtures))
+    assert cache.get(QUERY_URL, None) == 'fixture'
+    with pytest.raises(PageNotCached):
+        cache.get('https://www.olympedia.org/sports', None)
+
+
+def test_incomplete_pages_are_not_cached(tmp_path):
+    cache = PageCache(str(tmp_path), MODE_RECORD)
+    has_table = lambda html: '<table' in html
+    assert cache.get(QUERY_URL, lambda: 'loading', has_table) == 'loading'
+    assert cache.get(QUERY_URL, lambda: '<table>', has_table) == '<table>'
+    assert cache.get(QUERY_URL, lambda: 'fetched again', has_table) == '<table>'
+
+    # Pages stored before they were checked are fetched again
+    cache.store(PATH_URL, 'loading')
+    assert cache.get(PATH_URL, lambda: '<table>', has_table) == '<table>'
@@ -0,0 +1,46 @@
+import os
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from metrics import METRICS
+from parquetSink import PartitionedWriter, write_dataset, read_partition, PART_FILENAME
+
+
+def athletes(years):
+    return pd.DataFrame({
+        'Athlete_Name': [f'Athlete {i}' for i in range(len(years))],
+        'Gold': 1, 'Silver': 0, 'Bronze': 0, 'Total': 1,
+        'Years': years,
+    })
+
+
+def dropped():
+    return sum(entry['value'] for entry in METRICS.snapshot()
+               if entry['name'] == 'rows_dropped_total' and entry['labels'].get('dataset') == 'AthletesMedals')
+
+
+def read(root, partition):
+    with open(os.path.join(root, 'AthletesMedals', partition, PART_FILENAME), 'rb') as f:
+        return read_partition(f.read(), 'AthletesMedals')
+
+
+def test_write_dataset_reports_rows_without_years(tmp_path, caplog):
+    before = dropped()
+    written = write_dataset(athletes([2012, None, 2016, None]), 'AthletesMedals', str(tmp_path))
+    assert sorted(written) == ['Years=2012', 'Years=2016']
+    assert len(read(tmp_path, 'Years=2012')) == 1
+    assert dropped() - before == 2
+    assert '2 rows with a null Years' in caplog.text
+
+
+def test_partitioned_writer_reports_dropped_rows_once(tmp_path, caplog):
+    before = dropped()
+    writer = PartitionedWriter('AthletesMedals', str(tmp_path))
+    writer.write(athletes([2012, None]))
+    writer.write(athletes([2012, None, None]))
+    assert writer.close() == ['Years=2012']
+    assert len(read(tmp_path, 'Years=2012')) == 2
+    assert dropped() - before == 3
+    assert caplog.text.count('rows with a null Years') == 1
@@ -0,0 +1,37 @@
+import sys
+from pipeline import Pipeline, SUCCEEDED, FAILED, SKIPPED
+
+
+def python(code):
+    return [sys.executable, '-c', code]
+
+
+def test_marked_work_starts_before_its_producer_ends(tmp_path):
+    marker = tmp_path / 'espn.done'
+    started = tmp_path / 'ingest.started'
+    pipeline = Pipeline({'scrape': 1, 'ingest': 1})
+    # The producer only ends once the task waiting on its marker has started
+    pipeline.add('scrape', 'scrape', python(
+        f"import os, time\n"
+        f"open({str(marker)!r}, 'w').close()\n"
+        f"deadline = time.time() + 30\n"
+        f"while not os.path.exists({str(started)!r}) and time.time() < deadline: time.sleep(0.05)\n"
+        f"raise SystemExit(0 if os.path.exists({str(started)!r}) else 1)"))
+    pipeline.add_marker('scraped:espn', 'scrape', str(marker), 'scrape')
+    pipeline.add('ingest:espn', 'ingest', python(f"open({str(started)!r}, 'w').close()"), ['scraped:espn'])
+
+    assert pipeline.run()
+    assert pipeline.tasks['ingest:espn'].started < pipeline.tasks['scrape'].finished
+
+
+def test_a_marker_never_written_fails_its_dependents(tmp_path):
+    marker = tmp_path / 'espn.done'
+    marker.write_text('left by an earlier run')
+    pipeline = Pipeline({'scrape': 1, 'ingest': 1})
+    pipeline.add('scrape', 'scrape', python('pass'))
+    pipeline.add_marker('scraped:espn', 'scrape', str(marker), 'scrape')
+    pipeline.add('ingest:espn', 'ingest', python('pass'), ['scraped:espn'])
+
+    assert not pipeline.run()
+    assert [pipeline.tasks[name].status for name in ('scrape', 'scraped:espn', 'ingest:espn')] == [
+        SUCCEEDED, FAILED, SKIPPED]
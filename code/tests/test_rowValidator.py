@@ -0,0 +1,43 @@
+import pandas as pd
+from rowValidator import TableValidator, REASON_COLUMN
+
+
+def quarantined(validator):
+    rows = pd.read_csv(validator.path, dtype=str, keep_default_na=False)
+    return dict(zip(rows.iloc[:, 0], rows[REASON_COLUMN]))
+
+
+def test_rows_breaking_the_schema_are_quarantined(tmp_path):
+    validator = TableValidator('CountryMedals', {'Years': {2012, 2016}}, folder=str(tmp_path))
+    df = pd.DataFrame({
+        'Team': ['United States', 'Great Britain', None, 'China', 'Jamaica'],
+        'Gold': ['46', 'many', '1', '38', '4'],
+        'Years': ['2012', '2012', '2012', '2008', '2016'],
+    })
+    checked = validator.check(df)
+    assert checked['Team'].tolist() == ['United States', 'Jamaica']
+    assert str(checked['Gold'].dtype) == 'Int64'
+    assert validator.rejected == 3
+    assert quarantined(validator) == {
+        'Great Britain': 'Gold is not an INT',
+        '': 'Team is null',
+        'China': 'Years is not in Olympiad',
+    }
+
+
+def test_unique_values_repeated_in_a_later_chunk_are_quarantined(tmp_path):
+    validator = TableValidator('Olympiad', folder=str(tmp_path))
+    first = validator.check(pd.DataFrame({'Years': ['2012', '2016'], 'Host_City': ['London', 'Rio']}))
+    second = validator.check(pd.DataFrame({'Years': ['2020', '2012'], 'Host_City': ['Tokyo', 'London again']}))
+    assert first['Years'].tolist() == [2012, 2016]
+    assert second['Years'].tolist() == [2020]
+    assert quarantined(validator) == {'2012': 'Years is not unique'}
+
+
+def test_numeric_text_is_accepted_as_an_int(tmp_path):
+    validator = TableValidator('ContinentalMedals', folder=str(tmp_path))
+    checked = validator.check(pd.DataFrame({
+        'Years': ['2012', '2012'], 'Position': ['1.', '2.0'], 'Continent': ['Europe', 'Asia'],
+    }))
+    assert checked['Position'].tolist() == [1, 2]
+    assert validator.rejected == 0
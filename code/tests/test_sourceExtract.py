@@ -0,0 +1,72 @@
+import types
+from conftest import read_fixture
+from espn import Espn
+from olympedia import Olympedia
+from olympianDatabase import OlympianDatabase
+
+# extract() only needs the flag downloader of the context, which is optional
+CONTEXT = types.SimpleNamespace(flags=lambda: None)
+
+ESPN_COUNTRY_URL = 'https://www.espn.com/olympics/summer/2012/medals/_/view/overall'
+ESPN_FLAG_URL = 'https://www.espn.com/combiner/i?img=/i/teamlogos/countries/500/{}.png&w=40'
+
+
+def test_espn_country_medals():
+    rows = Espn().extract('CountryMedals', ('espn', 2012, 1), ESPN_COUNTRY_URL,
+                          read_fixture('espn_country_medals_2012.html'), CONTEXT)
+    assert rows == [
+        {'GROUP': 'United States', 'G': '46', 'S': '29', 'B': '29', 'TOTAL': '104', 'Year': 2012,
+         'Flag URL': ESPN_FLAG_URL.format('usa')},
+        {'GROUP': 'Great Britain', 'G': '29', 'S': '17', 'B': '19', 'TOTAL': '65', 'Year': 2012,
+         'Flag URL': ESPN_FLAG_URL.format('gbr')},
+        {'GROUP': 'Independent Olympic Athletes', 'G': '0', 'S': '1', 'B': '1', 'TOTAL': '2', 'Year': 2012,
+         'Flag URL': None},
+    ]
+
+
+def test_espn_athletes_page():
+    rows = Espn().extract('AthletesMedals', ('espn', 2012, 1), ESPN_COUNTRY_URL,
+                          read_fixture('espn_athletes_2012_page_1.html'), CONTEXT)
+    assert rows == [
+        {'ATHLETE': 'Michael Phelps', 'G': '4', 'S': '2', 'B': '0', 'TOTAL': '6', 'Year': 2012},
+        {'ATHLETE': 'Missy Franklin', 'G': '4', 'S': '0', 'B': '1', 'TOTAL': '5', 'Year': 2012},
+        {'ATHLETE': 'Allison Schmitt', 'G': '3', 'S': '1', 'B': '1', 'TOTAL': '5', 'Year': 2012},
+    ]
+
+
+def test_espn_athletes_page_past_the_end():
+    assert Espn().extract('AthletesMedals', ('espn', 2012, 2), ESPN_COUNTRY_URL,
+                          read_fixture('espn_athletes_2012_page_past_end.html'), CONTEXT) == []
+
+
+def test_olympedia_sports():
+    rows = Olympedia().extract('Sports', ('olympedia', 'all', 1), 'https://www.olympedia.org/sports',
+                               read_fixture('olympedia_sports.html'), CONTEXT)
+    assert rows == [
+        {'Abbreviation': 'BK3', 'Discipline': '3x3 Basketball', 'Sport': 'Basketball', 'Season': 'Summer'},
+        {'Abbreviation': 'GAC', 'Discipline': 'Acrobatic Gymnastics', 'Sport': 'Gymnastics', 'Season': 'Summer'},
+        {'Abbreviation': 'ALP', 'Discipline': 'Alpine Skiing', 'Sport': 'Skiing', 'Season': 'Winter'},
+    ]
+
+
+def test_olympiandatabase_olympiads():
+    # The frame_space table nested in the London row is counted after the
+    # table holding it, so the Olympiads are still the second one
+    rows = OlympianDatabase().extract('Olympiad', ('olympiandatabase', 'all', 1), 'https://www.olympiandatabase.com/',
+                                      read_fixture('olympiandatabase_olympiads.html'), CONTEXT)
+    assert rows == [
+        ['', 'Tokyo 2020', '206', '11315'],
+        ['', 'Rio 2016', '207', '11238'],
+        ['XXX Games of the XXX Olympiad', 'London 2012', '205', '10500'],
+    ]
+
+
+def test_olympiandatabase_continental_medals():
+    rows = OlympianDatabase().extract('ContinentalMedals', ('olympiandatabase', '2012', 1),
+                                      'https://www.olympiandatabase.com/',
+                                      read_fixture('olympiandatabase_medals_2012.html'), CONTEXT)
+    assert [(row['Rank'], row['Continent'], row['Total']) for row in rows] == [
+        ('1.', 'Europe', '435'), ('2.', 'Asia', '238'), ('3.', 'America', '203'),
+    ]
+    assert rows[0] == {'Year': '2012', 'Rank': '1.', 'Continent': 'Europe', 'Flag': '',
+                       'Gold': '129', 'Silver': '145', 'Bronze': '161', 'Total': '435'}
@@ -0,0 +1,107 @@
+import types
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from conftest import read_fixture
+import espn
+from espn import Espn
+from scrapeManifest import DatasetManifest
+from sources import ScrapeContext
+from pageCache import MODE_RECORD, MODE_REPLAY, PageCache, page_slug
+
+ATHLETES_URL = 'https://www.espn.com/olympics/summer/2012/medals/_/view/athletes/sort/total/page/2'
+UNIT = ('espn', 2012, 2)
+COUNTRY_URL = 'https://www.espn.com/olympics/summer/2012/medals/_/view/overall'
+
+# A browser page whose medals table had not loaded yet
+LOADING_PAGE = '<html><body><div class="mod-container mod-table"></div></body></html>'
+
+
+def scrape(tmp_path, pages):
+    # scrape_unit of an ESPN athlete page, with the browser returning pages in turn
+    source = Espn()
+    loaded = []
+
+    def load_with_browser(url, context, dataset=None):
+        loaded.append(url)
+        return pages[len(loaded) - 1]
+
+    source.load_with_browser = load_with_browser
+    context = types.SimpleNamespace(cache=PageCache(str(tmp_path), MODE_RECORD), http=None, flags=lambda: None)
+    return source.scrape_unit('AthletesMedals', UNIT, ATHLETES_URL, context), loaded, context.cache
+
+
+def test_a_slow_page_is_loaded_again(tmp_path):
+    rows, loaded, cache = scrape(tmp_path, [LOADING_PAGE, read_fixture('espn_athletes_2012_page_1.html')])
+    assert [row['ATHLETE'] for row in rows] == ['Michael Phelps', 'Missy Franklin', 'Allison Schmitt']
+    assert len(loaded) == 2
+    assert cache.get(ATHLETES_URL, None) == read_fixture('espn_athletes_2012_page_1.html')
+
+
+def test_a_page_without_table_twice_ends_the_results_uncached(tmp_path):
+    rows, loaded, cache = scrape(tmp_path, [LOADING_PAGE, LOADING_PAGE])
+    assert rows == [] and len(loaded) == 2
+    assert cache.get(ATHLETES_URL, lambda: 'fetched again') == 'fetched again'
+
+
+def test_the_end_of_results_marker_ends_the_results_at_once(tmp_path):
+    rows, loaded, _ = scrape(tmp_path, [read_fixture('espn_athletes_2012_page_past_end.html')])
+    assert rows == [] and len(loaded) == 1
+
+
+def test_replay_makes_no_network_calls(tmp_path, monkeypatch):
+    def no_network(*args, **kwargs):
+        raise AssertionError('replay must not use the network')
+
+    monkeypatch.setattr(requests.Session, 'send', no_network)
+    monkeypatch.chdir(tmp_path)
+    fixtures = tmp_path / 'fixtures'
+    fixtures.mkdir()
+    (fixtures / (page_slug(COUNTRY_URL) + '.html')).write_text(read_fixture('espn_country_medals_2012.html'))
+    cache = PageCache(str(tmp_path / 'cache'), MODE_REPLAY, fixture_dir=str(fixtures))
+
+    with ScrapeContext(cache=cache) as context:
+        rows = Espn().scrape_unit('CountryMedals', ('espn', 2012, 1), COUNTRY_URL, context)
+        assert context.flags() is None
+    assert [row['GROUP'] for row in rows] == ['United States', 'Great Britain', 'Independent Olympic Athletes']
+    assert not (tmp_path / 'flag_images').exists()
+
+
+def athlete_rows(page):
+    return [{'ATHLETE': f'Athlete {page}.{i}', 'TOTAL': '1', 'Year': 2012} for i in range(2)]
+
+
+def athlete_pages(tmp_path, monkeypatch, results, stored_pages):
+    # Rows yielded by iter_athlete_pages for 2012 on a refresh run, with
+    # results[page] returned (or raised) by every fetched page
+    monkeypatch.setattr(espn, 'ATHLETE_URLS', {2012: ATHLETES_URL})
+    manifest = DatasetManifest('AthletesMedals', str(tmp_path / 'manifest'), refresh=True)
+    for page in stored_pages:
+        manifest.store('espn', 2012, page, athlete_rows(page))
+
+    def run_unit(dataset, unit, url, context, manifest):
+        result = results.get(unit[2], [])
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    source = Espn()
+    source.run_unit = run_unit
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        context = types.SimpleNamespace(executor=executor)
+        return [(page, [row['ATHLETE'] for row in rows]) for _, page, rows in source.iter_athlete_pages(context, manifest)]
+
+
+def test_a_failed_athlete_page_keeps_its_stored_rows(tmp_path, monkeypatch):
+    new_rows = [{'ATHLETE': 'New 1.0', 'TOTAL': '2', 'Year': 2012}, {'ATHLETE': 'New 1.1', 'TOTAL': '2', 'Year': 2012}]
+    pages = athlete_pages(tmp_path, monkeypatch, {1: new_rows, 2: RuntimeError('timeout')}, [1, 2])
+    assert pages == [(1, ['New 1.0', 'New 1.1']), (2, ['Athlete 2.0', 'Athlete 2.1'])]
+
+
+def test_a_given_up_year_keeps_the_stored_rows_of_its_later_pages(tmp_path, monkeypatch):
+    failure = RuntimeError('timeout')
+    pages = athlete_pages(tmp_path, monkeypatch, {1: failure, 2: failure, 3: failure}, [1, 2, 3, 4])
+    assert pages == [
+        (1, ['Athlete 1.0', 'Athlete 1.1']),
+        (2, ['Athlete 2.0', 'Athlete 2.1']),
+        (3, ['Athlete 3.0', 'Athlete 3.1', 'Athlete 4.0', 'Athlete 4.1']),
+    ]
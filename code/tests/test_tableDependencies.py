@@ -0,0 +1,32 @@
+import sqlite3
+from tableDependencies import CREATE_STATEMENTS, INDEX_STATEMENTS, TABLE_DEPENDENCIES, TABLE_SCHEMAS, ForeignKey
+
+
+def test_schema_columns_and_foreign_keys():
+    sports = TABLE_SCHEMAS['Sports'].columns
+    assert sports['Abbreviation'].type == 'VARCHAR'
+    assert sports['Abbreviation'].length == 5
+    assert TABLE_SCHEMAS['CountryMedals'].foreign_keys == [ForeignKey('Years', 'Olympiad', 'Years')]
+
+
+def test_dependencies_follow_the_foreign_keys():
+    assert TABLE_DEPENDENCIES['Olympiad'] == []
+    for table in ('CountryMedals', 'ContinentalMedals', 'AthletesMedals'):
+        assert TABLE_DEPENDENCIES[table] == ['Olympiad']
+
+
+def test_create_statements_are_idempotent():
+    connection = sqlite3.connect(':memory:')
+    for table in ('CountryCareerTotals', 'TopAthletesByYear'):
+        assert CREATE_STATEMENTS[table].startswith(f'CREATE TABLE IF NOT EXISTS {table} (')
+        connection.execute(CREATE_STATEMENTS[table])
+        connection.execute(CREATE_STATEMENTS[table])
+    columns = [row[1] for row in connection.execute('PRAGMA table_info(TopAthletesByYear)')]
+    assert columns == ['Years', 'Rank_In_Year', 'Athlete_Name', 'Gold', 'Silver', 'Bronze', 'Total']
+
+
+def test_index_statements_are_read_from_the_schema():
+    assert sorted(INDEX_STATEMENTS['CountryMedals']) == ['idx_countrymedals_team_years', 'idx_countrymedals_years_total']
+    assert INDEX_STATEMENTS['Sports']['idx_sports_season_discipline'] == \
+        'CREATE INDEX idx_sports_season_discipline ON Sports (Season, Discipline)'
+    assert 'Olympiad' not in INDEX_STATEMENTS
@@ -0,0 +1,72 @@
+from tableExtractor import parse_tables
+
+
+def parse_table(html, hidden_classes=None):
+    return parse_tables(html, hidden_classes=hidden_classes)[0]
+
+
+def cells(table):
+    return [row.cells for row in table.rows]
+
+
+def test_whitespace_is_collapsed():
+    table = parse_table('<table><tr><td>\n  Great\n\t Britain  </td><td>Missy&nbsp;Franklin</td></tr></table>')
+    assert cells(table) == [['Great Britain', 'Missy Franklin']]
+
+
+def test_block_elements_and_line_breaks_are_separated():
+    table = parse_table('<table><tr><td><div>Tokyo</div><div>2020</div></td>'
+                        '<td>Rio<br>2016</td><td><span>USA</span><span>Team</span></td></tr></table>')
+    assert cells(table) == [['Tokyo 2020', 'Rio 2016', 'USA Team']]
+
+
+def test_inline_elements_are_joined():
+    table = parse_table('<table><tr><td>Mi<b>ch</b>ael <a href="#">Phelps</a></td></tr></table>')
+    assert cells(table) == [['Michael Phelps']]
+
+
+def test_hidden_text_is_skipped():
+    table = parse_table(
+        '<table><tr>'
+        '<td>A<span style="display: none">B</span><span hidden>C</span><i aria-hidden="true">D</i>'
+        '<script>E</script></td>'
+        '<td><span class="short">USA</span><span class="full">United <span>States</span></span></td>'
+        '</tr></table>', hidden_classes='short')
+    assert cells(table) == [['A', 'United States']]
+
+
+def test_hidden_cells_are_kept_empty():
+    # Without end tags the next cell ends the hidden one
+    table = parse_table('<table><tr><td>1<td style="display:none">2<td>3</tr></table>')
+    assert cells(table) == [['1', '', '3']]
+
+
+def test_nested_tables_only_add_text_to_their_cell():
+    html = ('<table class="frame_space"><tr><th>Menu</th></tr><tr><td>Home</td></tr></table>'
+            '<table class="frame_space"><tr><th>A</th><th>B</th></tr>'
+            '<tr><td>x<table class="frame_space"><tr><th>C</th></tr><tr><td>1</td><td>2</td></tr></table></td>'
+            '<td>y</td></tr></table>'
+            '<table class="frame_space"><tr><td>last</td></tr></table>')
+    tables = parse_tables(html, 'frame_space')
+
+    # Every match in document order, like Selenium's find_elements
+    assert len(tables) == 4
+    assert tables[1].headers == ['A', 'B']
+    assert cells(tables[1]) == [['x C 1 2', 'y']]
+    assert tables[2].headers == ['C']
+    assert cells(tables[2]) == [['1', '2']]
+    assert cells(tables[3]) == [['last']]
+
+
+def test_nested_table_inside_a_matching_div():
+    html = ('<div class="wrapper"><table><tr><th>Team</th></tr>'
+            '<tr><td>USA<table><tr><td>inner</td></tr></table></td></tr></table></div>')
+    table = parse_tables(html, 'wrapper')[0]
+    assert table.headers == ['Team']
+    assert cells(table) == [['USA inner']]
+
+
+def test_images_are_resolved():
+    table = parse_table('<table><tr><td class="team"><img src="/flags/usa.png"> USA</td></tr></table>')
+    table.resolve_images('https://www.espn.com/olympics/')
+    assert table.rows[0].image('team') == 'https://www.espn.com/flags/usa.png'
@@ -0,0 +1,251 @@
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, urlencode
+
+# Local stand-in for the WebHDFS REST API, backed by a plain directory. It
+# implements the operations used by the `hdfs` client in this project
+# (MKDIRS, CREATE, APPEND, OPEN, GETFILESTATUS, LISTSTATUS, RENAME, DELETE) so
+# that ingestion and loading can be run and benchmarked without a cluster.
+
+PREFIX = '/webhdfs/v1'
+
+
+def file_status(path, suffix=''):
+    stat = os.stat(path)
+    is_dir = os.path.isdir(path)
+    return {
+        'pathSuffix': suffix,
+        'type': 'DIRECTORY' if is_dir else 'FILE',
+        'length': 0 if is_dir else stat.st_size,
+        'modificationTime': int(stat.st_mtime * 1000),
+        'accessTime': int(stat.st_atime * 1000),
+        'blockSize': 134217728,
+        'replication': 0 if is_dir else 1,
+        'owner': 'hadoop',
+        'group': 'supergroup',
+        'permission': '755' if is_dir else '644',
+    }
+
+
+class WebHdfsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logging.debug(f"webhdfs stub: {format % args}")
+
+    # Helpers
+
+    def _parse(self):
+        parsed = urlparse(self.path)
+        if not parsed.path.startswith(PREFIX):
+            return None, None, {}
+        hdfs_path = parsed.path[len(PREFIX):] or '/'
+        params = {key.lower(): values[-1] for key, values in parse_qs(parsed.query).items()}
+        return hdfs_path, params.get('op', '').upper(), params
+
+    def _local(self, hdfs_path):
+        root = self.server.root
+        local_path = os.path.normpath(os.path.join(root, hdfs_path.lstrip('/')))
+        if os.path.commonpath([root, local_path]) != root:
+            raise PermissionError(hdfs_path)
+        return local_path
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip() or b'0', 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b''.join(chunks)
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def _send(self, status, body=b'', content_type='application/json', headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _error(self, status, exception, message):
+        self._send(status, {'RemoteException': {
+            'exception': exception,
+            'javaClassName': f'java.io.{exception}',
+            'message': message,
+        }})
+
+    def _not_found(self, hdfs_path):
+        self._error(404, 'FileNotFoundException', f'File does not exist: {hdfs_path}')
+
+    def _redirect_to_data(self, params):
+        # Real namenodes redirect writes to a datanode; point back at ourselves
+        params = dict(params, datanode='true')
+        location = f'http://{self.headers["Host"]}{urlparse(self.path).path}?{urlencode(params)}'
+        self._send(307, headers={'Location': location})
+
+    # Verbs
+
+    def do_GET(self):
+        hdfs_path, op, params = self._parse()
+        if hdfs_path is None:
+            return self._send(404, b'', 'text/plain')
+        local_path = self._local(hdfs_path)
+
+        if op == 'GETFILESTATUS':
+            if not os.path.exists(local_path):
+                return self._not_found(hdfs_path)
+            return self._send(200, {'FileStatus': file_status(local_path)})
+
+        if op == 'LISTSTATUS':
+            if not os.path.exists(local_path):
+                return self._not_found(hdfs_path)
+            if os.path.isfile(local_path):
+                statuses = [file_status(local_path)]
+            else:
+                statuses = [file_status(os.path.join(local_path, name), name) for name in sorted(os.listdir(local_path))]
+            return self._send(200, {'FileStatuses': {'FileStatus': statuses}})
+
+        if op == 'OPEN':
+            if not os.path.isfile(local_path):
+                return self._not_found(hdfs_path)
+            offset = int(params.get('offset') or 0)
+            length = params.get('length')
+            with open(local_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(int(length)) if length else f.read()
+            return self._send(200, data, 'application/octet-stream')
+
+        self._error(400, 'UnsupportedOperationException', f'Unsupported GET operation {op}')
+
+    def do_PUT(self):
+        hdfs_path, op, params = self._parse()
+        if hdfs_path is None:
+            return self._send(404, b'', 'text/plain')
+        local_path = self._local(hdfs_path)
+
+        if op == 'MKDIRS':
+            os.makedirs(local_path, exist_ok=True)
+            return self._send(200, {'boolean': True})
+
+        if op == 'CREATE':
+            if params.get('datanode') != 'true':
+                self._read_body()
+                if os.path.exists(local_path) and params.get('overwrite', 'false').lower() != 'true':
+                    return self._error(403, 'FileAlreadyExistsException', f'{hdfs_path} already exists')
+                return self._redirect_to_data(params)
+            data = self._read_body()
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            tmp_path = f'{local_path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, local_path)
+            return self._send(201, b'', headers={'Location': f'hdfs://{hdfs_path}'})
+
+        if op == 'RENAME':
+            destination = self._local(params.get('destination', ''))
+            if not os.path.exists(local_path) or os.path.exists(destination):
+                return self._send(200, {'boolean': False})
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            os.rename(local_path, destination)
+            return self._send(200, {'boolean': True})
+
+        self._error(400, 'UnsupportedOperationException', f'Unsupported PUT operation {op}')
+
+    def do_POST(self):
+        hdfs_path, op, params = self._parse()
+        if hdfs_path is None:
+            return self._send(404, b'', 'text/plain')
+        local_path = self._local(hdfs_path)
+
+        if op == 'APPEND':
+            if not os.path.isfile(local_path):
+                self._read_body()
+                return self._not_found(hdfs_path)
+            if params.get('datanode') != 'true':
+                self._read_body()
+                return self._redirect_to_data(params)
+            with open(local_path, 'ab') as f:
+                f.write(self._read_body())
+            return self._send(200)
+
+        self._error(400, 'UnsupportedOperationException', f'Unsupported POST operation {op}')
+
+    def do_DELETE(self):
+        hdfs_path, op, params = self._parse()
+        if hdfs_path is None:
+            return self._send(404, b'', 'text/plain')
+        local_path = self._local(hdfs_path)
+
+        if op == 'DELETE':
+            if not os.path.exists(local_path):
+                return self._send(200, {'boolean': False})
+            if os.path.isdir(local_path):
+                if os.listdir(local_path) and params.get('recursive', 'false').lower() != 'true':
+                    return self._error(403, 'PathIsNotEmptyDirectoryException', f'{hdfs_path} is non empty')
+                shutil.rmtree(local_path)
+            else:
+                os.remove(local_path)
+            return self._send(200, {'boolean': True})
+
+        self._error(400, 'UnsupportedOperationException', f'Unsupported DELETE operation {op}')
+
+
+class WebHdfsStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, root, host='127.0.0.1', port=0):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        super().__init__((host, port), WebHdfsHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        # Serve from a background thread, e.g. for benchmarks
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a local directory through the WebHDFS REST API.')
+    parser.add_argument('--root', default='hdfs_stub', help='directory standing in for the HDFS namespace')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9870)
+    args = parser.parse_args()
+
+    server = WebHdfsStub(args.root, args.host, args.port)
+    logging.info(f"WebHDFS stand-in serving {server.root} at {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())